@@ -0,0 +1,52 @@
+"""Partial unique index: at most one open/in_review case per (chain_id, address).
+
+Revision ID: 004
+Revises: 003
+Create Date: 2026-10-19
+
+"""
+
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "004"
+down_revision = "003"
+branch_labels = None
+depends_on = None
+
+_OPEN_WHERE = sa.text("status IN ('open', 'in_review')")
+
+
+def upgrade() -> None:
+    # Concurrent screens could open duplicate cases before this index existed: keep the most
+    # recently updated open case per wallet and resolve the others so the index can be built.
+    op.execute(
+        """
+        UPDATE risk_cases SET status = 'resolved'
+        WHERE status IN ('open', 'in_review')
+          AND id NOT IN (
+            SELECT id FROM (
+              SELECT id, ROW_NUMBER() OVER (
+                PARTITION BY chain_id, address ORDER BY updated_at DESC, id DESC
+              ) AS rn
+              FROM risk_cases
+              WHERE status IN ('open', 'in_review')
+            ) ranked
+            WHERE rn = 1
+          )
+        """,
+    )
+    op.create_index(
+        "uq_risk_cases_open_chain_address",
+        "risk_cases",
+        ["chain_id", "address"],
+        unique=True,
+        postgresql_where=_OPEN_WHERE,
+        sqlite_where=_OPEN_WHERE,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("uq_risk_cases_open_chain_address", table_name="risk_cases")
@@ -0,0 +1,36 @@
+"""Content hash on feature_snapshots for deduplicated, content-addressed snapshots.
+
+Revision ID: 005
+Revises: 004
+Create Date: 2026-10-19
+
+"""
+
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "005"
+down_revision = "004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Existing rows keep a NULL hash (random ids); new snapshots are keyed by their hash.
+    op.add_column(
+        "feature_snapshots",
+        sa.Column("content_hash", sa.String(length=64), nullable=True),
+    )
+    op.create_index(
+        "uq_feature_snapshots_content_hash",
+        "feature_snapshots",
+        ["content_hash"],
+        unique=True,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("uq_feature_snapshots_content_hash", table_name="feature_snapshots")
+    op.drop_column("feature_snapshots", "content_hash")
@@ -0,0 +1,201 @@
+"""Store feature_snapshots.features and risk_decisions.evidence as packed msgpack vectors.
+
+The encoding is copied here as it stood at this revision (schemas features/evidence v1) instead
+of imported from ``app.services.risk_feature_schema``, so later schema versions never change
+what this migration writes or reads. The layout is ``[schema_id, version, presence_mask, values,
+extras]`` with 32-byte tx hashes stored as bytes and integers beyond 64 bits as ext type 1.
+
+Revision ID: 006
+Revises: 005
+Create Date: 2026-10-19
+
+"""
+
+from __future__ import annotations
+
+import re
+from collections.abc import Callable
+from typing import Any
+
+import msgpack
+import sqlalchemy as sa
+from alembic import op
+
+revision = "006"
+down_revision = "005"
+branch_labels = None
+depends_on = None
+
+_BATCH = 2000
+
+_WINDOW_KEYS = (
+    "tx_count",
+    "volume",
+    "unique_reserves",
+    "unique_counterparty_addresses",
+    "avg_gas_window",
+    "max_ops_same_block",
+    "sample_tx_hashes",
+)
+# name -> (schema_id, version 1 columns in index order, columns holding tx hash lists)
+_SCHEMAS: dict[str, tuple[int, tuple[str, ...], frozenset[str]]] = {
+    "features": (
+        1,
+        (
+            "chain_id",
+            "address",
+            "subgraph_block_head",
+            "lifetime_deposit_count",
+            "lifetime_withdraw_count",
+            "lifetime_borrow_count",
+            "lifetime_repay_count",
+            "lifetime_total_deposit_volume_raw",
+            "lifetime_total_withdraw_volume_raw",
+            "lifetime_total_borrow_volume_raw",
+            "lifetime_total_repay_volume_raw",
+            "first_activity_block",
+            "last_activity_block",
+            *(f"window_24h_{k}" for k in _WINDOW_KEYS),
+            *(f"window_7d_{k}" for k in _WINDOW_KEYS),
+        ),
+        frozenset({"window_24h_sample_tx_hashes", "window_7d_sample_tx_hashes"}),
+    ),
+    "evidence": (
+        2,
+        (
+            "window_start_block",
+            "window_end_block",
+            "subgraph_block_head",
+            "graph_component_id",
+            "supporting_tx_ids",
+            "explain",
+            "graph_hints",
+            "feature_snapshot_id",
+        ),
+        frozenset({"supporting_tx_ids"}),
+    ),
+}
+_BY_ID = {schema_id: (columns, hashes) for schema_id, columns, hashes in _SCHEMAS.values()}
+_TX_HASH_RE = re.compile(r"0x[0-9a-f]{64}")
+_EXT_BIGINT = 1
+
+
+def _wide_ints(value: Any) -> Any:
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, int) and not (-(2**63) <= value < 2**64):
+        n = (value.bit_length() + 8) // 8
+        return msgpack.ExtType(_EXT_BIGINT, value.to_bytes(n, "big", signed=True))
+    if isinstance(value, list):
+        return [_wide_ints(v) for v in value]
+    if isinstance(value, dict):
+        return {k: _wide_ints(v) for k, v in value.items()}
+    return value
+
+
+def _ext_hook(code: int, data: bytes) -> Any:
+    if code == _EXT_BIGINT:
+        return int.from_bytes(data, "big", signed=True)
+    return msgpack.ExtType(code, data)
+
+
+def encode_vector(name: str, payload: dict[str, Any]) -> bytes:
+    schema_id, columns, hashes = _SCHEMAS[name]
+    mask = 0
+    values: list[Any] = []
+    for idx, key in enumerate(columns):
+        if key not in payload:
+            continue
+        mask |= 1 << idx
+        v = payload[key]
+        if key in hashes and isinstance(v, list):
+            v = [
+                bytes.fromhex(h[2:]) if isinstance(h, str) and _TX_HASH_RE.fullmatch(h) else h
+                for h in v
+            ]
+        values.append(v)
+    extras = {k: v for k, v in payload.items() if k not in columns}
+    body = [schema_id, 1, mask, values, extras or None]
+    return msgpack.packb(_wide_ints(body), use_bin_type=True)
+
+
+def decode_vector(raw: bytes) -> dict[str, Any]:
+    schema_id, _version, mask, values, extras = msgpack.unpackb(
+        raw,
+        raw=False,
+        strict_map_key=False,
+        ext_hook=_ext_hook,
+    )
+    columns, hashes = _BY_ID[schema_id]
+    out: dict[str, Any] = {}
+    it = iter(values)
+    for idx, key in enumerate(columns):
+        if mask >> idx & 1:
+            v = next(it)
+            if key in hashes and isinstance(v, list):
+                v = ["0x" + h.hex() if isinstance(h, bytes) else h for h in v]
+            out[key] = v
+    if extras:
+        out.update(extras)
+    return out
+
+
+_COLUMNS = (
+    ("feature_snapshots", "features", "features"),
+    ("risk_decisions", "evidence", "evidence"),
+)
+
+
+def _rewrite(
+    table: str,
+    column: str,
+    old_type: sa.types.TypeEngine[Any],
+    new_type: sa.types.TypeEngine[Any],
+    convert: Callable[[Any], Any],
+) -> None:
+    """Copy ``column`` into a temp column of ``new_type`` in id-ordered batches, then swap."""
+    tmp = f"{column}_tmp"
+    op.add_column(table, sa.Column(tmp, new_type, nullable=True))
+    t = sa.table(
+        table,
+        sa.column("id", sa.Uuid()),
+        sa.column(column, old_type),
+        sa.column(tmp, new_type),
+    )
+    bind = op.get_bind()
+    stmt = t.update().where(t.c.id == sa.bindparam("b_id")).values({tmp: sa.bindparam("b_value")})
+    last_id = None
+    while True:
+        q = sa.select(t.c.id, t.c[column]).order_by(t.c.id).limit(_BATCH)
+        if last_id is not None:
+            q = q.where(t.c.id > last_id)
+        rows = bind.execute(q).all()
+        if not rows:
+            break
+        bind.execute(stmt, [{"b_id": r[0], "b_value": convert(r[1])} for r in rows])
+        last_id = rows[-1][0]
+    with op.batch_alter_table(table) as batch:
+        batch.drop_column(column)
+        batch.alter_column(tmp, new_column_name=column, nullable=False)
+
+
+def upgrade() -> None:
+    for table, column, schema_name in _COLUMNS:
+        _rewrite(
+            table,
+            column,
+            sa.JSON(),
+            sa.LargeBinary(),
+            lambda v, s=schema_name: encode_vector(s, v or {}),
+        )
+
+
+def downgrade() -> None:
+    for table, column, _schema_name in _COLUMNS:
+        _rewrite(
+            table,
+            column,
+            sa.LargeBinary(),
+            sa.JSON(),
+            lambda v: decode_vector(bytes(v)) if v is not None else {},
+        )
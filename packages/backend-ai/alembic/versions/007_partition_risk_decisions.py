@@ -0,0 +1,142 @@
+"""Range-partition risk_decisions by month on created_at (Postgres).
+
+The partitioned parent needs ``created_at`` in its primary key, so ``risk_cases`` can no longer
+hold a foreign key to ``risk_decisions.id``; the reference is kept as a plain column (old
+decisions are archived to Parquet and dropped from Postgres anyway). Other dialects only lose
+that foreign key.
+
+Revision ID: 007
+Revises: 006
+Create Date: 2026-10-19
+
+"""
+
+from __future__ import annotations
+
+from datetime import UTC, date, datetime
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "007"
+down_revision = "006"
+branch_labels = None
+depends_on = None
+
+_MONTHS_AHEAD = 3
+# Partition naming as of this revision; kept here so later app changes cannot alter it.
+DEFAULT_PARTITION = "risk_decisions_default"
+_COLUMNS = (
+    "id, correlation_id, batch_job_id, chain_id, address, risk_score, severity, "
+    "recommended_action, model_version, ruleset_version, risk_reasons, evidence, "
+    "feature_snapshot_id, latency_ms, degraded, client_profile, created_at"
+)
+_INDEXES = (
+    ("ix_risk_decisions_correlation_id", ["correlation_id"]),
+    ("ix_risk_decisions_chain_address", ["chain_id", "address"]),
+    ("ix_risk_decisions_batch_job_id", ["batch_job_id"]),
+)
+
+
+def add_months(d: date, months: int) -> date:
+    idx = d.year * 12 + d.month - 1 + months
+    return date(idx // 12, idx % 12 + 1, 1)
+
+
+def create_partition_sql(month: date) -> str:
+    start, end = add_months(month, 0), add_months(month, 1)
+    return (
+        f"CREATE TABLE IF NOT EXISTS risk_decisions_y{start.year:04d}m{start.month:02d} "
+        f"PARTITION OF risk_decisions "
+        f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+    )
+
+
+def _decisions_table(name: str, *, partitioned: bool) -> None:
+    pk = ("id", "created_at") if partitioned else ("id",)
+    kwargs = {"postgresql_partition_by": "RANGE (created_at)"} if partitioned else {}
+    op.create_table(
+        name,
+        sa.Column("id", sa.Uuid(), nullable=False),
+        sa.Column("correlation_id", sa.String(length=128), nullable=True),
+        sa.Column("batch_job_id", sa.Uuid(), nullable=True),
+        sa.Column("chain_id", sa.String(length=64), nullable=False),
+        sa.Column("address", sa.String(length=42), nullable=False),
+        sa.Column("risk_score", sa.Integer(), nullable=False),
+        sa.Column("severity", sa.String(length=16), nullable=False),
+        sa.Column("recommended_action", sa.String(length=48), nullable=False),
+        sa.Column("model_version", sa.String(length=64), nullable=False),
+        sa.Column("ruleset_version", sa.String(length=64), nullable=False),
+        sa.Column("risk_reasons", sa.JSON(), nullable=False),
+        sa.Column("evidence", sa.LargeBinary(), nullable=False),
+        sa.Column("feature_snapshot_id", sa.Uuid(), nullable=True),
+        sa.Column("latency_ms", sa.Integer(), nullable=False),
+        sa.Column("degraded", sa.Boolean(), nullable=False, server_default="false"),
+        sa.Column("client_profile", sa.String(length=32), nullable=False),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.PrimaryKeyConstraint(*pk, name="risk_decisions_pkey"),
+        sa.ForeignKeyConstraint(
+            ["batch_job_id"],
+            ["risk_batch_jobs.id"],
+            name="fk_risk_decisions_batch_job",
+            ondelete="SET NULL",
+        ),
+        sa.ForeignKeyConstraint(
+            ["feature_snapshot_id"],
+            ["feature_snapshots.id"],
+            name="fk_risk_decisions_feature_snapshot",
+            ondelete="SET NULL",
+        ),
+        **kwargs,
+    )
+
+
+def _swap_in(old_name: str, *, partitioned: bool) -> None:
+    """Rename ``risk_decisions`` to ``old_name``, rebuild it, copy rows across, drop the old one."""
+    op.rename_table("risk_decisions", old_name)
+    op.execute(f"ALTER TABLE {old_name} RENAME CONSTRAINT risk_decisions_pkey TO {old_name}_pkey")
+    for ix, _cols in _INDEXES:
+        op.execute(f"ALTER INDEX IF EXISTS {ix} RENAME TO {ix}_old")
+    _decisions_table("risk_decisions", partitioned=partitioned)
+    if partitioned:
+        oldest = op.get_bind().execute(sa.text(f"SELECT min(created_at) FROM {old_name}")).scalar()
+        this_month = add_months(datetime.now(UTC).date(), 0)
+        month = add_months(oldest.date(), 0) if oldest is not None else this_month
+        while month <= add_months(this_month, _MONTHS_AHEAD):
+            op.execute(create_partition_sql(month))
+            month = add_months(month, 1)
+        op.execute(f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF risk_decisions DEFAULT")
+    op.execute(f"INSERT INTO risk_decisions ({_COLUMNS}) SELECT {_COLUMNS} FROM {old_name}")
+    op.execute(f"DROP TABLE {old_name} CASCADE")
+    for ix, cols in _INDEXES:
+        op.create_index(ix, "risk_decisions", cols, unique=False)
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("risk_cases") as batch:
+        batch.drop_constraint("fk_risk_cases_latest_decision", type_="foreignkey")
+    if op.get_bind().dialect.name == "postgresql":
+        _swap_in("risk_decisions_unpartitioned", partitioned=True)
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == "postgresql":
+        _swap_in("risk_decisions_partitioned", partitioned=False)
+    # Cases may point at decisions that were archived out of Postgres.
+    op.execute(
+        "UPDATE risk_cases SET latest_decision_id = NULL WHERE latest_decision_id IS NOT NULL "
+        "AND latest_decision_id NOT IN (SELECT id FROM risk_decisions)",
+    )
+    with op.batch_alter_table("risk_cases") as batch:
+        batch.create_foreign_key(
+            "fk_risk_cases_latest_decision",
+            "risk_decisions",
+            ["latest_decision_id"],
+            ["id"],
+            ondelete="SET NULL",
+        )
@@ -0,0 +1,45 @@
+"""Composite indexes for keyset-paginated decision history and case lists.
+
+Revision ID: 008
+Revises: 007
+Create Date: 2026-10-19
+
+"""
+
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "008"
+down_revision = "007"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_risk_decisions_chain_address_created",
+        "risk_decisions",
+        ["chain_id", "address", sa.text("created_at DESC")],
+        unique=False,
+    )
+    # Prefix of the index above.
+    op.drop_index("ix_risk_decisions_chain_address", table_name="risk_decisions")
+    op.create_index(
+        "ix_risk_cases_status_updated",
+        "risk_cases",
+        ["status", sa.text("updated_at DESC"), "id"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_risk_cases_status_updated", table_name="risk_cases")
+    op.create_index(
+        "ix_risk_decisions_chain_address",
+        "risk_decisions",
+        ["chain_id", "address"],
+        unique=False,
+    )
+    op.drop_index("ix_risk_decisions_chain_address_created", table_name="risk_decisions")
@@ -0,0 +1,47 @@
+"""Per-address batch results table (replaces the risk_batch_jobs.results blob for new jobs).
+
+Revision ID: 009
+Revises: 008
+Create Date: 2026-10-19
+
+"""
+
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "009"
+down_revision = "008"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "risk_batch_results",
+        sa.Column("job_id", sa.Uuid(), nullable=False),
+        sa.Column("idx", sa.Integer(), nullable=False),
+        sa.Column("address", sa.String(length=42), nullable=False),
+        sa.Column("risk_score", sa.Integer(), nullable=False),
+        sa.Column("severity", sa.String(length=16), nullable=False),
+        sa.Column("decision_id", sa.Uuid(), nullable=True),
+        sa.Column("degraded", sa.Boolean(), nullable=False, server_default="false"),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.PrimaryKeyConstraint("job_id", "idx"),
+        sa.ForeignKeyConstraint(
+            ["job_id"],
+            ["risk_batch_jobs.id"],
+            name="fk_risk_batch_results_job",
+            ondelete="CASCADE",
+        ),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("risk_batch_results")
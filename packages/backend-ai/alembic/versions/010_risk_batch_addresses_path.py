@@ -0,0 +1,28 @@
+"""Disk-backed address list for uploaded batch jobs.
+
+Revision ID: 010
+Revises: 009
+Create Date: 2026-10-19
+
+"""
+
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "010"
+down_revision = "009"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "risk_batch_jobs",
+        sa.Column("addresses_path", sa.String(length=512), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("risk_batch_jobs", "addresses_path")
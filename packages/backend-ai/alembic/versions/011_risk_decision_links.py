@@ -0,0 +1,67 @@
+"""Links from reused screenings (new correlation / batch id) to an existing decision.
+
+Revision ID: 011
+Revises: 010
+Create Date: 2026-10-19
+
+"""
+
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "011"
+down_revision = "010"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "risk_decision_links",
+        sa.Column("id", sa.Uuid(), nullable=False),
+        sa.Column("decision_id", sa.Uuid(), nullable=False),
+        sa.Column("correlation_id", sa.String(length=128), nullable=True),
+        sa.Column("batch_job_id", sa.Uuid(), nullable=True),
+        sa.Column("chain_id", sa.String(length=64), nullable=False),
+        sa.Column("address", sa.String(length=42), nullable=False),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.PrimaryKeyConstraint("id"),
+        sa.ForeignKeyConstraint(
+            ["batch_job_id"],
+            ["risk_batch_jobs.id"],
+            name="fk_risk_decision_links_batch_job",
+            ondelete="SET NULL",
+        ),
+    )
+    op.create_index(
+        "ix_risk_decision_links_decision_id",
+        "risk_decision_links",
+        ["decision_id"],
+        unique=False,
+    )
+    op.create_index(
+        "ix_risk_decision_links_correlation_id",
+        "risk_decision_links",
+        ["correlation_id"],
+        unique=False,
+    )
+    op.create_index(
+        "ix_risk_decision_links_batch_job_id",
+        "risk_decision_links",
+        ["batch_job_id"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_risk_decision_links_batch_job_id", table_name="risk_decision_links")
+    op.drop_index("ix_risk_decision_links_correlation_id", table_name="risk_decision_links")
+    op.drop_index("ix_risk_decision_links_decision_id", table_name="risk_decision_links")
+    op.drop_table("risk_decision_links")
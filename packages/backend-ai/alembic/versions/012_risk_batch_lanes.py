@@ -0,0 +1,33 @@
+"""Priority lane and fair-share tenant on batch jobs.
+
+Revision ID: 012
+Revises: 011
+Create Date: 2026-10-19
+
+"""
+
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "012"
+down_revision = "011"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "risk_batch_jobs",
+        sa.Column("lane", sa.String(length=16), nullable=False, server_default="normal"),
+    )
+    op.add_column(
+        "risk_batch_jobs",
+        sa.Column("tenant", sa.String(length=64), nullable=False, server_default="default"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("risk_batch_jobs", "tenant")
+    op.drop_column("risk_batch_jobs", "lane")
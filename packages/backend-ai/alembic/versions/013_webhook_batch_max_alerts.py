@@ -0,0 +1,28 @@
+"""Per-endpoint alert batching for outbound webhooks.
+
+Revision ID: 013
+Revises: 012
+Create Date: 2026-10-19
+
+"""
+
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "013"
+down_revision = "012"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "aml_webhook_endpoints",
+        sa.Column("batch_max_alerts", sa.Integer(), nullable=False, server_default="1"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("aml_webhook_endpoints", "batch_max_alerts")
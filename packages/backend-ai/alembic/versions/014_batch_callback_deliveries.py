@@ -0,0 +1,48 @@
+"""Batch completion callbacks as alert deliveries (endpoint optional, batch job link).
+
+Revision ID: 014
+Revises: 013
+Create Date: 2026-10-19
+
+"""
+
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "014"
+down_revision = "013"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("aml_alert_deliveries", sa.Column("batch_job_id", sa.Uuid(), nullable=True))
+    op.create_foreign_key(
+        "fk_aml_alert_deliveries_batch_job",
+        "aml_alert_deliveries",
+        "risk_batch_jobs",
+        ["batch_job_id"],
+        ["id"],
+        ondelete="CASCADE",
+    )
+    op.create_index(
+        "ix_aml_alert_deliveries_batch_job_id",
+        "aml_alert_deliveries",
+        ["batch_job_id"],
+        unique=False,
+    )
+    op.alter_column("aml_alert_deliveries", "webhook_endpoint_id", nullable=True)
+
+
+def downgrade() -> None:
+    op.execute("DELETE FROM aml_alert_deliveries WHERE webhook_endpoint_id IS NULL")
+    op.alter_column("aml_alert_deliveries", "webhook_endpoint_id", nullable=False)
+    op.drop_index("ix_aml_alert_deliveries_batch_job_id", table_name="aml_alert_deliveries")
+    op.drop_constraint(
+        "fk_aml_alert_deliveries_batch_job",
+        "aml_alert_deliveries",
+        type_="foreignkey",
+    )
+    op.drop_column("aml_alert_deliveries", "batch_job_id")
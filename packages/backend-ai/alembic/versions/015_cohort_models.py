@@ -0,0 +1,61 @@
+"""Persisted cohort models for warm-started discovery across block windows.
+
+Revision ID: 015
+Revises: 014
+Create Date: 2026-10-19
+
+"""
+
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "015"
+down_revision = "014"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "cohort_models",
+        sa.Column("id", sa.Uuid(), nullable=False),
+        sa.Column("chain", sa.String(length=64), nullable=False),
+        sa.Column("protocol", sa.String(length=128), nullable=False),
+        sa.Column("feature_key", sa.String(length=256), nullable=False),
+        sa.Column("scaling", sa.String(length=16), nullable=False),
+        sa.Column("engine", sa.String(length=16), nullable=False),
+        sa.Column("k", sa.Integer(), nullable=False),
+        sa.Column("centers", sa.JSON(), nullable=False),
+        sa.Column("scaler", sa.JSON(), nullable=True),
+        sa.Column("version", sa.Integer(), nullable=False),
+        sa.Column("parent_id", sa.Uuid(), nullable=True),
+        sa.Column("start_block", sa.BigInteger(), nullable=False),
+        sa.Column("end_block", sa.BigInteger(), nullable=False),
+        sa.Column("n_users", sa.Integer(), nullable=False),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.PrimaryKeyConstraint("id"),
+        sa.ForeignKeyConstraint(
+            ["parent_id"],
+            ["cohort_models.id"],
+            name="fk_cohort_models_parent",
+            ondelete="SET NULL",
+        ),
+    )
+    op.create_index(
+        "ix_cohort_models_lineage",
+        "cohort_models",
+        ["chain", "protocol", "feature_key", "scaling", "end_block"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_cohort_models_lineage", table_name="cohort_models")
+    op.drop_table("cohort_models")
@@ -0,0 +1,28 @@
+"""Progress heartbeat on batch jobs, so resume can tell live jobs from stalled ones.
+
+Revision ID: 016
+Revises: 015
+Create Date: 2026-10-19
+
+"""
+
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "016"
+down_revision = "015"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "risk_batch_jobs",
+        sa.Column("heartbeat_at", sa.DateTime(timezone=True), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("risk_batch_jobs", "heartbeat_at")
@@ -0,0 +1,47 @@
+"""One row per cohort model version within a lineage.
+
+Revision ID: 017
+Revises: 016
+Create Date: 2026-10-19
+
+"""
+
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "017"
+down_revision = "016"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Concurrent saves could pick the same max+1; renumber each lineage in save order first.
+    op.execute(
+        sa.text(
+            """
+            UPDATE cohort_models AS m
+            SET version = ranked.version
+            FROM (
+                SELECT id, row_number() OVER (
+                    PARTITION BY chain, protocol, feature_key, scaling
+                    ORDER BY version, created_at, id
+                ) AS version
+                FROM cohort_models
+            ) AS ranked
+            WHERE m.id = ranked.id AND m.version <> ranked.version
+            """,
+        ),
+    )
+    op.create_index(
+        "uq_cohort_models_version",
+        "cohort_models",
+        ["chain", "protocol", "feature_key", "scaling", "version"],
+        unique=True,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("uq_cohort_models_version", table_name="cohort_models")
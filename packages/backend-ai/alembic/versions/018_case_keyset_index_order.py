@@ -0,0 +1,46 @@
+"""Case list indexes in the exact keyset order, with and without a status filter.
+
+Revision ID: 018
+Revises: 017
+Create Date: 2026-10-19
+
+"""
+
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "018"
+down_revision = "017"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Pages are ordered by updated_at DESC, id DESC; an ascending id cannot serve the tiebreak.
+    op.drop_index("ix_risk_cases_status_updated", table_name="risk_cases")
+    op.create_index(
+        "ix_risk_cases_status_updated",
+        "risk_cases",
+        ["status", sa.text("updated_at DESC"), sa.text("id DESC")],
+        unique=False,
+    )
+    # /cases/page without a status cannot use the status-leading index.
+    op.create_index(
+        "ix_risk_cases_updated",
+        "risk_cases",
+        [sa.text("updated_at DESC"), sa.text("id DESC")],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_risk_cases_updated", table_name="risk_cases")
+    op.drop_index("ix_risk_cases_status_updated", table_name="risk_cases")
+    op.create_index(
+        "ix_risk_cases_status_updated",
+        "risk_cases",
+        ["status", sa.text("updated_at DESC"), "id"],
+        unique=False,
+    )
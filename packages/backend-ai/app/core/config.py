@@ -74,6 +74,65 @@ class Settings(BaseSettings):
         default=3600,
         description="Redis TTL for POST /cohorts/discover results",
     )
+    COHORT_CLUSTER_WORKERS: int = Field(
+        default=2,
+        ge=0,
+        le=64,
+        description="Processes in the cohort clustering pool; 0 clusters in a thread instead",
+    )
+    COHORT_CLUSTER_WORKER_THREADS: int = Field(
+        default=2,
+        ge=1,
+        le=64,
+        description="BLAS/OpenMP threads per clustering process",
+    )
+    COHORT_MINIBATCH_MIN_USERS: int = Field(
+        default=50_000,
+        ge=1,
+        description="Population from which engine=auto clusters with MiniBatchKMeans",
+    )
+    COHORT_MINIBATCH_BATCH_SIZE: int = Field(default=8_192, ge=256, le=1_000_000)
+    COHORT_WARM_START_MAX_ITER: int = Field(
+        default=30,
+        ge=1,
+        le=300,
+        description="Lloyd iterations allowed when K-Means starts from the previous window's centers",
+    )
+    COHORT_AUTO_K_SAMPLE_SIZE: int = Field(
+        default=5_000,
+        ge=100,
+        le=100_000,
+        description="Rows each auto_k candidate is fitted and silhouette-scored on",
+    )
+    COHORT_MINIBATCH_EPOCHS: int = Field(
+        default=3,
+        ge=1,
+        le=50,
+        description="Streaming partial_fit passes over the population",
+    )
+    COHORT_ASSIGN_MAX_ADDRESSES: int = Field(
+        default=1_000,
+        ge=1,
+        le=10_000,
+        description="Wallets per POST /cohorts/{model_id}/assign request",
+    )
+    COHORT_MODEL_CACHE_SIZE: int = Field(
+        default=64,
+        ge=0,
+        le=10_000,
+        description="Saved cohort models kept in memory for assignment; 0 disables the cache",
+    )
+    COHORT_MEMBERS_TTL_SECONDS: int = Field(
+        default=86_400,
+        ge=60,
+        description="Redis TTL of the paginated members of each saved discovery",
+    )
+    COHORT_MEMBERS_PAGE_MAX: int = Field(
+        default=10_000,
+        ge=1,
+        le=1_000_000,
+        description="Largest limit accepted by GET /cohorts/{model_id}/members/{cohort_id}",
+    )
 
     PROMETHEUS_ENABLED: bool = True
 
@@ -83,6 +142,12 @@ class Settings(BaseSettings):
         default="http://localhost:3000",
         description="Comma-separated browser origins for CORS",
     )
+    GZIP_MINIMUM_SIZE: int = Field(
+        default=1024,
+        ge=0,
+        description="Responses at least this many bytes are gzip-compressed for clients that accept it",
+    )
+    GZIP_COMPRESS_LEVEL: int = Field(default=5, ge=1, le=9)
     LOG_LEVEL: str = Field(default="INFO", description="Python logging level (e.g. INFO, DEBUG)")
     GRAPHQL_ENABLED: bool = Field(
         default=True,
@@ -153,7 +218,140 @@ class Settings(BaseSettings):
         description="Approx blocks per hour for window sizing (e.g. Polygon ~2s blocks)",
     )
     RISK_FEATURE_CACHE_TTL_SECONDS: int = Field(default=300, ge=30)
-    RISK_BATCH_MAX_ADDRESSES: int = Field(default=500, ge=1, le=5000)
+    RISK_DECISION_REUSE_ENABLED: bool = True
+    RISK_DECISION_REUSE_BLOCKS: int = Field(
+        default=150,
+        ge=1,
+        description="Head bucket width: screens of a wallet within one bucket reuse the decision",
+    )
+    RISK_DECISION_REUSE_TTL_SECONDS: int = Field(default=600, ge=30)
+    RISK_FINALITY_BLOCKS: int = Field(
+        default=256,
+        ge=0,
+        description="Blocks behind head after which historical feature bundles are cached forever",
+    )
+    RISK_BATCH_MAX_ADDRESSES: int = Field(default=50_000, ge=1, le=1_000_000)
+    RISK_BATCH_CHUNK_SIZE: int = Field(
+        default=250,
+        ge=1,
+        le=10_000,
+        description="Addresses per Celery chunk task when fanning out a batch job",
+    )
+    RISK_BATCH_STALE_SECONDS: int = Field(
+        default=900,
+        ge=60,
+        description="A queued/running/finalizing job without progress for this long may be resumed",
+    )
+    RISK_LANE_URGENT_MAX_ADDRESSES: int = Field(
+        default=250,
+        ge=0,
+        description="Batch jobs up to this size run on the aml_urgent lane",
+    )
+    RISK_LANE_BULK_MIN_ADDRESSES: int = Field(
+        default=5000,
+        ge=1,
+        description="Batch jobs from this size run on the aml_bulk lane",
+    )
+    RISK_FAIR_SHARE_INFLIGHT: int = Field(
+        default=8,
+        ge=1,
+        description="Chunks per lane queued or running at once; free slots go round-robin by tenant",
+    )
+    RISK_FAIR_SHARE_LEASE_SECONDS: int = Field(default=900, ge=60)
+    RISK_WEBHOOK_ENDPOINT_CONCURRENCY: int = Field(
+        default=4,
+        ge=1,
+        le=64,
+        description="Webhook requests in flight per endpoint",
+    )
+    RISK_WEBHOOK_HOST_MAX_CONNECTIONS: int = Field(default=16, ge=1, le=256)
+    RISK_WEBHOOK_TIMEOUT_SECONDS: float = Field(default=10.0, gt=0, le=60)
+    RISK_WEBHOOK_TASK_MAX_DELIVERIES: int = Field(
+        default=500,
+        ge=1,
+        description="Deliveries handed to one dispatcher task",
+    )
+    RISK_WEBHOOK_RETRY_BASE_SECONDS: float = Field(default=10.0, gt=0)
+    RISK_WEBHOOK_RETRY_MAX_SECONDS: float = Field(default=1800.0, gt=0)
+    RISK_WEBHOOK_RETRY_POLL_SECONDS: float = Field(
+        default=5.0,
+        gt=0,
+        description="Beat interval of the webhook retry drain",
+    )
+    RISK_WEBHOOK_RETRY_DRAIN_MAX: int = Field(default=5000, ge=1)
+    RISK_WEBHOOK_INDEX_CHECK_SECONDS: float = Field(
+        default=2.0,
+        ge=0,
+        description="How often a process checks the webhook subscription version in Redis",
+    )
+    RISK_WEBHOOK_INDEX_MAX_AGE_SECONDS: float = Field(default=60.0, gt=0)
+    RISK_BATCH_UPLOAD_MAX_ADDRESSES: int = Field(default=20_000_000, ge=1)
+    RISK_BATCH_UPLOAD_DIR: Path = Field(
+        default=Path("/tmp/cohortlens_batch_uploads"),
+        description="Spool for uploaded address lists; must be shared by API and aml_tasks workers",
+    )
+    RISK_BATCH_UPLOAD_RETENTION_SECONDS: int = Field(
+        default=7 * 86400,
+        ge=3600,
+        description="Keep the upload spool of a failed or stalled job this long (for resume)",
+    )
+    RISK_BATCH_CALLBACK_CHUNK_SIZE: int = Field(
+        default=1_000,
+        ge=1,
+        le=50_000,
+        description="Results per signed, gzip-compressed batch completion callback request",
+    )
+    RISK_BATCH_CALLBACK_MAX_ATTEMPTS: int = Field(
+        default=12,
+        ge=1,
+        le=100,
+        description="Delivery attempts per batch callback chunk (alerts get 3)",
+    )
+    RISK_STREAM_MAX_ADDRESSES: int = Field(default=5_000, ge=1, le=50_000)
+    RISK_STREAM_CONCURRENCY: int = Field(
+        default=16,
+        ge=1,
+        le=256,
+        description="Concurrent screens per /risk/screen/stream request",
+    )
+    RISK_WRITE_BEHIND_ENABLED: bool = Field(
+        default=True,
+        description="Buffer online screening writes and flush them in bulk from a background task",
+    )
+    RISK_PERSIST_FLUSH_MAX_ITEMS: int = Field(default=200, ge=1, le=10_000)
+    RISK_PERSIST_FLUSH_INTERVAL_MS: int = Field(default=250, ge=10, le=60_000)
+    RISK_WRITE_BEHIND_MAX_PENDING: int = Field(
+        default=10_000,
+        ge=1,
+        description="Write-behind backlog bound; further screenings are persisted inline",
+    )
+    RISK_WRITE_BEHIND_MAX_ATTEMPTS: int = Field(
+        default=3,
+        ge=1,
+        le=100,
+        description="Failed flushes of a batch (non-connection errors) before it is split row by row",
+    )
+    RISK_PERSIST_DEAD_LETTER_MAX: int = Field(
+        default=10_000,
+        ge=1,
+        description="Screenings kept in the Redis dead-letter list risk:persist:dead_letter",
+    )
+    RISK_PARTITION_MONTHS_AHEAD: int = Field(
+        default=3,
+        ge=1,
+        le=24,
+        description="Monthly risk_decisions partitions created ahead of time (Postgres)",
+    )
+    RISK_DECISION_HOT_MONTHS: int = Field(
+        default=6,
+        ge=1,
+        description="Months of decisions kept in Postgres; older partitions are archived to Parquet",
+    )
+    RISK_ARCHIVE_DIR: Path | None = Field(
+        default=None,
+        description="Durable directory (e.g. a mounted volume) for archived decision months; "
+        "unset keeps every partition in Postgres",
+    )
     RISK_UNSUPERVISED_ENABLED: bool = Field(
         default=False,
         description="If true, blend IsolationForest score when reference population is available",
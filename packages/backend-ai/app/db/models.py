@@ -6,11 +6,23 @@ import uuid
 from datetime import UTC, datetime
 from typing import Any
 
-from sqlalchemy import BigInteger, Boolean, DateTime, ForeignKey, Integer, String, Text, Uuid
+from sqlalchemy import (
+    BigInteger,
+    Boolean,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    Text,
+    Uuid,
+    text,
+)
 from sqlalchemy import JSON
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.db.base import Base
+from app.db.types import PackedVector
 
 
 class LensRecord(Base):
@@ -40,10 +52,69 @@ class LensRecord(Base):
     )
 
 
+class CohortModel(Base):
+    """Fitted cohort centers for one discovery window; the next window warm-starts from it.
+
+    A lineage is one (chain, protocol, feature_key, scaling); ``version`` counts within it and is
+    unique there.
+    ``centers`` are in the scaled space defined by ``scaler`` and row ``i`` is cohort id ``i``.
+    """
+
+    __tablename__ = "cohort_models"
+    __table_args__ = (
+        Index(
+            "ix_cohort_models_lineage",
+            "chain",
+            "protocol",
+            "feature_key",
+            "scaling",
+            "end_block",
+        ),
+        Index(
+            "uq_cohort_models_version",
+            "chain",
+            "protocol",
+            "feature_key",
+            "scaling",
+            "version",
+            unique=True,
+        ),
+    )
+
+    id: Mapped[uuid.UUID] = mapped_column(
+        Uuid(as_uuid=True),
+        primary_key=True,
+        default=uuid.uuid4,
+    )
+    chain: Mapped[str] = mapped_column(String(64))
+    protocol: Mapped[str] = mapped_column(String(128))
+    feature_key: Mapped[str] = mapped_column(String(256))
+    scaling: Mapped[str] = mapped_column(String(16))
+    engine: Mapped[str] = mapped_column(String(16))
+    k: Mapped[int] = mapped_column(Integer())
+    centers: Mapped[list[Any]] = mapped_column(JSON)
+    # {"center": [...], "scale": [...]} of the log-compressed features; null without scaling.
+    scaler: Mapped[dict[str, Any] | None] = mapped_column(JSON, nullable=True)
+    version: Mapped[int] = mapped_column(Integer())
+    parent_id: Mapped[uuid.UUID | None] = mapped_column(
+        Uuid(as_uuid=True),
+        ForeignKey("cohort_models.id", ondelete="SET NULL"),
+        nullable=True,
+    )
+    start_block: Mapped[int] = mapped_column(BigInteger())
+    end_block: Mapped[int] = mapped_column(BigInteger())
+    n_users: Mapped[int] = mapped_column(Integer())
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(UTC),
+    )
+
+
 class FeatureSnapshot(Base):
-    """Vector of subgraph-derived features for a screening window."""
+    """Vector of subgraph-derived features, stored once per distinct (chain, address, features)."""
 
     __tablename__ = "feature_snapshots"
+    __table_args__ = (Index("uq_feature_snapshots_content_hash", "content_hash", unique=True),)
 
     id: Mapped[uuid.UUID] = mapped_column(
         Uuid(as_uuid=True),
@@ -54,7 +125,8 @@ class FeatureSnapshot(Base):
     address: Mapped[str] = mapped_column(String(42), index=True)
     window_start_block: Mapped[int] = mapped_column(BigInteger())
     window_end_block: Mapped[int] = mapped_column(BigInteger())
-    features: Mapped[dict[str, Any]] = mapped_column(JSON)
+    features: Mapped[dict[str, Any]] = mapped_column(PackedVector("features"))
+    content_hash: Mapped[str | None] = mapped_column(String(64), nullable=True)
     subgraph_block_head: Mapped[int | None] = mapped_column(BigInteger(), nullable=True)
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True),
@@ -75,15 +147,21 @@ class RiskBatchJob(Base):
     chain_id: Mapped[str] = mapped_column(String(64))
     client_profile: Mapped[str] = mapped_column(String(32))
     addresses: Mapped[list[Any]] = mapped_column(JSON)
+    # Uploaded jobs keep ``addresses`` empty and read fixed-width records from this file.
+    addresses_path: Mapped[str | None] = mapped_column(String(512), nullable=True)
     window_preset: Mapped[str | None] = mapped_column(String(32), nullable=True)
     window_from_block: Mapped[int | None] = mapped_column(BigInteger(), nullable=True)
     window_to_block: Mapped[int | None] = mapped_column(BigInteger(), nullable=True)
     webhook_url: Mapped[str | None] = mapped_column(String(512), nullable=True)
     callback_secret: Mapped[str | None] = mapped_column(String(256), nullable=True)
     status: Mapped[str] = mapped_column(String(24), default="queued")
+    # Priority lane (urgent/normal/bulk) and fair-share tenant (hashed API key).
+    lane: Mapped[str] = mapped_column(String(16), default="normal")
+    tenant: Mapped[str] = mapped_column(String(64), default="default")
     processed: Mapped[int] = mapped_column(Integer(), default=0)
     total: Mapped[int] = mapped_column(Integer())
     error_message: Mapped[str | None] = mapped_column(Text(), nullable=True)
+    # Legacy whole-job blob; results now live in ``risk_batch_results``.
     results: Mapped[list[Any] | None] = mapped_column(JSON, nullable=True)
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True),
@@ -93,12 +171,47 @@ class RiskBatchJob(Base):
         DateTime(timezone=True),
         nullable=True,
     )
+    # Bumped on dispatch, on every chunk flush and on the finalizing claim.
+    heartbeat_at: Mapped[datetime | None] = mapped_column(
+        DateTime(timezone=True),
+        nullable=True,
+    )
+
+
+class RiskBatchResult(Base):
+    """One screened address of a batch job, written as its chunk flushes."""
+
+    __tablename__ = "risk_batch_results"
+
+    job_id: Mapped[uuid.UUID] = mapped_column(
+        Uuid(as_uuid=True),
+        ForeignKey("risk_batch_jobs.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    idx: Mapped[int] = mapped_column(Integer(), primary_key=True, autoincrement=False)
+    address: Mapped[str] = mapped_column(String(42))
+    risk_score: Mapped[int] = mapped_column(Integer())
+    severity: Mapped[str] = mapped_column(String(16))
+    decision_id: Mapped[uuid.UUID | None] = mapped_column(Uuid(as_uuid=True), nullable=True)
+    degraded: Mapped[bool] = mapped_column(Boolean(), default=False)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(UTC),
+    )
 
 
 class RiskDecision(Base):
     """Single screening outcome (online or batch)."""
 
     __tablename__ = "risk_decisions"
+    __table_args__ = (
+        Index(
+            "ix_risk_decisions_chain_address_created",
+            "chain_id",
+            "address",
+            text("created_at DESC"),
+        ),
+    )
 
     id: Mapped[uuid.UUID] = mapped_column(
         Uuid(as_uuid=True),
@@ -119,7 +232,7 @@ class RiskDecision(Base):
     model_version: Mapped[str] = mapped_column(String(64))
     ruleset_version: Mapped[str] = mapped_column(String(64))
     risk_reasons: Mapped[list[Any]] = mapped_column(JSON)
-    evidence: Mapped[dict[str, Any]] = mapped_column(JSON)
+    evidence: Mapped[dict[str, Any]] = mapped_column(PackedVector("evidence"))
     feature_snapshot_id: Mapped[uuid.UUID | None] = mapped_column(
         Uuid(as_uuid=True),
         ForeignKey("feature_snapshots.id", ondelete="SET NULL"),
@@ -134,10 +247,54 @@ class RiskDecision(Base):
     )
 
 
+class RiskDecisionLink(Base):
+    """A screening answered by reusing an earlier decision (see ``risk_reuse``)."""
+
+    __tablename__ = "risk_decision_links"
+
+    id: Mapped[uuid.UUID] = mapped_column(
+        Uuid(as_uuid=True),
+        primary_key=True,
+        default=uuid.uuid4,
+    )
+    # No FK: risk_decisions is partitioned (composite PK) and old months are archived.
+    decision_id: Mapped[uuid.UUID] = mapped_column(Uuid(as_uuid=True), index=True)
+    correlation_id: Mapped[str | None] = mapped_column(String(128), nullable=True, index=True)
+    batch_job_id: Mapped[uuid.UUID | None] = mapped_column(
+        Uuid(as_uuid=True),
+        ForeignKey("risk_batch_jobs.id", ondelete="SET NULL"),
+        nullable=True,
+        index=True,
+    )
+    chain_id: Mapped[str] = mapped_column(String(64))
+    address: Mapped[str] = mapped_column(String(42))
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(UTC),
+    )
+
+
 class RiskCase(Base):
-    """Compliance case tied to a wallet (chain-scoped)."""
+    """Compliance case tied to a wallet (chain-scoped); at most one open/in_review per wallet."""
 
     __tablename__ = "risk_cases"
+    __table_args__ = (
+        Index(
+            "uq_risk_cases_open_chain_address",
+            "chain_id",
+            "address",
+            unique=True,
+            postgresql_where=text("status IN ('open', 'in_review')"),
+            sqlite_where=text("status IN ('open', 'in_review')"),
+        ),
+        Index(
+            "ix_risk_cases_status_updated",
+            "status",
+            text("updated_at DESC"),
+            text("id DESC"),
+        ),
+        Index("ix_risk_cases_updated", text("updated_at DESC"), text("id DESC")),
+    )
 
     id: Mapped[uuid.UUID] = mapped_column(
         Uuid(as_uuid=True),
@@ -148,9 +305,9 @@ class RiskCase(Base):
     address: Mapped[str] = mapped_column(String(42), index=True)
     status: Mapped[str] = mapped_column(String(24), index=True)
     analyst_label: Mapped[str | None] = mapped_column(String(32), nullable=True)
+    # No FK: risk_decisions is partitioned (PK id, created_at) and old months are archived.
     latest_decision_id: Mapped[uuid.UUID | None] = mapped_column(
         Uuid(as_uuid=True),
-        ForeignKey("risk_decisions.id", ondelete="SET NULL"),
         nullable=True,
     )
     created_at: Mapped[datetime] = mapped_column(
@@ -207,6 +364,8 @@ class AmlWebhookEndpoint(Base):
     target_url: Mapped[str] = mapped_column(String(512))
     events: Mapped[list[Any]] = mapped_column(JSON)
     signing_secret: Mapped[str] = mapped_column(String(256))
+    # >1: alerts are delivered in signed envelopes of up to this many (see webhook_dispatcher).
+    batch_max_alerts: Mapped[int] = mapped_column(Integer(), default=1)
     active: Mapped[bool] = mapped_column(Boolean(), default=True)
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True),
@@ -215,7 +374,11 @@ class AmlWebhookEndpoint(Base):
 
 
 class AmlAlertDelivery(Base):
-    """Outbound webhook attempt log."""
+    """Outbound webhook attempt log.
+
+    Alert rows point at a registered endpoint; batch completion callback chunks instead point at
+    their job, whose ``webhook_url`` / ``callback_secret`` are the target.
+    """
 
     __tablename__ = "aml_alert_deliveries"
 
@@ -224,9 +387,16 @@ class AmlAlertDelivery(Base):
         primary_key=True,
         default=uuid.uuid4,
     )
-    webhook_endpoint_id: Mapped[uuid.UUID] = mapped_column(
+    webhook_endpoint_id: Mapped[uuid.UUID | None] = mapped_column(
         Uuid(as_uuid=True),
         ForeignKey("aml_webhook_endpoints.id", ondelete="CASCADE"),
+        nullable=True,
+        index=True,
+    )
+    batch_job_id: Mapped[uuid.UUID | None] = mapped_column(
+        Uuid(as_uuid=True),
+        ForeignKey("risk_batch_jobs.id", ondelete="CASCADE"),
+        nullable=True,
         index=True,
     )
     payload: Mapped[dict[str, Any]] = mapped_column(JSON)
@@ -0,0 +1,32 @@
+"""Custom column types."""
+
+from __future__ import annotations
+
+from typing import Any
+
+from sqlalchemy import LargeBinary
+from sqlalchemy.engine import Dialect
+from sqlalchemy.types import TypeDecorator
+
+from app.services.risk_feature_schema import decode_vector, encode_vector
+
+
+class PackedVector(TypeDecorator[dict[str, Any]]):
+    """Dict stored as a schema-versioned msgpack vector (see ``risk_feature_schema``)."""
+
+    impl = LargeBinary
+    cache_ok = True
+
+    def __init__(self, schema_name: str) -> None:
+        super().__init__()
+        self.schema_name = schema_name
+
+    def process_bind_param(self, value: dict[str, Any] | None, dialect: Dialect) -> bytes | None:
+        if value is None:
+            return None
+        return encode_vector(self.schema_name, value)
+
+    def process_result_value(self, value: bytes | None, dialect: Dialect) -> dict[str, Any] | None:
+        if value is None:
+            return None
+        return decode_vector(bytes(value))
@@ -5,6 +5,7 @@ from __future__ import annotations
 from fastapi import Header, HTTPException
 
 from app.core.config import settings
+from app.services.risk_fair_share import tenant_for_api_key
 
 
 async def require_risk_api_key(x_risk_api_key: str | None = Header(None, alias="X-Risk-Api-Key")) -> None:
@@ -13,3 +14,8 @@ async def require_risk_api_key(x_risk_api_key: str | None = Header(None, alias="
         return
     if not x_risk_api_key or x_risk_api_key not in keys:
         raise HTTPException(status_code=401, detail="Invalid or missing X-Risk-Api-Key")
+
+
+async def risk_tenant(x_risk_api_key: str | None = Header(None, alias="X-Risk-Api-Key")) -> str:
+    """Fair-share tenant of the caller, derived from its API key."""
+    return tenant_for_api_key(x_risk_api_key)
@@ -5,7 +5,7 @@ from decimal import Decimal
 
 from celery.result import AsyncResult
 from sqlalchemy import asc, desc, func, select
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.config import settings
 from app.db.models import LensRecord
@@ -38,8 +38,8 @@ def _to_model_type(row: LensRecord) -> ModelType:
     )
 
 
-def list_models(
-    db: Session,
+async def list_models(
+    db: AsyncSession,
     *,
     q: str | None,
     model_type: str | None,
@@ -78,12 +78,12 @@ def list_models(
     stmt = stmt.order_by(order_fn(order_col), asc(LensRecord.id))
 
     total_stmt = select(func.count()).select_from(stmt.subquery())
-    total = db.execute(total_stmt).scalar_one()
+    total = (await db.execute(total_stmt)).scalar_one()
 
     safe_page_size = max(1, min(page_size, 50))
     safe_page = max(1, page)
     offset = (safe_page - 1) * safe_page_size
-    rows = db.execute(stmt.offset(offset).limit(safe_page_size + 1)).scalars().all()
+    rows = (await db.scalars(stmt.offset(offset).limit(safe_page_size + 1))).all()
     has_next_page = len(rows) > safe_page_size
     rows = rows[:safe_page_size]
 
@@ -96,17 +96,17 @@ def list_models(
     )
 
 
-def get_model(db: Session, model_id: int) -> ModelType | None:
-    row = db.get(LensRecord, model_id)
+async def get_model(db: AsyncSession, model_id: int) -> ModelType | None:
+    row = await db.get(LensRecord, model_id)
     if row is None:
         return None
     return _to_model_type(row)
 
 
-def get_home_status(db: Session) -> HomeStatusType:
+async def get_home_status(db: AsyncSession) -> HomeStatusType:
     warnings: list[str] = []
     try:
-        models_count = db.execute(select(func.count(LensRecord.id))).scalar_one()
+        models_count = (await db.execute(select(func.count(LensRecord.id)))).scalar_one()
     except Exception:
         models_count = 0
         warnings.append("models_count_unavailable")
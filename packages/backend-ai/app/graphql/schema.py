@@ -4,7 +4,7 @@ import strawberry
 from strawberry.fastapi import BaseContext
 from strawberry.types import Info
 
-from app.db.session import SessionLocal
+from app.db.session import AsyncSessionLocal
 
 from .resolvers import (
     get_dashboard_summary,
@@ -25,7 +25,7 @@ from .types import (
 @strawberry.type
 class Query:
     @strawberry.field
-    def models(
+    async def models(
         self,
         info: Info[BaseContext, None],
         q: str | None = None,
@@ -39,7 +39,7 @@ class Query:
         page_size: int = 20,
     ) -> ModelConnectionType:
         db = info.context["db"]
-        return list_models(
+        return await list_models(
             db,
             q=q,
             model_type=model_type,
@@ -53,14 +53,14 @@ class Query:
         )
 
     @strawberry.field
-    def model(self, info: Info[BaseContext, None], id: int) -> ModelType | None:
+    async def model(self, info: Info[BaseContext, None], id: int) -> ModelType | None:
         db = info.context["db"]
-        return get_model(db, id)
+        return await get_model(db, id)
 
     @strawberry.field
-    def home_status(self, info: Info[BaseContext, None]) -> HomeStatusType:
+    async def home_status(self, info: Info[BaseContext, None]) -> HomeStatusType:
         db = info.context["db"]
-        return get_home_status(db)
+        return await get_home_status(db)
 
     @strawberry.field
     async def dashboard_summary(
@@ -86,6 +86,6 @@ schema = strawberry.Schema(query=Query)
 
 
 def get_context() -> dict[str, object]:
-    db = SessionLocal()
+    db = AsyncSessionLocal()
     return {"db": db}
 
@@ -6,6 +6,7 @@ from typing import cast
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from slowapi import _rate_limit_exceeded_handler
 from slowapi.errors import RateLimitExceeded
 from starlette.requests import Request
@@ -13,10 +14,12 @@ from starlette.responses import Response
 
 from app.core.config import settings
 from app.db.base import Base
-from app.db.session import engine
+from app.db.session import async_engine, engine
 from app.limiter import limiter
 from app.middleware.metrics import setup_prometheus
 from app.routers import alerts, auth, cohorts, graphql_api, huggingface, models, predictions, risk
+from app.services.clustering_pool import clustering_pool
+from app.services.risk_persistence import write_behind
 
 
 def _configure_logging() -> None:
@@ -45,7 +48,15 @@ _init_sentry()
 @asynccontextmanager
 async def lifespan(_app: FastAPI):
     Base.metadata.create_all(bind=engine)
-    yield
+    async with async_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    await write_behind.start()
+    await clustering_pool.start()
+    try:
+        yield
+    finally:
+        await clustering_pool.stop()
+        await write_behind.stop()
 
 
 app = FastAPI(title="CohortLens AI Backend", version="0.3.0", lifespan=lifespan)
@@ -73,6 +84,11 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(
+    GZipMiddleware,
+    minimum_size=settings.GZIP_MINIMUM_SIZE,
+    compresslevel=settings.GZIP_COMPRESS_LEVEL,
+)
 
 setup_prometheus(app)
 
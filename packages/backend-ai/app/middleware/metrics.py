@@ -5,6 +5,8 @@ from __future__ import annotations
 from app.core.config import settings
 from fastapi import FastAPI
 
+_retry_gauges_registered = False
+
 
 def setup_prometheus(app: FastAPI) -> None:
     """Instrument HTTP latency and expose ``/metrics``."""
@@ -13,3 +15,31 @@ def setup_prometheus(app: FastAPI) -> None:
     from prometheus_fastapi_instrumentator import Instrumentator
 
     Instrumentator().instrument(app).expose(app, endpoint="/metrics", include_in_schema=False)
+    _register_webhook_retry_gauges()
+
+
+def _register_webhook_retry_gauges() -> None:
+    """Retry delay-queue depth, read from Redis at scrape time (NaN while Redis is down)."""
+    import redis
+    from app.services.webhook_retry import backlog
+    from prometheus_client import Gauge
+
+    global _retry_gauges_registered
+    if _retry_gauges_registered:
+        return
+    _retry_gauges_registered = True
+
+    def _read(index: int) -> float:
+        try:
+            return float(backlog()[index])
+        except redis.RedisError:
+            return float("nan")
+
+    Gauge(
+        "cohortlens_webhook_retry_scheduled",
+        "Webhook deliveries waiting in the retry delay queue",
+    ).set_function(lambda: _read(0))
+    Gauge(
+        "cohortlens_webhook_retry_due",
+        "Webhook retries past their scheduled time and not yet drained",
+    ).set_function(lambda: _read(1))
@@ -1,59 +1,405 @@
-"""K-Means clustering for cohort discovery."""
+"""K-Means clustering for cohort discovery.
+
+Two engines: full ``KMeans`` and, for large populations, ``MiniBatchKMeans`` trained by streaming
+``partial_fit`` over shuffled batches of ``COHORT_MINIBATCH_BATCH_SIZE`` rows. Requests default to
+full ``KMeans`` on the raw features; ``engine="auto"`` switches at ``COHORT_MINIBATCH_MIN_USERS``
+and ``scaling="robust"`` log-compresses and median/IQR-scales features so ``volume`` does not
+dominate the distance. Centers are always reported in original units.
+
+``auto_k`` scores each candidate k on one seeded subsample (``COHORT_AUTO_K_SAMPLE_SIZE`` rows) by
+silhouette, so its cost does not grow with the population.
+
+A fit yields a :class:`ClusterState` (scaled-space centers plus scaler). Passing the previous
+window's state warm-starts the next fit: its scaler is reused, so both windows share one space,
+and its centers seed a single short run, so cohort ``i`` keeps meaning the same thing.
+"""
 
 from __future__ import annotations
 
+from dataclasses import dataclass
 from typing import Any
 
 import numpy as np
-from sklearn.cluster import KMeans
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from sklearn.metrics import silhouette_score
+from sklearn.preprocessing import RobustScaler
 
-from app.schemas.cohort import Cohort, CohortRequest, CohortResponse, UserProfile
+from app.core.config import settings
+from app.schemas.cohort import (
+    Cohort,
+    CohortMembers,
+    CohortRequest,
+    CohortResponse,
+    KDiagnostic,
+    UserProfile,
+)
 
 FEATURE_KEYS = ("tx_count", "volume", "avg_gas")
 
 
-def perform_clustering(
-    request: CohortRequest,
-    users: list[dict[str, Any]],
-) -> CohortResponse:
-    """Run K-Means clustering on user features and return cohort assignments."""
-    for f in request.features:
+def validate_features(features: list[str]) -> None:
+    for f in features:
         if f not in FEATURE_KEYS:
             raise ValueError(f"Unknown feature '{f}'; supported: {FEATURE_KEYS}")
 
-    if not users:
-        return CohortResponse(cohorts=[], total_users=0)
 
-    n_samples = len(users)
-    n_clusters = min(request.num_clusters, n_samples)
-    n_clusters = max(1, n_clusters)
+def cluster_count(requested: int, n_samples: int) -> int:
+    return max(1, min(requested, n_samples))
+
 
-    X = np.array([[float(u[f]) for f in request.features] for u in users])
+def feature_matrix(
+    users: list[dict[str, Any]],
+    features: list[str],
+    *,
+    out: np.ndarray | None = None,
+) -> np.ndarray:
+    """``(n_users, n_features)`` float64 matrix, filled column by column (into ``out`` if given)."""
+    X = out if out is not None else np.empty((len(users), len(features)), dtype=np.float64)
+    for j, f in enumerate(features):
+        X[:, j] = np.fromiter((float(u[f]) for u in users), dtype=np.float64, count=len(users))
+    return X
+
+
+Scaler = tuple[np.ndarray, np.ndarray]
+
+
+@dataclass
+class ClusterState:
+    """A fitted model: centers in scaled space and the ``(center, scale)`` that defines it."""
 
-    kmeans = KMeans(n_clusters=n_clusters, random_state=42, n_init=10)
+    centers: np.ndarray
+    scaler: Scaler | None = None
+
+
+def fit_kmeans(
+    X: np.ndarray,
+    n_clusters: int,
+    *,
+    init: np.ndarray | None = None,
+) -> tuple[np.ndarray, np.ndarray]:
+    """``(labels, centers)`` of a seeded K-Means fit, or one short run from ``init`` centers."""
+    if init is None:
+        kmeans = KMeans(n_clusters=n_clusters, random_state=42, n_init=10)
+    else:
+        kmeans = KMeans(
+            n_clusters=n_clusters,
+            init=init,
+            n_init=1,
+            max_iter=settings.COHORT_WARM_START_MAX_ITER,
+            random_state=42,
+        )
     labels = kmeans.fit_predict(X)
-    centers = kmeans.cluster_centers_
+    return labels, kmeans.cluster_centers_
+
+
+def fit_minibatch(
+    X: np.ndarray,
+    n_clusters: int,
+    *,
+    init: np.ndarray | None = None,
+    batch_size: int | None = None,
+    epochs: int | None = None,
+) -> tuple[np.ndarray, np.ndarray]:
+    """``(labels, centers)`` from streaming ``partial_fit``; memory beyond ``X`` is O(batch).
+
+    Warm-started from ``init`` centers, one pass over the data is enough by default.
+    """
+    # The first batch seeds the centers, so it needs at least ``n_clusters`` rows.
+    batch = max(batch_size or settings.COHORT_MINIBATCH_BATCH_SIZE, n_clusters)
+    rng = np.random.default_rng(42)
+    model = MiniBatchKMeans(
+        n_clusters=n_clusters,
+        init="k-means++" if init is None else init,
+        n_init=3 if init is None else 1,
+        random_state=42,
+        batch_size=batch,
+    )
+    passes = epochs or (settings.COHORT_MINIBATCH_EPOCHS if init is None else 1)
+    for _ in range(passes):
+        order = rng.permutation(len(X))
+        for i in range(0, len(X), batch):
+            model.partial_fit(X[order[i : i + batch]])
+    labels = np.concatenate([model.predict(X[i : i + batch]) for i in range(0, len(X), batch)])
+    return labels, model.cluster_centers_
+
+
+def resolve_engine(engine: str, n_samples: int) -> str:
+    if engine == "auto":
+        return "minibatch" if n_samples >= settings.COHORT_MINIBATCH_MIN_USERS else "kmeans"
+    return engine
+
+
+def _compress(X: np.ndarray) -> np.ndarray:
+    # On-chain counts and volumes are heavy-tailed: compress with a signed log first, or a few
+    # whales still own the distance after median/IQR scaling.
+    return np.sign(X) * np.log1p(np.abs(X))
+
+
+def fit_scaler(X: np.ndarray, scaling: str) -> Scaler | None:
+    """``(center, scale)`` of the log-compressed features, or ``None`` for ``scaling="none"``."""
+    if scaling != "robust":
+        return None
+    scaler = RobustScaler().fit(_compress(X))
+    return scaler.center_, scaler.scale_
+
+
+def apply_scaler(X: np.ndarray, scaler: Scaler | None) -> np.ndarray:
+    if scaler is None:
+        return X
+    center, scale = scaler
+    return (_compress(X) - center) / scale
+
+
+def fit_clusters(
+    X: np.ndarray,
+    n_clusters: int,
+    *,
+    engine: str = "kmeans",
+    scaling: str = "none",
+    warm: ClusterState | None = None,
+) -> tuple[np.ndarray, np.ndarray, ClusterState]:
+    """Scale, fit with a resolved ``engine``; centers come back in the units of ``X``."""
+    scaler = warm.scaler if warm is not None else fit_scaler(X, scaling)
+    Z = apply_scaler(X, scaler)
+    fit = fit_minibatch if engine == "minibatch" else fit_kmeans
+    labels, centers = fit(Z, n_clusters, init=warm.centers if warm is not None else None)
+    state = ClusterState(centers=centers, scaler=scaler)
+    if scaler is None:
+        return labels, centers, state
+    # Report member means in original units; an empty cluster keeps its unscaled centroid.
+    counts = np.bincount(labels, minlength=n_clusters)
+    sums = np.column_stack(
+        [np.bincount(labels, weights=X[:, j], minlength=n_clusters) for j in range(X.shape[1])],
+    )
+    unscaled = centers * scaler[1] + scaler[0]
+    centroids = np.sign(unscaled) * np.expm1(np.abs(unscaled))
+    filled = counts > 0
+    centroids[filled] = sums[filled] / counts[filled, None]
+    return labels, centroids, state
+
+
+def assign_to_centers(X: np.ndarray, state: ClusterState) -> tuple[np.ndarray, np.ndarray]:
+    """``(labels, distances)`` of each row's nearest center, measured in the model's scaled space.
+
+    One ``(n, k)`` distance matrix from a single product, so a row costs O(k) and a batch is one
+    BLAS call rather than a loop over addresses.
+    """
+    Z = apply_scaler(X, state.scaler)
+    C = state.centers
+    sq = (Z * Z).sum(axis=1)[:, None] - 2.0 * (Z @ C.T) + (C * C).sum(axis=1)[None, :]
+    labels = sq.argmin(axis=1)
+    # The expansion can dip slightly below zero through rounding.
+    nearest = np.maximum(sq[np.arange(len(Z)), labels], 0.0)
+    return labels, np.sqrt(nearest)
+
+
+def candidate_ks(k_min: int, k_max: int, n_samples: int) -> list[int]:
+    """Cluster counts auto_k can score; silhouette needs ``2 <= k < n_samples``."""
+    return list(range(max(k_min, 2), min(k_max, n_samples - 1) + 1))
+
+
+@dataclass
+class FitPlan:
+    """What a discovery will fit: k (unless auto_k candidates decide it), engines, warm start."""
+
+    n_clusters: int
+    engine: str
+    candidates: list[int]
+    sample_engine: str
+    warm: ClusterState | None
 
-    clusters: dict[int, list[dict[str, Any]]] = {i: [] for i in range(n_clusters)}
-    for label, user in zip(labels, users, strict=False):
-        clusters[label].append(user)
 
+def plan_fit(
+    request: CohortRequest,
+    n_samples: int,
+    warm: ClusterState | None = None,
+) -> FitPlan:
+    # A warm start fixes k; it is dropped when the window has fewer users than clusters.
+    if warm is not None and n_samples < len(warm.centers):
+        warm = None
+    engine = resolve_engine(request.engine, n_samples)
+    if warm is not None:
+        return FitPlan(len(warm.centers), engine, [], engine, warm)
+    sample = min(n_samples, settings.COHORT_AUTO_K_SAMPLE_SIZE)
+    return FitPlan(
+        n_clusters=cluster_count(request.num_clusters, n_samples),
+        engine=engine,
+        candidates=candidate_ks(request.k_min, request.k_max, n_samples) if request.auto_k else [],
+        sample_engine=resolve_engine(request.engine, sample),
+        warm=None,
+    )
+
+
+def sample_rows(n_samples: int, size: int | None = None) -> np.ndarray:
+    """Seeded subsample of row indices shared by every candidate k."""
+    size = size or settings.COHORT_AUTO_K_SAMPLE_SIZE
+    if n_samples <= size:
+        return np.arange(n_samples)
+    return np.sort(np.random.default_rng(42).choice(n_samples, size=size, replace=False))
+
+
+def evaluate_k(
+    X: np.ndarray,
+    k: int,
+    *,
+    engine: str = "kmeans",
+    scaling: str = "none",
+    sample_size: int | None = None,
+) -> dict[str, float]:
+    """Inertia and silhouette of a ``k``-cluster fit on the auto_k subsample of ``X``."""
+    sample = X[sample_rows(len(X), sample_size)]
+    Z = apply_scaler(sample, fit_scaler(sample, scaling))
+    fit = fit_minibatch if engine == "minibatch" else fit_kmeans
+    labels, centers = fit(Z, k)
+    # Duplicate-heavy samples can collapse into one cluster, where silhouette is undefined.
+    silhouette = silhouette_score(Z, labels) if len(np.unique(labels)) > 1 else -1.0
+    return {
+        "k": k,
+        "inertia": float(((Z - centers[labels]) ** 2).sum()),
+        "silhouette": float(silhouette),
+    }
+
+
+def select_k(diagnostics: list[dict[str, float]]) -> int:
+    """Highest silhouette; ties go to the smaller k."""
+    return int(max(diagnostics, key=lambda d: (d["silhouette"], -d["k"]))["k"])
+
+
+@dataclass(eq=False)
+class Membership:
+    """Members sorted by cohort; rows ``bounds[i - 1]:bounds[i]`` belong to cohort ``i``."""
+
+    features: list[str]
+    addresses: list[str]
+    X: np.ndarray
+    bounds: np.ndarray
+
+    def __eq__(self, other: object) -> bool:
+        # Responses compare their private attributes too, so compare arrays by value.
+        if not isinstance(other, Membership):
+            return NotImplemented
+        return (
+            self.features == other.features
+            and self.addresses == other.addresses
+            and np.array_equal(self.X, other.X)
+            and np.array_equal(self.bounds, other.bounds)
+        )
+
+    def cohort(self, i: int) -> tuple[list[str], np.ndarray]:
+        start = int(self.bounds[i - 1]) if i > 0 else 0
+        end = int(self.bounds[i])
+        return self.addresses[start:end], self.X[start:end]
+
+
+def build_response(
+    request: CohortRequest,
+    users: list[dict[str, Any]],
+    X: np.ndarray,
+    labels: np.ndarray,
+    centers: np.ndarray,
+    *,
+    engine: str | None = None,
+) -> CohortResponse:
+    """Group users by label; members are built only in the form the request embeds.
+
+    The grouped rows are always kept on the response (``_membership``) for the paginated store.
+    """
+    n_clusters = len(centers)
+    order = np.argsort(labels, kind="stable")
+    bounds = np.cumsum(np.bincount(labels, minlength=n_clusters))
+    membership = Membership(
+        features=list(request.features),
+        addresses=[users[m]["address"] for m in order.tolist()],
+        X=X[order],
+        bounds=bounds,
+    )
+    embed = request.members_format if request.include_members else None
     cohort_list = []
     for i in range(n_clusters):
-        center_dict = {feat: float(centers[i][j]) for j, feat in enumerate(request.features)}
-        user_profiles = [
-            UserProfile(
-                address=u["address"],
-                features={f: float(u[f]) for f in request.features},
+        addresses, rows = membership.cohort(i)
+        user_profiles = members = None
+        # Values come from the validated matrix, so skip per-member validation.
+        if embed == "profiles":
+            user_profiles = [
+                UserProfile.model_construct(
+                    address=address,
+                    features=dict(zip(request.features, row, strict=True)),
+                )
+                for address, row in zip(addresses, rows.tolist(), strict=True)
+            ]
+        elif embed == "columnar":
+            members = CohortMembers.model_construct(
+                addresses=addresses,
+                features={f: rows[:, j].tolist() for j, f in enumerate(request.features)},
             )
-            for u in clusters[i]
-        ]
-        cohort = Cohort(
-            id=i,
-            size=len(clusters[i]),
-            center=center_dict,
-            users=user_profiles,
+        cohort_list.append(
+            Cohort(
+                id=i,
+                size=len(addresses),
+                center={feat: float(centers[i][j]) for j, feat in enumerate(request.features)},
+                users=user_profiles,
+                members=members,
+            ),
         )
-        cohort_list.append(cohort)
+    response = CohortResponse(cohorts=cohort_list, total_users=len(users), engine=engine)
+    response._membership = membership
+    return response
+
+
+def with_k_selection(
+    response: CohortResponse,
+    diagnostics: list[dict[str, float]] | None,
+    *,
+    warm_started: bool = False,
+) -> CohortResponse:
+    if diagnostics is None and not warm_started:
+        return response
+    update: dict[str, Any] = {"warm_started": warm_started}
+    if diagnostics is not None:
+        update["selected_k"] = len(response.cohorts)
+        update["k_diagnostics"] = [KDiagnostic(**d) for d in diagnostics]
+    return response.model_copy(update=update)
+
 
-    return CohortResponse(cohorts=cohort_list, total_users=len(users))
+def cluster_users(
+    request: CohortRequest,
+    users: list[dict[str, Any]],
+    *,
+    warm: ClusterState | None = None,
+) -> tuple[CohortResponse, ClusterState | None]:
+    """Cluster ``users`` and also return the fitted state (``None`` when there were no users).
+
+    With ``warm`` the previous model fixes k, so ``num_clusters`` and ``auto_k`` are ignored.
+    """
+    validate_features(request.features)
+
+    if not users:
+        return CohortResponse(cohorts=[], total_users=0), None
+
+    plan = plan_fit(request, len(users), warm)
+    X = feature_matrix(users, request.features)
+    diagnostics = None
+    n_clusters = plan.n_clusters
+    if plan.candidates:
+        diagnostics = [
+            evaluate_k(X, k, engine=plan.sample_engine, scaling=request.scaling)
+            for k in plan.candidates
+        ]
+        n_clusters = select_k(diagnostics)
+    labels, centers, state = fit_clusters(
+        X,
+        n_clusters,
+        engine=plan.engine,
+        scaling=request.scaling,
+        warm=plan.warm,
+    )
+    response = build_response(request, users, X, labels, centers, engine=plan.engine)
+    return with_k_selection(response, diagnostics, warm_started=plan.warm is not None), state
+
+
+def perform_clustering(
+    request: CohortRequest,
+    users: list[dict[str, Any]],
+) -> CohortResponse:
+    """Run K-Means clustering on user features and return cohort assignments."""
+    return cluster_users(request, users)[0]
@@ -24,13 +24,20 @@ class ModelRegistryError(RuntimeError):
 class ModelRegistry:
     """Local paths and pickle/ONNX prediction."""
 
-    def __init__(self, db: Session, cache_dir: Path | None = None) -> None:
+    def __init__(self, db: Session | None = None, cache_dir: Path | None = None) -> None:
         self._db = db
         self._cache = cache_dir or settings.MODEL_CACHE_DIR
         self._cache.mkdir(parents=True, exist_ok=True)
 
     def get_lens_row(self, lens_id: int) -> LensRecord:
-        row = self._db.get(LensRecord, lens_id)
+        if self._db is None:
+            msg = "ModelRegistry was created without a database session"
+            raise ModelRegistryError(msg)
+        return self.check_lens_row(self._db.get(LensRecord, lens_id), lens_id)
+
+    @staticmethod
+    def check_lens_row(row: LensRecord | None, lens_id: int) -> LensRecord:
+        """Reject missing or inactive lenses (rows may come from a sync or async session)."""
         if row is None:
             msg = f"Lens {lens_id} not found in database"
             raise ModelRegistryError(msg)
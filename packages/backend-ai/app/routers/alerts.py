@@ -2,14 +2,17 @@
 
 from __future__ import annotations
 
+import asyncio
+
 from fastapi import APIRouter, Depends, Request
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db.models import AmlWebhookEndpoint
-from app.db.session import get_db
+from app.db.session import get_async_db
 from app.deps.risk_auth import require_risk_api_key
 from app.limiter import limiter
 from app.schemas.risk_api import AlertWebhookRegisterRequest, AlertWebhookRegisterResponse
+from app.services.webhook_index import bump_version
 
 router = APIRouter(dependencies=[Depends(require_risk_api_key)])
 
@@ -19,15 +22,17 @@ router = APIRouter(dependencies=[Depends(require_risk_api_key)])
 async def register_alert_webhook(
     request: Request,
     body: AlertWebhookRegisterRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ) -> AlertWebhookRegisterResponse:
     wh = AmlWebhookEndpoint(
         tenant_id=body.tenant_id,
         target_url=body.target_url,
         events=body.events,
         signing_secret=body.signing_secret,
+        batch_max_alerts=body.batch_max_alerts,
         active=True,
     )
     db.add(wh)
-    db.commit()
+    await db.commit()
+    await asyncio.to_thread(bump_version)
     return AlertWebhookRegisterResponse(webhook_id=str(wh.id))
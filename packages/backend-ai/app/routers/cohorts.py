@@ -4,15 +4,27 @@ from __future__ import annotations
 
 import asyncio
 import logging
-from functools import partial
+import uuid
+from typing import Literal
 
 import httpx
 import redis
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import Response
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.config import settings
-from app.models.clustering import perform_clustering
-from app.schemas.cohort import CohortRequest, CohortResponse
+from app.db.session import get_async_db
+from app.models.clustering import assign_to_centers, feature_matrix
+from app.schemas.cohort import (
+    CohortAssignment,
+    CohortAssignRequest,
+    CohortAssignResponse,
+    CohortMembersPage,
+    CohortRequest,
+    CohortResponse,
+)
 from app.services.blockchain_client import (
     build_fulfillment_bytes,
     build_prediction_input_bytes,
@@ -26,7 +38,26 @@ from app.services.chain_manager import (
     get_chain_config,
     is_oracle_configured_for_chain,
 )
-from app.services.graph_client import GraphClientError, fetch_user_metrics_for_block_range
+from app.services.clustering_pool import clustering_pool
+from app.services.cohort_members import (
+    ARROW_STREAM_MEDIA_TYPE,
+    page_ipc,
+    page_members,
+    read_page,
+    store_membership,
+)
+from app.services.cohort_models import (
+    CohortModelMismatch,
+    find_warm_start,
+    load_model,
+    save_model,
+    state_from_model,
+)
+from app.services.graph_client import (
+    GraphClientError,
+    fetch_user_metrics_for_addresses,
+    fetch_user_metrics_for_block_range,
+)
 from app.services.token_client import verify_prediction_payment_tx
 
 router = APIRouter()
@@ -34,7 +65,10 @@ _LOG = logging.getLogger(__name__)
 
 
 @router.post("/discover", response_model=CohortResponse)
-async def discover_cohorts(request: CohortRequest) -> CohortResponse:
+async def discover_cohorts(
+    request: CohortRequest,
+    db: AsyncSession = Depends(get_async_db),
+) -> CohortResponse:
     """Discover user cohorts via K-Means clustering on subgraph-backed features."""
     try:
         chain_cfg = get_chain_config(request.chain)
@@ -58,17 +92,48 @@ async def discover_cohorts(request: CohortRequest) -> CohortResponse:
     except httpx.HTTPError as e:
         raise HTTPException(status_code=502, detail=f"HTTP error querying subgraph: {e}") from e
 
-    loop = asyncio.get_running_loop()
+    parent = None
+    if request.warm_start:
+        try:
+            parent = await find_warm_start(db, request)
+        except CohortModelMismatch as e:
+            raise HTTPException(status_code=400, detail=str(e)) from e
+
     try:
-        response = await loop.run_in_executor(
-            None,
-            partial(perform_clustering, request, users),
+        response, state = await clustering_pool.perform(
+            request,
+            users,
+            warm=state_from_model(parent) if parent is not None else None,
         )
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e)) from e
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e)) from e
 
+    if state is not None:
+        try:
+            model = await save_model(
+                db,
+                request,
+                response,
+                state,
+                parent=parent if response.warm_started else None,
+            )
+            await db.commit()
+            response = response.model_copy(
+                update={"model_id": str(model.id), "model_version": model.version},
+            )
+        except SQLAlchemyError:
+            # The discovery itself succeeded; only the next window loses its warm start.
+            _LOG.exception("cohort model not saved")
+            await db.rollback()
+        if response.model_id is not None and response._membership is not None:
+            try:
+                await asyncio.to_thread(store_membership, response.model_id, response._membership)
+            except redis.RedisError:
+                # Only the members endpoint misses this discovery.
+                _LOG.exception("cohort members not stored")
+
     if not is_oracle_configured_for_chain(chain_cfg):
         set_cached_cohort_response(request, response, settings.COHORT_CACHE_TTL_SECONDS)
         return response
@@ -126,3 +191,100 @@ async def discover_cohorts(request: CohortRequest) -> CohortResponse:
             status_code=502,
             detail=f"Could not register oracle request: {e}",
         ) from e
+
+
+@router.post("/{model_id}/assign", response_model=CohortAssignResponse)
+async def assign_cohorts(
+    model_id: uuid.UUID,
+    request: CohortAssignRequest,
+    db: AsyncSession = Depends(get_async_db),
+) -> CohortAssignResponse:
+    """Place wallets in the nearest cohort of a saved model, without re-clustering."""
+    if len(request.addresses) > settings.COHORT_ASSIGN_MAX_ADDRESSES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"at most {settings.COHORT_ASSIGN_MAX_ADDRESSES} addresses per request",
+        )
+    model = await load_model(db, model_id)
+    if model is None:
+        raise HTTPException(status_code=404, detail="cohort model not found")
+    start_block = request.start_block if request.start_block is not None else model.start_block
+    end_block = request.end_block if request.end_block is not None else model.end_block
+
+    try:
+        chain_cfg = get_chain_config(model.chain)
+    except ChainManagerError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+
+    try:
+        users = await fetch_user_metrics_for_addresses(
+            request.addresses,
+            start_block,
+            end_block,
+            model.protocol,
+            subgraph_url=chain_cfg.subgraph_url,
+        )
+    except GraphClientError as e:
+        raise HTTPException(status_code=502, detail=str(e)) from e
+    except httpx.HTTPError as e:
+        raise HTTPException(status_code=502, detail=f"HTTP error querying subgraph: {e}") from e
+
+    X = feature_matrix(users, model.features)
+    labels, distances = assign_to_centers(X, model.state)
+    rows = X.tolist()
+    return CohortAssignResponse(
+        model_id=str(model.id),
+        model_version=model.version,
+        start_block=start_block,
+        end_block=end_block,
+        assignments=[
+            CohortAssignment(
+                address=u["address"],
+                cohort_id=label,
+                distance=distance,
+                features=dict(zip(model.features, row, strict=True)),
+            )
+            for u, label, distance, row in zip(
+                users,
+                labels.tolist(),
+                distances.tolist(),
+                rows,
+                strict=True,
+            )
+        ],
+    )
+
+
+@router.get("/{model_id}/members/{cohort_id}", response_model=CohortMembersPage)
+async def cohort_members(
+    model_id: uuid.UUID,
+    cohort_id: int,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(1000, ge=1, le=settings.COHORT_MEMBERS_PAGE_MAX),
+    fmt: Literal["columnar", "arrow"] = Query(
+        "columnar",
+        alias="format",
+        description="columnar: JSON parallel arrays; arrow: Arrow IPC stream",
+    ),
+) -> CohortMembersPage | Response:
+    """Page through one cohort's members of a saved discovery."""
+    try:
+        page = await asyncio.to_thread(read_page, str(model_id), cohort_id, offset, limit)
+    except redis.RedisError as e:
+        raise HTTPException(status_code=503, detail=f"Members store unavailable: {e}") from e
+    if page is None:
+        raise HTTPException(status_code=404, detail="cohort members not found or expired")
+    total, table = page
+    if fmt == "arrow":
+        return Response(
+            content=page_ipc(table),
+            media_type=ARROW_STREAM_MEDIA_TYPE,
+            headers={"X-Total-Count": str(total)},
+        )
+    return CohortMembersPage(
+        model_id=str(model_id),
+        cohort_id=cohort_id,
+        total=total,
+        offset=offset,
+        members=page_members(table),
+    )
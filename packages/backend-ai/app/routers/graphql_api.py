@@ -9,7 +9,7 @@ from graphql import parse
 from strawberry.fastapi import GraphQLRouter
 
 from app.core.config import settings
-from app.db.session import SessionLocal
+from app.db.session import AsyncSessionLocal
 from app.graphql.schema import schema
 
 
@@ -78,11 +78,8 @@ async def guarded_context(request: Request):
                 detail=f"GraphQL alias limit exceeded ({aliases}>{settings.GRAPHQL_MAX_ALIASES})",
             )
 
-    db = SessionLocal()
-    try:
+    async with AsyncSessionLocal() as db:
         yield {"db": db}
-    finally:
-        db.close()
 
 
 router = GraphQLRouter(
@@ -12,12 +12,12 @@ from fastapi import (
     UploadFile,
 )
 from sqlalchemy import select
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from web3 import Web3
 
 from app.core.config import settings
 from app.db.models import LensRecord
-from app.db.session import get_db
+from app.db.session import get_async_db
 from app.deps.auth_wallet import resolve_predict_auth
 from app.limiter import limiter
 from app.models.registry import (
@@ -86,7 +86,7 @@ def _verify_creator_stake(x_wallet_address: str | None) -> None:
         )
 
 
-def _sync_from_chain(db: Session) -> None:
+async def _sync_from_chain(db: AsyncSession) -> None:
     if not settings.COHORT_REGISTRY_ADDRESS:
         return
     w3 = get_web3(settings.SEPOLIA_RPC_URL)
@@ -94,7 +94,7 @@ def _sync_from_chain(db: Session) -> None:
     n = lens_count(w3, c)
     for i in range(1, n + 1):
         lens = get_lens(w3, c, i)
-        row = db.get(LensRecord, i)
+        row = await db.get(LensRecord, i)
         if row is None:
             row = LensRecord(
                 id=i,
@@ -115,17 +115,17 @@ def _sync_from_chain(db: Session) -> None:
             row.cid = str(lens["modelHash"])
             row.price_per_query_wei = int(lens["pricePerQuery"])
             row.active = bool(lens["active"])
-    db.commit()
+    await db.commit()
 
 
 @router.get("", response_model=list[LensPublic])
 async def list_models(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     sync_chain: bool = Query(False, description="Sync metadata from chain contract"),
 ) -> list[LensPublic]:
     if sync_chain and settings.COHORT_REGISTRY_ADDRESS:
-        _sync_from_chain(db)
-    rows = db.execute(select(LensRecord).order_by(LensRecord.id)).scalars().all()
+        await _sync_from_chain(db)
+    rows = (await db.scalars(select(LensRecord).order_by(LensRecord.id))).all()
     return [
         LensPublic(
             id=r.id,
@@ -144,8 +144,8 @@ async def list_models(
 
 
 @router.get("/{model_id}", response_model=LensDetail)
-async def get_model_detail(model_id: int, db: Session = Depends(get_db)) -> LensDetail:
-    row = db.get(LensRecord, model_id)
+async def get_model_detail(model_id: int, db: AsyncSession = Depends(get_async_db)) -> LensDetail:
+    row = await db.get(LensRecord, model_id)
     if row is None:
         raise HTTPException(status_code=404, detail=f"Lens {model_id} not found")
     sample_input: list[float] | None = None
@@ -153,7 +153,7 @@ async def get_model_detail(model_id: int, db: Session = Depends(get_db)) -> Lens
     if row.model_format.lower() == "onnx":
         # Keep this lightweight: if we cannot infer, we still return the core detail.
         try:
-            reg = ModelRegistry(db)
+            reg = ModelRegistry()
             feature_count = reg.infer_feature_count(row)
         except Exception:
             feature_count = None
@@ -179,7 +179,7 @@ async def get_model_detail(model_id: int, db: Session = Depends(get_db)) -> Lens
 @limiter.limit("60/minute")
 async def upload_model(
     request: Request,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     file: UploadFile = File(...),
     name: str = Form(...),
     description: str = Form(""),
@@ -230,7 +230,7 @@ async def upload_model(
     except Exception as e:
         raise HTTPException(status_code=502, detail=f"On-chain registration failed: {e}") from e
 
-    row = db.get(LensRecord, lens_id)
+    row = await db.get(LensRecord, lens_id)
     lens_onchain = get_lens(w3, c, lens_id)
     owner = Web3.to_checksum_address(str(lens_onchain["owner"]))
     if row is None:
@@ -256,7 +256,7 @@ async def upload_model(
         row.model_format = fmt
         row.model_type = model_type
         row.chain_tx_hash = tx_hash
-    db.commit()
+    await db.commit()
 
     return LensUploadResponse(lens_id=lens_id, cid=cid, tx_hash=tx_hash)
 
@@ -267,13 +267,13 @@ async def predict(
     request: Request,
     model_id: int,
     body: PredictRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     _: str | None = Depends(resolve_predict_auth),
     async_mode: bool = Query(False),
 ) -> PredictResponse:
-    reg = ModelRegistry(db)
+    reg = ModelRegistry()
     try:
-        row = reg.get_lens_row(model_id)
+        row = reg.check_lens_row(await db.get(LensRecord, model_id), model_id)
     except ModelRegistryError as e:
         raise HTTPException(status_code=404, detail=str(e)) from e
 
@@ -2,30 +2,57 @@
 
 from __future__ import annotations
 
-from uuid import UUID
+import asyncio
+import json
+import re
+from collections.abc import AsyncIterator
+from datetime import UTC, datetime, timedelta
+from typing import Any, Literal
+from uuid import UUID, uuid4
 
-from fastapi import APIRouter, Depends, HTTPException, Request
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, Header, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy import and_, func, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.config import settings
-from app.db.models import RiskBatchJob, RiskCase, RiskCaseNote, RiskDecision
-from app.db.session import get_db
-from app.deps.risk_auth import require_risk_api_key
+from app.db.models import RiskBatchJob, RiskBatchResult, RiskCase, RiskCaseNote, RiskDecision
+from app.db.session import get_async_db
+from app.deps.risk_auth import require_risk_api_key, risk_tenant
 from app.limiter import limiter
 from app.schemas.risk_api import (
     RiskBatchAccepted,
     RiskBatchRequest,
+    RiskBatchResultOut,
+    RiskBatchResultsPage,
     RiskBatchStatusResponse,
+    RiskBatchUploadAccepted,
     RiskCaseDetailOut,
     RiskCaseNoteCreate,
     RiskCaseNoteOut,
     RiskCaseOut,
+    RiskCasePage,
     RiskCasePatch,
+    RiskDecisionOut,
+    RiskDecisionPage,
     RiskScreenRequest,
     RiskScreenResponse,
+    RiskScreenStreamRequest,
+)
+from app.services.risk_archive import read_archived_decisions
+from app.services.risk_batch_progress import get_processed
+from app.services.risk_batch_upload import AddressSpool, UploadError, upload_dir
+from app.services.risk_engine import run_online_screen, stream_online_screens
+from app.services.risk_fair_share import lane_for_job, queue_for_lane
+from app.services.risk_history import (
+    InvalidCursor,
+    cases_page_stmt,
+    decision_history_stmt,
+    decode_cursor,
+    page_size,
+    split_page,
 )
-from app.services.risk_engine import run_online_screen
-from app.services.risk_webhooks import queue_alerts_for_decision
 from app.tasks.aml_tasks import run_risk_batch_job
 
 router = APIRouter(dependencies=[Depends(require_risk_api_key)])
@@ -44,7 +71,7 @@ def _subgraph_for_chain(chain_id: str) -> str:
 async def risk_screen(
     request: Request,
     body: RiskScreenRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ) -> RiskScreenResponse:
     """Real-time wallet screening (Aave v3 subgraph scope)."""
     opts = body.options
@@ -60,17 +87,45 @@ async def risk_screen(
         body.correlation_id,
         hints,
     )
-    if out.get("decision_id"):
-        queue_alerts_for_decision(db, UUID(out["decision_id"]))
     return RiskScreenResponse(**out)
 
 
+@router.post("/screen/stream")
+@limiter.limit("12/minute")
+async def risk_screen_stream(
+    request: Request,
+    body: RiskScreenStreamRequest,
+) -> StreamingResponse:
+    """Screen many wallets concurrently; one NDJSON line per decision, in completion order."""
+    if len(body.addresses) > settings.RISK_STREAM_MAX_ADDRESSES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.RISK_STREAM_MAX_ADDRESSES} addresses per stream",
+        )
+    subgraph = _subgraph_for_chain(body.chain_id)
+    hints = bool(body.options.include_graph_hints if body.options else False)
+
+    async def _lines() -> AsyncIterator[str]:
+        async for row in stream_online_screens(
+            subgraph,
+            body.chain_id,
+            body.addresses,
+            body.client_profile,
+            body.correlation_id,
+            hints,
+        ):
+            yield json.dumps(row, separators=(",", ":")) + "\n"
+
+    return StreamingResponse(_lines(), media_type="application/x-ndjson")
+
+
 @router.post("/batch", response_model=RiskBatchAccepted)
 @limiter.limit("12/minute")
 async def risk_batch_enqueue(
     request: Request,
     body: RiskBatchRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
+    tenant: str = Depends(risk_tenant),
 ) -> RiskBatchAccepted:
     if len(body.addresses) > settings.RISK_BATCH_MAX_ADDRESSES:
         raise HTTPException(
@@ -89,13 +144,78 @@ async def risk_batch_enqueue(
         webhook_url=body.webhook_url,
         callback_secret=body.callback_secret,
         status="queued",
+        lane=lane_for_job(len(body.addresses), body.priority),
+        tenant=tenant,
         total=len(body.addresses),
     )
     db.add(job)
-    db.commit()
-    db.refresh(job)
-    run_risk_batch_job.delay(str(job.id))
-    return RiskBatchAccepted(job_id=str(job.id))
+    await db.commit()
+    run_risk_batch_job.apply_async((str(job.id),), queue=queue_for_lane(job.lane))
+    return RiskBatchAccepted(job_id=str(job.id), lane=job.lane)
+
+
+@router.post("/batch/upload", response_model=RiskBatchUploadAccepted)
+@limiter.limit("12/minute")
+async def risk_batch_upload(
+    request: Request,
+    chain_id: str,
+    client_profile: Literal["exchange", "dapp", "custody"] = "dapp",
+    window_preset: Literal["last_7d"] | None = None,
+    webhook_url: str | None = None,
+    priority: Literal["urgent", "normal", "bulk"] | None = None,
+    x_callback_secret: str | None = Header(default=None),
+    db: AsyncSession = Depends(get_async_db),
+    tenant: str = Depends(risk_tenant),
+) -> RiskBatchUploadAccepted:
+    """Batch job from a streamed request body: one address per line (or first CSV column).
+
+    The body is spooled to ``RISK_BATCH_UPLOAD_DIR`` as it arrives and deduplicated there, so
+    uploads of millions of addresses never sit in memory or in a JSON column.
+
+    Results do not follow upload order: deduplication leaves the addresses grouped by their first
+    byte and sorted, and each result's ``index`` is its position in that order. Match results to
+    the upload by ``address``.
+    """
+    _subgraph_for_chain(chain_id)
+    job_id = uuid4()
+    spool = AddressSpool(upload_dir(str(job_id)))
+    try:
+        async for chunk in request.stream():
+            await asyncio.to_thread(spool.feed, chunk)
+        total = await asyncio.to_thread(spool.finish)
+    except UploadError as e:
+        spool.discard()
+        raise HTTPException(status_code=400, detail=str(e)) from e
+    except BaseException:
+        spool.discard()
+        raise
+    if total == 0:
+        spool.discard()
+        raise HTTPException(status_code=400, detail="No valid addresses in upload")
+
+    job = RiskBatchJob(
+        id=job_id,
+        chain_id=chain_id.lower(),
+        client_profile=client_profile,
+        addresses=[],
+        addresses_path=str(spool.path),
+        window_preset=window_preset,
+        webhook_url=webhook_url,
+        callback_secret=x_callback_secret,
+        status="queued",
+        lane=lane_for_job(total, priority),
+        tenant=tenant,
+        total=total,
+    )
+    db.add(job)
+    await db.commit()
+    run_risk_batch_job.apply_async((str(job.id),), queue=queue_for_lane(job.lane))
+    return RiskBatchUploadAccepted(
+        job_id=str(job.id),
+        lane=job.lane,
+        total=total,
+        rejected=spool.rejected,
+    )
 
 
 @router.get("/batch/{job_id}", response_model=RiskBatchStatusResponse)
@@ -103,53 +223,233 @@ async def risk_batch_enqueue(
 async def risk_batch_status(
     request: Request,
     job_id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ) -> RiskBatchStatusResponse:
     try:
         jid = UUID(job_id)
     except ValueError as e:
         raise HTTPException(status_code=400, detail="Invalid job_id") from e
-    job = db.get(RiskBatchJob, jid)
+    job = await db.get(RiskBatchJob, jid)
     if job is None:
         raise HTTPException(status_code=404, detail="Job not found")
+    processed = job.processed
+    if job.status == "running":
+        processed = max(processed, await asyncio.to_thread(get_processed, str(job.id)) or 0)
     return RiskBatchStatusResponse(
         job_id=str(job.id),
         status=job.status,
-        processed=job.processed,
+        processed=processed,
         total=job.total,
         error_message=job.error_message,
         results=job.results,
     )
 
 
+def _case_out(c: RiskCase) -> RiskCaseOut:
+    return RiskCaseOut(
+        id=str(c.id),
+        chain_id=c.chain_id,
+        address=c.address,
+        status=c.status,
+        analyst_label=c.analyst_label,
+        latest_decision_id=str(c.latest_decision_id) if c.latest_decision_id else None,
+        created_at=c.created_at.isoformat(),
+        updated_at=c.updated_at.isoformat(),
+    )
+
+
+def _decision_out(d: RiskDecision | dict[str, Any]) -> RiskDecisionOut:
+    archived = isinstance(d, dict)
+    row = (
+        d
+        if archived
+        else {k: getattr(d, k) for k in RiskDecisionOut.model_fields if k != "archived"}
+    )
+    return RiskDecisionOut(
+        **{
+            **row,
+            "id": str(row["id"]),
+            "evidence": row["evidence"] or {},
+            "created_at": row["created_at"].isoformat(),
+        },
+        archived=archived,
+    )
+
+
+@router.get("/addresses/{chain_id}/{address}/decisions", response_model=RiskDecisionPage)
+@limiter.limit(settings.RATE_LIMIT_DEFAULT)
+async def list_address_decisions(
+    request: Request,
+    chain_id: str,
+    address: str,
+    db: AsyncSession = Depends(get_async_db),
+    cursor: str | None = None,
+    limit: int = 50,
+    include_archived: bool = False,
+) -> RiskDecisionPage:
+    """Decision history for one wallet, newest first; pass ``next_cursor`` back for the next page.
+
+    With ``include_archived`` the history continues into months archived out of Postgres.
+    """
+    addr = address.strip().lower()
+    if not re.fullmatch(r"0x[a-f0-9]{40}", addr):
+        raise HTTPException(status_code=400, detail="address must be 0x-prefixed 20-byte hex")
+    size = page_size(limit)
+    try:
+        stmt = decision_history_stmt(chain_id.lower(), addr, cursor=cursor, limit=size)
+        rows: list[Any] = list((await db.scalars(stmt)).all())
+        if include_archived and len(rows) <= size:
+            last = rows[-1] if rows else None
+            before = (
+                (last.created_at, last.id) if last else (decode_cursor(cursor) if cursor else None)
+            )
+            rows += await asyncio.to_thread(
+                read_archived_decisions,
+                chain_id=chain_id.lower(),
+                address=addr,
+                before=before,
+                limit=size + 1 - len(rows),
+            )
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+    page, next_cursor = split_page(rows, size, "created_at")
+    return RiskDecisionPage(items=[_decision_out(d) for d in page], next_cursor=next_cursor)
+
+
+@router.post("/batch/{job_id}/resume", response_model=RiskBatchAccepted)
+@limiter.limit("12/minute")
+async def risk_batch_resume(
+    request: Request,
+    job_id: str,
+    db: AsyncSession = Depends(get_async_db),
+) -> RiskBatchAccepted:
+    """Re-dispatch a failed or stalled job; addresses with results are not screened again.
+
+    A queued, running or finalizing job is only stalled once it has made no progress for
+    ``RISK_BATCH_STALE_SECONDS``; resuming a live job would run its chunks twice.
+    """
+    try:
+        jid = UUID(job_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail="Invalid job_id") from e
+    job = await db.get(RiskBatchJob, jid)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job.status == "completed":
+        raise HTTPException(status_code=409, detail="Job already completed")
+    now = datetime.now(UTC)
+    stale = func.coalesce(RiskBatchJob.heartbeat_at, RiskBatchJob.created_at) < now - timedelta(
+        seconds=settings.RISK_BATCH_STALE_SECONDS,
+    )
+    # Conditional claim: two concurrent resumes cannot both re-dispatch the job.
+    claimed = (
+        await db.execute(
+            update(RiskBatchJob)
+            .where(
+                RiskBatchJob.id == jid,
+                or_(
+                    RiskBatchJob.status == "failed",
+                    and_(RiskBatchJob.status.in_(("queued", "running", "finalizing")), stale),
+                ),
+            )
+            .values(status="queued", error_message=None, completed_at=None, heartbeat_at=now)
+            .execution_options(synchronize_session=False),
+        )
+    ).rowcount
+    await db.commit()
+    if not claimed:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Job is {job.status} and still making progress; resume only failed or stalled jobs",
+        )
+    run_risk_batch_job.apply_async((str(job.id),), queue=queue_for_lane(job.lane))
+    return RiskBatchAccepted(job_id=str(job.id), lane=job.lane)
+
+
+@router.get("/batch/{job_id}/results", response_model=RiskBatchResultsPage)
+@limiter.limit(settings.RATE_LIMIT_DEFAULT)
+async def risk_batch_results(
+    request: Request,
+    job_id: str,
+    db: AsyncSession = Depends(get_async_db),
+    cursor: str | None = None,
+    limit: int = 100,
+) -> RiskBatchResultsPage:
+    """Per-address results in input order, available while the job is still running."""
+    try:
+        jid = UUID(job_id)
+        after = int(cursor) if cursor else -1
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail="Invalid job_id or cursor") from e
+    if await db.get(RiskBatchJob, jid) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    size = page_size(limit)
+    rows = (
+        await db.scalars(
+            select(RiskBatchResult)
+            .where(RiskBatchResult.job_id == jid, RiskBatchResult.idx > after)
+            .order_by(RiskBatchResult.idx)
+            .limit(size + 1),
+        )
+    ).all()
+    page = rows[:size]
+    return RiskBatchResultsPage(
+        items=[
+            RiskBatchResultOut(
+                index=r.idx,
+                address=r.address,
+                risk_score=r.risk_score,
+                severity=r.severity,
+                decision_id=str(r.decision_id) if r.decision_id else None,
+                degraded=r.degraded,
+            )
+            for r in page
+        ],
+        next_cursor=str(page[-1].idx) if len(rows) > size else None,
+    )
+
+
+@router.get("/cases/page", response_model=RiskCasePage)
+@limiter.limit(settings.RATE_LIMIT_DEFAULT)
+async def list_cases_page(
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+    status: str | None = None,
+    chain_id: str | None = None,
+    cursor: str | None = None,
+    limit: int = 50,
+) -> RiskCasePage:
+    """Cursor-paginated ``/cases`` (``updated_at DESC, id DESC``)."""
+    size = page_size(limit)
+    try:
+        stmt = cases_page_stmt(
+            status=status,
+            chain_id=chain_id.lower() if chain_id else None,
+            cursor=cursor,
+            limit=size,
+        )
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+    page, next_cursor = split_page(list((await db.scalars(stmt)).all()), size, "updated_at")
+    return RiskCasePage(items=[_case_out(c) for c in page], next_cursor=next_cursor)
+
+
 @router.get("/cases", response_model=list[RiskCaseOut])
 @limiter.limit(settings.RATE_LIMIT_DEFAULT)
 async def list_cases(
     request: Request,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     status: str | None = None,
     chain_id: str | None = None,
     limit: int = 50,
 ) -> list[RiskCaseOut]:
-    q = db.query(RiskCase).order_by(RiskCase.updated_at.desc())
+    stmt = select(RiskCase).order_by(RiskCase.updated_at.desc())
     if status:
-        q = q.filter(RiskCase.status == status)
+        stmt = stmt.where(RiskCase.status == status)
     if chain_id:
-        q = q.filter(RiskCase.chain_id == chain_id.lower())
-    rows = q.limit(min(limit, 200)).all()
-    return [
-        RiskCaseOut(
-            id=str(c.id),
-            chain_id=c.chain_id,
-            address=c.address,
-            status=c.status,
-            analyst_label=c.analyst_label,
-            latest_decision_id=str(c.latest_decision_id) if c.latest_decision_id else None,
-            created_at=c.created_at.isoformat(),
-            updated_at=c.updated_at.isoformat(),
-        )
-        for c in rows
-    ]
+        stmt = stmt.where(RiskCase.chain_id == chain_id.lower())
+    rows = (await db.scalars(stmt.limit(min(limit, 200)))).all()
+    return [_case_out(c) for c in rows]
 
 
 @router.get("/cases/{case_id}", response_model=RiskCaseDetailOut)
@@ -157,21 +457,22 @@ async def list_cases(
 async def get_case(
     request: Request,
     case_id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ) -> RiskCaseDetailOut:
     try:
         cid = UUID(case_id)
     except ValueError as e:
         raise HTTPException(status_code=400, detail="Invalid case_id") from e
-    c = db.get(RiskCase, cid)
+    c = await db.get(RiskCase, cid)
     if c is None:
         raise HTTPException(status_code=404, detail="Case not found")
     notes = (
-        db.query(RiskCaseNote)
-        .filter(RiskCaseNote.case_id == cid)
-        .order_by(RiskCaseNote.created_at.asc())
-        .all()
-    )
+        await db.scalars(
+            select(RiskCaseNote)
+            .where(RiskCaseNote.case_id == cid)
+            .order_by(RiskCaseNote.created_at.asc()),
+        )
+    ).all()
     return RiskCaseDetailOut(
         id=str(c.id),
         chain_id=c.chain_id,
@@ -199,21 +500,28 @@ async def patch_case(
     request: Request,
     case_id: str,
     body: RiskCasePatch,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ) -> RiskCaseOut:
     try:
         cid = UUID(case_id)
     except ValueError as e:
         raise HTTPException(status_code=400, detail="Invalid case_id") from e
-    c = db.get(RiskCase, cid)
+    c = await db.get(RiskCase, cid)
     if c is None:
         raise HTTPException(status_code=404, detail="Case not found")
     if body.status is not None:
         c.status = body.status
     if body.analyst_label is not None:
         c.analyst_label = body.analyst_label
-    db.commit()
-    db.refresh(c)
+    try:
+        await db.commit()
+    except IntegrityError as e:
+        await db.rollback()
+        raise HTTPException(
+            status_code=409,
+            detail="Another open case already exists for this wallet",
+        ) from e
+    await db.refresh(c)
     return RiskCaseOut(
         id=str(c.id),
         chain_id=c.chain_id,
@@ -232,19 +540,18 @@ async def add_case_note(
     request: Request,
     case_id: str,
     body: RiskCaseNoteCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ) -> RiskCaseNoteOut:
     try:
         cid = UUID(case_id)
     except ValueError as e:
         raise HTTPException(status_code=400, detail="Invalid case_id") from e
-    c = db.get(RiskCase, cid)
+    c = await db.get(RiskCase, cid)
     if c is None:
         raise HTTPException(status_code=404, detail="Case not found")
     note = RiskCaseNote(case_id=cid, author=body.author, body=body.body)
     db.add(note)
-    db.commit()
-    db.refresh(note)
+    await db.commit()
     return RiskCaseNoteOut(
         id=str(note.id),
         author=note.author,
@@ -258,20 +565,30 @@ async def add_case_note(
 async def case_graph_mvp(
     request: Request,
     case_id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ) -> dict:
     """Minimal graph: center wallet + nodes/edges from latest decision evidence."""
     try:
         cid = UUID(case_id)
     except ValueError as e:
         raise HTTPException(status_code=400, detail="Invalid case_id") from e
-    c = db.get(RiskCase, cid)
+    c = await db.get(RiskCase, cid)
     if c is None or c.latest_decision_id is None:
         raise HTTPException(status_code=404, detail="Case or decision not found")
-    dec = db.get(RiskDecision, c.latest_decision_id)
-    if dec is None:
-        raise HTTPException(status_code=404, detail="Decision not found")
-    ev = dec.evidence or {}
+    dec = await db.get(RiskDecision, c.latest_decision_id)
+    if dec is not None:
+        decision_id, ev = dec.id, dec.evidence or {}
+    else:
+        archived = await asyncio.to_thread(
+            read_archived_decisions,
+            chain_id=c.chain_id,
+            address=c.address,
+            decision_id=c.latest_decision_id,
+            limit=1,
+        )
+        if not archived:
+            raise HTTPException(status_code=404, detail="Decision not found")
+        decision_id, ev = archived[0]["id"], archived[0]["evidence"]
     txs = ev.get("supporting_tx_ids") or []
     center = c.address.lower()
     nodes = [{"id": center, "label": "wallet", "kind": "address"}]
@@ -283,4 +600,4 @@ async def case_graph_mvp(
     hints = ev.get("graph_hints") or {}
     if hints:
         nodes.append({"id": "meta-hints", "label": "hint", "kind": "summary"})
-    return {"nodes": nodes, "edges": edges, "decision_id": str(dec.id)}
+    return {"nodes": nodes, "edges": edges, "decision_id": str(decision_id)}
@@ -1,7 +1,11 @@
 """Schemas for cohort discovery API."""
 
 
-from pydantic import BaseModel, Field, field_validator
+import re
+from typing import Any, Literal
+from uuid import UUID
+
+from pydantic import BaseModel, Field, PrivateAttr, field_validator, model_validator
 
 
 class UserProfile(BaseModel):
@@ -11,13 +15,21 @@ class UserProfile(BaseModel):
     features: dict[str, float]
 
 
+class CohortMembers(BaseModel):
+    """Members as parallel arrays: ``features[name][i]`` belongs to ``addresses[i]``."""
+
+    addresses: list[str]
+    features: dict[str, list[float]]
+
+
 class Cohort(BaseModel):
-    """A cluster of users with centroid and optional user list."""
+    """A cluster of users with centroid and optional members (``users`` or columnar ``members``)."""
 
     id: int
     size: int
     center: dict[str, float]
     users: list[UserProfile] | None = None
+    members: CohortMembers | None = None
 
 
 def _default_features() -> list[str]:
@@ -39,6 +51,35 @@ class CohortRequest(BaseModel):
         default_factory=_default_features,
         description="Feature names for clustering",
     )
+    engine: Literal["auto", "kmeans", "minibatch"] = Field(
+        default="kmeans",
+        description="Clustering engine; auto picks minibatch from COHORT_MINIBATCH_MIN_USERS users",
+    )
+    scaling: Literal["robust", "none"] = Field(
+        default="none",
+        description="robust: log-compress and median/IQR-scale features before clustering",
+    )
+    auto_k: bool = Field(
+        default=False,
+        description="Pick the number of clusters in [k_min, k_max] by subsampled silhouette",
+    )
+    k_min: int = Field(default=2, ge=2, le=200)
+    k_max: int = Field(default=10, ge=2, le=200)
+    warm_start: bool = Field(
+        default=False,
+        description="Start from the latest saved model of this chain/protocol/features/scaling "
+        "(or model_id) ending at or before end_block; keeps its k and cohort ids",
+    )
+    model_id: UUID | None = Field(default=None, description="Saved cohort model to warm-start from")
+    include_members: bool = Field(
+        default=True,
+        description="Embed each cohort's members; false returns sizes and centers only "
+        "(page members via GET /cohorts/{model_id}/members/{cohort_id})",
+    )
+    members_format: Literal["profiles", "columnar"] = Field(
+        default="profiles",
+        description="profiles: users as address/features objects; columnar: parallel arrays",
+    )
     payment_tx_hash: str | None = Field(
         default=None,
         description="Tx hash of user-paid requestPrediction (required when REQUIRE_LENS_PAYMENT_FOR_DISCOVER)",
@@ -55,12 +96,32 @@ class CohortRequest(BaseModel):
             raise ValueError("features cannot be empty")
         return v
 
+    @model_validator(mode="after")
+    def k_range_ordered(self) -> "CohortRequest":
+        if self.k_min > self.k_max:
+            raise ValueError("k_min must not exceed k_max")
+        return self
+
+
+class KDiagnostic(BaseModel):
+    """Score of one candidate cluster count, on the auto_k subsample (scaled space)."""
+
+    k: int
+    inertia: float
+    silhouette: float
+
 
 class CohortResponse(BaseModel):
     """Response with discovered cohorts and total user count."""
 
     cohorts: list[Cohort]
     total_users: int
+    engine: str | None = Field(default=None, description="Clustering engine that ran")
+    selected_k: int | None = Field(default=None, description="Cluster count chosen by auto_k")
+    k_diagnostics: list[KDiagnostic] | None = None
+    model_id: str | None = Field(default=None, description="Saved cohort model of this discovery")
+    model_version: int | None = None
+    warm_started: bool = False
     oracle_request_id: int | None = Field(
         default=None,
         description="Request id on CohortOracle (e.g. Sepolia) if sent on-chain",
@@ -69,3 +130,60 @@ class CohortResponse(BaseModel):
         default=None,
         description="requestPrediction transaction hash, if applicable",
     )
+
+    # Members grouped by cohort (``app.models.clustering.Membership``) for the paginated store;
+    # never serialized.
+    _membership: Any = PrivateAttr(default=None)
+
+
+class CohortMembersPage(BaseModel):
+    """One page of a cohort's members, in discovery order."""
+
+    model_id: str
+    cohort_id: int
+    total: int
+    offset: int
+    members: CohortMembers
+
+
+class CohortAssignRequest(BaseModel):
+    """Wallets to place in a saved model's cohorts."""
+
+    addresses: list[str] = Field(
+        ...,
+        min_length=1,
+        description="Wallets to assign (at most COHORT_ASSIGN_MAX_ADDRESSES)",
+    )
+    start_block: int | None = Field(
+        default=None,
+        description="Feature window start; defaults to the model's window",
+    )
+    end_block: int | None = Field(default=None, description="Feature window end")
+
+    @field_validator("addresses")
+    @classmethod
+    def normalize_addresses(cls, v: list[str]) -> list[str]:
+        out = [a.strip().lower() for a in v]
+        for a in out:
+            if not re.fullmatch(r"0x[a-f0-9]{40}", a):
+                raise ValueError(f"invalid address {a!r}: must be 0x-prefixed 20-byte hex")
+        return out
+
+
+class CohortAssignment(BaseModel):
+    """Nearest cohort of one wallet; ``distance`` is in the model's scaled feature space."""
+
+    address: str
+    cohort_id: int
+    distance: float
+    features: dict[str, float]
+
+
+class CohortAssignResponse(BaseModel):
+    """Assignments in request order."""
+
+    model_id: str
+    model_version: int
+    start_block: int
+    end_block: int
+    assignments: list[CohortAssignment]
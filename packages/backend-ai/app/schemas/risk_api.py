@@ -35,6 +35,32 @@ class RiskScreenRequest(BaseModel):
         return v.strip().lower()
 
 
+class RiskScreenStreamRequest(BaseModel):
+    chain_id: str = Field(..., min_length=1, max_length=64)
+    addresses: list[str] = Field(..., min_length=1)
+    client_profile: Literal["exchange", "dapp", "custody"] = "dapp"
+    correlation_id: str | None = Field(
+        default=None,
+        max_length=100,
+        description="Prefix; each decision gets '<correlation_id>-<index>'",
+    )
+    options: ScreenOptions | None = None
+
+    @field_validator("addresses")
+    @classmethod
+    def normalize_addresses(cls, v: list[str]) -> list[str]:
+        out = [a.strip().lower() for a in v]
+        for a in out:
+            if not re.fullmatch(r"0x[a-f0-9]{40}", a):
+                raise ValueError(f"invalid address {a!r}: must be 0x-prefixed 20-byte hex")
+        return out
+
+    @field_validator("chain_id")
+    @classmethod
+    def lower_chain(cls, v: str) -> str:
+        return v.strip().lower()
+
+
 class RiskScreenResponse(BaseModel):
     correlation_id: str
     decision_id: str | None = None
@@ -50,12 +76,17 @@ class RiskScreenResponse(BaseModel):
     evidence: dict[str, Any]
     latency_ms: int
     degraded: bool = False
+    reused: bool = False
 
 
 class BatchWindow(BaseModel):
     from_block: int | None = None
     to_block: int | None = None
-    preset: Literal["last_30d", "last_7d"] | None = None
+    # ``last_30d`` is rejected: the longest aggregation window is 7d, so it would only pin too.
+    preset: Literal["last_7d"] | None = Field(
+        default=None,
+        description="Pins the job to the head block at dispatch; aggregation windows are 24h and 7d",
+    )
 
 
 class RiskBatchRequest(BaseModel):
@@ -65,11 +96,21 @@ class RiskBatchRequest(BaseModel):
     window: BatchWindow | None = None
     webhook_url: str | None = None
     callback_secret: str | None = None
+    priority: Literal["urgent", "normal", "bulk"] | None = Field(
+        default=None,
+        description="Lane override; by default small jobs are urgent and large ones bulk",
+    )
 
 
 class RiskBatchAccepted(BaseModel):
     job_id: str
     status: Literal["queued"] = "queued"
+    lane: str | None = None
+
+
+class RiskBatchUploadAccepted(RiskBatchAccepted):
+    total: int = Field(..., description="Unique valid addresses queued")
+    rejected: int = Field(default=0, description="Lines that were not a valid address")
 
 
 class RiskBatchStatusResponse(BaseModel):
@@ -81,6 +122,20 @@ class RiskBatchStatusResponse(BaseModel):
     results: list[dict[str, Any]] | None = None
 
 
+class RiskBatchResultOut(BaseModel):
+    index: int
+    address: str
+    risk_score: int
+    severity: str
+    decision_id: str | None = None
+    degraded: bool = False
+
+
+class RiskBatchResultsPage(BaseModel):
+    items: list[RiskBatchResultOut]
+    next_cursor: str | None = None
+
+
 class AlertWebhookRegisterRequest(BaseModel):
     tenant_id: str = Field(..., min_length=1, max_length=128)
     target_url: str = Field(..., min_length=8, max_length=512)
@@ -89,6 +144,12 @@ class AlertWebhookRegisterRequest(BaseModel):
         description="e.g. severity_ge_medium, case_opened",
     )
     signing_secret: str = Field(..., min_length=8, max_length=256)
+    batch_max_alerts: int = Field(
+        default=1,
+        ge=1,
+        le=500,
+        description='>1 delivers alerts as {"type": "risk_decision_batch", "alerts": [...]}',
+    )
 
 
 class AlertWebhookRegisterResponse(BaseModel):
@@ -124,5 +185,34 @@ class RiskCaseOut(BaseModel):
     updated_at: str
 
 
+class RiskCasePage(BaseModel):
+    items: list[RiskCaseOut]
+    next_cursor: str | None = None
+
+
+class RiskDecisionOut(BaseModel):
+    id: str
+    correlation_id: str | None
+    chain_id: str
+    address: str
+    risk_score: int
+    severity: str
+    recommended_action: str
+    model_version: str
+    ruleset_version: str
+    risk_reasons: list[dict[str, Any]]
+    evidence: dict[str, Any]
+    latency_ms: int
+    degraded: bool
+    client_profile: str
+    created_at: str
+    archived: bool = False
+
+
+class RiskDecisionPage(BaseModel):
+    items: list[RiskDecisionOut]
+    next_cursor: str | None = None
+
+
 class RiskCaseDetailOut(RiskCaseOut):
     notes: list[RiskCaseNoteOut] = Field(default_factory=list)
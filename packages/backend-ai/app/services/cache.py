@@ -2,6 +2,7 @@
 
 from __future__ import annotations
 
+import gzip
 import hashlib
 import json
 from typing import Any
@@ -20,6 +21,11 @@ def _cohort_cache_key(request: CohortRequest) -> str:
         "end_block": request.end_block,
         "num_clusters": request.num_clusters,
         "features": sorted(request.features),
+        "engine": request.engine,
+        "scaling": request.scaling,
+        "auto_k": [request.k_min, request.k_max] if request.auto_k else None,
+        "warm_start": str(request.model_id or "latest") if request.warm_start else None,
+        "members": request.members_format if request.include_members else None,
     }
     raw = json.dumps(payload, sort_keys=True).encode("utf-8")
     digest = hashlib.sha256(raw).hexdigest()
@@ -33,16 +39,12 @@ def get_cached_cohort_response(request: CohortRequest) -> CohortResponse | None:
     raw = r.get(key)
     if raw is None:
         return None
-    if isinstance(raw, bytes):
-        text = raw.decode("utf-8")
-    else:
-        text = str(raw)
-    data: dict[str, Any] = json.loads(text)
+    data: dict[str, Any] = json.loads(gzip.decompress(raw))
     return CohortResponse.model_validate(data)
 
 
 def set_cached_cohort_response(request: CohortRequest, response: CohortResponse, ttl_seconds: int) -> None:
-    """Store clustering response with TTL."""
+    """Store clustering response (gzip-compressed JSON) with TTL."""
     key = _cohort_cache_key(request)
     r = redis.from_url(settings.REDIS_URL)
-    r.setex(key, ttl_seconds, response.model_dump_json())
+    r.setex(key, ttl_seconds, gzip.compress(response.model_dump_json().encode("utf-8"), 5))
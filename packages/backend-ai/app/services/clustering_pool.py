@@ -0,0 +1,214 @@
+"""Dedicated process pool for cohort clustering, fed through shared memory.
+
+K-Means in the default thread pool held the GIL long enough to stall the event loop during large
+discoveries. Fits now run in ``COHORT_CLUSTER_WORKERS`` warm processes (sklearn and numpy
+imported, BLAS/OpenMP capped at ``COHORT_CLUSTER_WORKER_THREADS`` each). The feature matrix is
+written straight into a shared-memory block and the worker writes labels into a second one, so
+neither the users nor the matrix are pickled; only the small centers array comes back.
+``COHORT_CLUSTER_WORKERS=0`` keeps the old in-thread behaviour.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any
+
+import numpy as np
+
+from app.core.config import settings
+from app.models.clustering import (
+    ClusterState,
+    build_response,
+    cluster_users,
+    evaluate_k,
+    feature_matrix,
+    fit_clusters,
+    fit_kmeans,
+    plan_fit,
+    select_k,
+    validate_features,
+    with_k_selection,
+)
+from app.schemas.cohort import CohortRequest, CohortResponse
+
+log = logging.getLogger(__name__)
+
+# (shared memory name, shape, dtype) — enough for a worker to map the block as an array.
+ArraySpec = tuple[str, tuple[int, ...], str]
+
+
+class SharedArray:
+    """A numpy array backed by a shared-memory block; unlinked on exit."""
+
+    def __init__(self, shape: tuple[int, ...], dtype: str) -> None:
+        nbytes = max(int(np.prod(shape)) * np.dtype(dtype).itemsize, 1)
+        self._shm = SharedMemory(create=True, size=nbytes)
+        self.spec: ArraySpec = (self._shm.name, shape, dtype)
+        self.array: np.ndarray = np.ndarray(shape, dtype=dtype, buffer=self._shm.buf)
+
+    def __enter__(self) -> SharedArray:
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        del self.array
+        self._shm.close()
+        self._shm.unlink()
+
+
+def _warm_worker(threads: int) -> None:
+    """Process initializer: cap native threads, then load sklearn's compiled paths once."""
+    from threadpoolctl import threadpool_limits
+
+    threadpool_limits(limits=threads)
+    fit_kmeans(np.arange(8, dtype=np.float64).reshape(4, 2), 2)
+
+
+def _ready() -> bool:
+    return True
+
+
+def _fit_shared(
+    matrix: ArraySpec,
+    labels: ArraySpec,
+    n_clusters: int,
+    engine: str,
+    scaling: str,
+    warm: ClusterState | None,
+) -> tuple[np.ndarray, ClusterState]:
+    """Worker side: fit on the shared matrix, write labels in place, return centers and state."""
+    x_shm, l_shm = SharedMemory(name=matrix[0]), SharedMemory(name=labels[0])
+    try:
+        X = np.ndarray(matrix[1], dtype=matrix[2], buffer=x_shm.buf)
+        out = np.ndarray(labels[1], dtype=labels[2], buffer=l_shm.buf)
+        fitted, centers, state = fit_clusters(
+            X,
+            n_clusters,
+            engine=engine,
+            scaling=scaling,
+            warm=warm,
+        )
+        out[:] = fitted
+        del X, out
+        return centers, state
+    finally:
+        x_shm.close()
+        l_shm.close()
+
+
+def _evaluate_shared(matrix: ArraySpec, k: int, engine: str, scaling: str) -> dict[str, float]:
+    """Worker side: score one auto_k candidate against the shared matrix."""
+    x_shm = SharedMemory(name=matrix[0])
+    try:
+        X = np.ndarray(matrix[1], dtype=matrix[2], buffer=x_shm.buf)
+        diagnostic = evaluate_k(X, k, engine=engine, scaling=scaling)
+        del X
+        return diagnostic
+    finally:
+        x_shm.close()
+
+
+class ClusteringPool:
+    """Process-wide clustering executor; ``start``/``stop`` from the app lifespan."""
+
+    def __init__(self, *, workers: int | None = None, worker_threads: int | None = None) -> None:
+        self._workers = settings.COHORT_CLUSTER_WORKERS if workers is None else workers
+        self._threads = worker_threads or settings.COHORT_CLUSTER_WORKER_THREADS
+        self._executor: ProcessPoolExecutor | None = None
+
+    @property
+    def running(self) -> bool:
+        return self._executor is not None
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        # spawn: never fork a process that already runs the event loop and its threads.
+        return ProcessPoolExecutor(
+            max_workers=self._workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_warm_worker,
+            initargs=(self._threads,),
+        )
+
+    async def start(self) -> None:
+        if self._workers <= 0 or self.running:
+            return
+        self._executor = self._new_executor()
+        # Spawn every worker now, in the background, so the first discovery finds them warm.
+        for _ in range(self._workers):
+            self._executor.submit(_ready)
+
+    async def stop(self) -> None:
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            await asyncio.to_thread(executor.shutdown, wait=True, cancel_futures=True)
+
+    async def perform(
+        self,
+        request: CohortRequest,
+        users: list[dict[str, Any]],
+        *,
+        warm: ClusterState | None = None,
+    ) -> tuple[CohortResponse, ClusterState | None]:
+        """``cluster_users`` with the fits in the pool; falls back to a thread when stopped."""
+        executor = self._executor
+        if executor is None:
+            return await asyncio.to_thread(partial(cluster_users, warm=warm), request, users)
+        validate_features(request.features)
+        if not users:
+            return CohortResponse(cohorts=[], total_users=0), None
+
+        plan = plan_fit(request, len(users), warm)
+        n_clusters = plan.n_clusters
+        diagnostics = None
+        shape = (len(users), len(request.features))
+        with SharedArray(shape, "float64") as x, SharedArray(shape[:1], "int64") as labels:
+            await asyncio.to_thread(feature_matrix, users, request.features, out=x.array)
+            try:
+                if plan.candidates:
+                    # Every candidate reads the same shared matrix; they run side by side.
+                    scored = [
+                        executor.submit(
+                            _evaluate_shared,
+                            x.spec,
+                            k,
+                            plan.sample_engine,
+                            request.scaling,
+                        )
+                        for k in plan.candidates
+                    ]
+                    diagnostics = list(await asyncio.gather(*map(asyncio.wrap_future, scored)))
+                    n_clusters = select_k(diagnostics)
+                centers, state = await asyncio.wrap_future(
+                    executor.submit(
+                        _fit_shared,
+                        x.spec,
+                        labels.spec,
+                        n_clusters,
+                        plan.engine,
+                        request.scaling,
+                        plan.warm,
+                    ),
+                )
+            except BrokenProcessPool:
+                log.exception("clustering pool broke; replacing it")
+                if self._executor is executor:
+                    self._executor = self._new_executor()
+                    executor.shutdown(wait=False, cancel_futures=True)
+                raise
+            response = await asyncio.to_thread(
+                partial(build_response, engine=plan.engine),
+                request,
+                users,
+                x.array,
+                labels.array,
+                centers,
+            )
+        return with_k_selection(response, diagnostics, warm_started=plan.warm is not None), state
+
+
+clustering_pool = ClusteringPool()
@@ -0,0 +1,87 @@
+"""Cohort membership of saved discoveries, paged out of Redis.
+
+A discovery can leave members out of its response (``include_members=false``); they stay readable
+through ``GET /cohorts/{model_id}/members/{cohort_id}``. Each cohort is one field of the hash
+``cohort:members:<model_id>`` holding a zstd-compressed Arrow IPC stream (``address`` plus one
+float64 column per feature), so a page read fetches and decodes that cohort only. Entries expire
+after ``COHORT_MEMBERS_TTL_SECONDS``.
+"""
+
+from __future__ import annotations
+
+from typing import Any
+
+import numpy as np
+import redis
+
+from app.core.config import settings
+from app.models.clustering import Membership
+from app.schemas.cohort import CohortMembers
+
+ARROW_STREAM_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+
+
+def _key(model_id: str) -> str:
+    return f"cohort:members:{model_id}"
+
+
+def _client() -> redis.Redis:
+    return redis.from_url(settings.REDIS_URL)
+
+
+def _to_ipc(table: Any, *, compression: str | None = None) -> bytes:
+    import pyarrow as pa
+
+    sink = pa.BufferOutputStream()
+    options = pa.ipc.IpcWriteOptions(compression=compression)
+    with pa.ipc.new_stream(sink, table.schema, options=options) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def encode_cohort(features: list[str], addresses: list[str], X: np.ndarray) -> bytes:
+    import pyarrow as pa
+
+    columns = {"address": pa.array(addresses, type=pa.string())}
+    for j, f in enumerate(features):
+        columns[f] = pa.array(np.ascontiguousarray(X[:, j]), type=pa.float64())
+    return _to_ipc(pa.table(columns), compression="zstd")
+
+
+def store_membership(model_id: str, membership: Membership) -> None:
+    """Replace the stored members of ``model_id``, one hash field per cohort."""
+    mapping = {
+        str(i): encode_cohort(membership.features, *membership.cohort(i))
+        for i in range(len(membership.bounds))
+    }
+    key = _key(model_id)
+    pipe = _client().pipeline()
+    pipe.delete(key)
+    if mapping:
+        pipe.hset(key, mapping=mapping)
+        pipe.expire(key, settings.COHORT_MEMBERS_TTL_SECONDS)
+    pipe.execute()
+
+
+def read_page(model_id: str, cohort_id: int, offset: int, limit: int) -> tuple[int, Any] | None:
+    """``(cohort size, Arrow table of rows offset..offset+limit)``, or ``None`` if not stored."""
+    import pyarrow as pa
+
+    raw = _client().hget(_key(model_id), str(cohort_id))
+    if raw is None:
+        return None
+    table = pa.ipc.open_stream(raw).read_all()
+    return table.num_rows, table.slice(offset, limit)
+
+
+def page_members(table: Any) -> CohortMembers:
+    features = [name for name in table.column_names if name != "address"]
+    return CohortMembers(
+        addresses=table.column("address").to_pylist(),
+        features={f: table.column(f).to_pylist() for f in features},
+    )
+
+
+def page_ipc(table: Any) -> bytes:
+    """Uncompressed Arrow IPC stream; transfer is gzip-compressed by the HTTP layer instead."""
+    return _to_ipc(table)
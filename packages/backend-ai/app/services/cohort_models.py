@@ -0,0 +1,155 @@
+"""Persisted cohort models: the state a discovery window leaves for the next one to warm-start.
+
+Models form lineages keyed by chain, protocol, ordered feature list and scaling; only a model of
+the same lineage can seed a fit, since its centers live in that feature space.
+
+Saved models never change, so ``load_model`` keeps the last ``COHORT_MODEL_CACHE_SIZE`` of them
+in memory for assignment: a lookup after the first one costs no database round trip.
+"""
+
+from __future__ import annotations
+
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any
+
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.db.models import CohortModel
+from app.models.clustering import ClusterState
+from app.schemas.cohort import CohortRequest, CohortResponse
+
+_SAVE_ATTEMPTS = 5
+
+
+class CohortModelMismatch(ValueError):
+    """``model_id`` is missing or belongs to another chain/protocol/features/scaling."""
+
+
+def _lineage(request: CohortRequest) -> dict[str, Any]:
+    return {
+        "chain": request.chain.lower().strip(),
+        "protocol": request.protocol.lower().strip(),
+        "feature_key": ",".join(request.features),
+        "scaling": request.scaling,
+    }
+
+
+def state_from_model(model: CohortModel) -> ClusterState:
+    scaler = None
+    if model.scaler is not None:
+        scaler = (np.asarray(model.scaler["center"]), np.asarray(model.scaler["scale"]))
+    return ClusterState(centers=np.asarray(model.centers, dtype=np.float64), scaler=scaler)
+
+
+@dataclass(frozen=True)
+class LoadedModel:
+    """What assignment needs from a saved model, detached from any session."""
+
+    id: uuid.UUID
+    version: int
+    chain: str
+    protocol: str
+    features: list[str]
+    start_block: int
+    end_block: int
+    state: ClusterState
+
+
+_loaded: OrderedDict[uuid.UUID, LoadedModel] = OrderedDict()
+
+
+async def load_model(db: AsyncSession, model_id: uuid.UUID) -> LoadedModel | None:
+    """Saved model ``model_id`` ready for assignment, from the in-memory LRU when possible."""
+    cached = _loaded.get(model_id)
+    if cached is not None:
+        _loaded.move_to_end(model_id)
+        return cached
+    model = await db.get(CohortModel, model_id)
+    if model is None:
+        return None
+    loaded = LoadedModel(
+        id=model.id,
+        version=model.version,
+        chain=model.chain,
+        protocol=model.protocol,
+        features=model.feature_key.split(","),
+        start_block=model.start_block,
+        end_block=model.end_block,
+        state=state_from_model(model),
+    )
+    if settings.COHORT_MODEL_CACHE_SIZE > 0:
+        _loaded[model_id] = loaded
+        while len(_loaded) > settings.COHORT_MODEL_CACHE_SIZE:
+            _loaded.popitem(last=False)
+    return loaded
+
+
+async def find_warm_start(db: AsyncSession, request: CohortRequest) -> CohortModel | None:
+    """``request.model_id``, else the lineage's latest model ending at or before ``end_block``."""
+    lineage = _lineage(request)
+    if request.model_id is not None:
+        model = await db.get(CohortModel, request.model_id)
+        if model is None or any(getattr(model, k) != v for k, v in lineage.items()):
+            raise CohortModelMismatch(
+                "model_id not found for this chain, protocol, features and scaling",
+            )
+        return model
+    stmt = (
+        select(CohortModel)
+        .filter_by(**lineage)
+        .where(CohortModel.end_block <= request.end_block)
+        .order_by(CohortModel.end_block.desc(), CohortModel.version.desc())
+        .limit(1)
+    )
+    return (await db.scalars(stmt)).first()
+
+
+async def save_model(
+    db: AsyncSession,
+    request: CohortRequest,
+    response: CohortResponse,
+    state: ClusterState,
+    *,
+    parent: CohortModel | None = None,
+) -> CohortModel:
+    """Store ``state`` as the lineage's next version; caller commits.
+
+    Versions are unique per lineage: when a concurrent save takes the same number first, the
+    insert is rolled back to its savepoint and retried with the next one.
+    """
+    lineage = _lineage(request)
+    attempts = _SAVE_ATTEMPTS
+    while True:
+        latest = await db.scalar(select(func.max(CohortModel.version)).filter_by(**lineage))
+        model = CohortModel(
+            id=uuid.uuid4(),
+            **lineage,
+            engine=response.engine or "kmeans",
+            k=len(state.centers),
+            centers=state.centers.tolist(),
+            scaler=(
+                {"center": state.scaler[0].tolist(), "scale": state.scaler[1].tolist()}
+                if state.scaler is not None
+                else None
+            ),
+            version=(latest or 0) + 1,
+            parent_id=parent.id if parent is not None else None,
+            start_block=request.start_block,
+            end_block=request.end_block,
+            n_users=response.total_users,
+        )
+        try:
+            async with db.begin_nested():
+                db.add(model)
+        except IntegrityError:
+            attempts -= 1
+            if attempts == 0:
+                raise
+            continue
+        return model
@@ -2,6 +2,7 @@
 
 from __future__ import annotations
 
+import asyncio
 import logging
 from collections import defaultdict
 from decimal import Decimal
@@ -100,6 +101,26 @@ query Page($skip: Int!, $first: Int!, $start: BigInt!, $end: BigInt!) {
 }
 
 
+# Same pages restricted to a set of wallets (assignment of known addresses to cohorts).
+_USER_FILTER_QUERY = """
+query Page($skip: Int!, $first: Int!, $start: BigInt!, $end: BigInt!, $users: [String!]!) {{
+  {entity}(
+    skip: $skip
+    first: $first
+    orderBy: id
+    orderDirection: asc
+    where: {{ blockNumber_gte: $start, blockNumber_lte: $end, user_in: $users }}
+  ) {{
+    id
+    amount
+    blockNumber
+    gasUsed
+    user {{ id }}
+  }}
+}}
+"""
+
+
 def _wei_to_decimal(amount_str: str) -> Decimal:
     try:
         return Decimal(amount_str) / Decimal(10**18)
@@ -113,8 +134,13 @@ async def _fetch_entity_pages(
     start_block: int,
     end_block: int,
     subgraph_url: str,
+    *,
+    users: list[str] | None = None,
 ) -> list[_OpRow]:
-    query = _ENTITY_QUERIES[entity]
+    if users is None:
+        query = _ENTITY_QUERIES[entity]
+    else:
+        query = _USER_FILTER_QUERY.format(entity=entity)
     out: list[_OpRow] = []
     skip = 0
     first = settings.SUBGRAPH_PAGE_SIZE
@@ -132,6 +158,8 @@ async def _fetch_entity_pages(
                 "end": end_s,
             },
         }
+        if users is not None:
+            payload["variables"]["users"] = users
         resp = await client.post(subgraph_url, json=payload)
         resp.raise_for_status()
         body = resp.json()
@@ -159,6 +187,52 @@ async def _fetch_entity_pages(
     return out
 
 
+def _check_range(protocol: str, start_block: int, end_block: int) -> None:
+    if protocol.lower() not in ("aave", "aave-v3", "aave_v3"):
+        raise GraphClientError(
+            f"Unsupported subgraph protocol: {protocol!r}. Use aave-v3.",
+        )
+    if start_block > end_block:
+        raise GraphClientError("start_block cannot be greater than end_block")
+
+
+def _aggregate(
+    rows: list[_OpRow],
+    metrics: dict[str, dict[str, Decimal]] | None = None,
+) -> dict[str, dict[str, Decimal]]:
+    if metrics is None:
+        metrics = defaultdict(
+            lambda: {
+                "tx_count": Decimal(0),
+                "volume": Decimal(0),
+                "gas_sum": Decimal(0),
+            },
+        )
+    for row in rows:
+        user = row.get("user")
+        if not user or not user.get("id"):
+            continue
+        addr = str(user["id"]).lower()
+        amount_s = row.get("amount") or "0"
+        gas_s = row.get("gasUsed") or "0"
+        m = metrics[addr]
+        m["tx_count"] += Decimal(1)
+        m["volume"] += _wei_to_decimal(amount_s)
+        m["gas_sum"] += Decimal(gas_s)
+    return metrics
+
+
+def _user_row(address: str, m: dict[str, Decimal]) -> dict[str, Any]:
+    tx_c = int(m["tx_count"])
+    avg_gas = float(m["gas_sum"] / m["tx_count"]) if m["tx_count"] > 0 else 0.0
+    return {
+        "address": address,
+        "tx_count": tx_c,
+        "volume": float(m["volume"]),
+        "avg_gas": avg_gas,
+    }
+
+
 async def fetch_user_metrics_for_block_range(
     start_block: int,
     end_block: int,
@@ -170,23 +244,10 @@ async def fetch_user_metrics_for_block_range(
     Per user: ``address``, ``tx_count``, ``volume`` (sum of amounts in token units),
     ``avg_gas`` (average gas per indexed tx; may be 0 if the subgraph does not fill gas).
     """
-    if protocol.lower() not in ("aave", "aave-v3", "aave_v3"):
-        raise GraphClientError(
-            f"Unsupported subgraph protocol: {protocol!r}. Use aave-v3.",
-        )
-    if start_block > end_block:
-        raise GraphClientError("start_block cannot be greater than end_block")
-
+    _check_range(protocol, start_block, end_block)
     endpoint = subgraph_url if subgraph_url is not None else settings.SUBGRAPH_URL
 
-    metrics: dict[str, dict[str, Decimal]] = defaultdict(
-        lambda: {
-            "tx_count": Decimal(0),
-            "volume": Decimal(0),
-            "gas_sum": Decimal(0),
-        },
-    )
-
+    metrics = None
     timeout = httpx.Timeout(settings.SUBGRAPH_TIMEOUT_SECONDS)
     async with httpx.AsyncClient(timeout=timeout) as client:
         for entity in _ENTITY_QUERIES:
@@ -197,28 +258,41 @@ async def fetch_user_metrics_for_block_range(
                 end_block,
                 endpoint,
             )
-            for row in rows:
-                user = row.get("user")
-                if not user or not user.get("id"):
-                    continue
-                addr = str(user["id"]).lower()
-                amount_s = row.get("amount") or "0"
-                gas_s = row.get("gasUsed") or "0"
-                m = metrics[addr]
-                m["tx_count"] += Decimal(1)
-                m["volume"] += _wei_to_decimal(amount_s)
-                m["gas_sum"] += Decimal(gas_s)
-
-    users: list[dict[str, Any]] = []
-    for address, m in metrics.items():
-        tx_c = int(m["tx_count"])
-        avg_gas = float(m["gas_sum"] / m["tx_count"]) if m["tx_count"] > 0 else 0.0
-        users.append(
-            {
-                "address": address,
-                "tx_count": tx_c,
-                "volume": float(m["volume"]),
-                "avg_gas": avg_gas,
-            },
+            metrics = _aggregate(rows, metrics)
+
+    return [_user_row(address, m) for address, m in (metrics or {}).items()]
+
+
+async def fetch_user_metrics_for_addresses(
+    addresses: list[str],
+    start_block: int,
+    end_block: int,
+    protocol: str,
+    subgraph_url: str | None = None,
+) -> list[dict[str, Any]]:
+    """Same metrics as ``fetch_user_metrics_for_block_range`` for the given wallets only.
+
+    Returns one row per address, in order; wallets without activity get zero metrics. The four
+    entity queries run concurrently.
+    """
+    _check_range(protocol, start_block, end_block)
+    endpoint = subgraph_url if subgraph_url is not None else settings.SUBGRAPH_URL
+    wanted = [a.lower() for a in addresses]
+
+    timeout = httpx.Timeout(settings.SUBGRAPH_TIMEOUT_SECONDS)
+    async with httpx.AsyncClient(timeout=timeout) as client:
+        pages = await asyncio.gather(
+            *(
+                _fetch_entity_pages(
+                    client,
+                    entity,
+                    start_block,
+                    end_block,
+                    endpoint,
+                    users=wanted,
+                )
+                for entity in _ENTITY_QUERIES
+            ),
         )
-    return users
+    metrics = _aggregate([row for rows in pages for row in rows])
+    return [_user_row(address, metrics[address]) for address in wanted]
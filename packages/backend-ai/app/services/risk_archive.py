@@ -0,0 +1,303 @@
+"""Monthly partitions for ``risk_decisions`` and cold archival of old months to Parquet.
+
+On Postgres ``risk_decisions`` is range-partitioned by ``created_at`` into one child table per
+calendar month (``risk_decisions_y2026m10``). Months older than the hot window are streamed to
+``RISK_ARCHIVE_DIR/risk_decisions/year=YYYY/month=MM/decisions.parquet`` and then detached and
+dropped, so the live table and its indexes only cover recent history. Archived rows stay
+queryable through ``read_archived_decisions``. Nothing is archived (or dropped) until
+``RISK_ARCHIVE_DIR`` points at durable storage. Other dialects keep a plain table; partition and
+archive maintenance is a no-op there.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import re
+import uuid
+from collections.abc import Iterable, Iterator
+from datetime import UTC, date, datetime
+from pathlib import Path
+from typing import Any
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import DBAPIError
+
+from app.core.config import settings
+from app.services.risk_feature_schema import FeatureSchemaError, decode_vector
+
+log = logging.getLogger(__name__)
+
+PARENT_TABLE = "risk_decisions"
+DEFAULT_PARTITION = "risk_decisions_default"
+_PARTITION_RE = re.compile(r"risk_decisions_y(\d{4})m(\d{2})")
+_EXPORT_BATCH = 5000
+
+# Column order of the Parquet files; ``evidence`` keeps its packed bytes, decoded on read.
+ARCHIVE_COLUMNS = (
+    "id",
+    "correlation_id",
+    "batch_job_id",
+    "chain_id",
+    "address",
+    "risk_score",
+    "severity",
+    "recommended_action",
+    "model_version",
+    "ruleset_version",
+    "risk_reasons",
+    "evidence",
+    "feature_snapshot_id",
+    "latency_ms",
+    "degraded",
+    "client_profile",
+    "created_at",
+)
+
+
+def add_months(d: date, months: int) -> date:
+    """First day of the month ``months`` after (or before) the month containing ``d``."""
+    idx = d.year * 12 + d.month - 1 + months
+    return date(idx // 12, idx % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"{PARENT_TABLE}_y{month.year:04d}m{month.month:02d}"
+
+
+def parse_partition_name(name: str) -> date | None:
+    m = _PARTITION_RE.fullmatch(name)
+    return date(int(m.group(1)), int(m.group(2)), 1) if m else None
+
+
+def create_partition_sql(month: date) -> str:
+    start = add_months(month, 0)
+    end = add_months(month, 1)
+    return (
+        f"CREATE TABLE IF NOT EXISTS {partition_name(start)} PARTITION OF {PARENT_TABLE} "
+        f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+    )
+
+
+def _is_postgres(conn: Connection) -> bool:
+    return conn.dialect.name == "postgresql"
+
+
+def list_month_partitions(conn: Connection) -> list[date]:
+    """Months that currently have an attached child table, oldest first."""
+    rows = conn.execute(
+        text(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE p.relname = :parent",
+        ),
+        {"parent": PARENT_TABLE},
+    ).scalars()
+    return sorted(m for m in (parse_partition_name(r) for r in rows) if m is not None)
+
+
+def ensure_decision_partitions(conn: Connection, *, months_ahead: int | None = None) -> list[str]:
+    """Create child tables from the current month through ``months_ahead`` months out."""
+    if not _is_postgres(conn):
+        return []
+    ahead = settings.RISK_PARTITION_MONTHS_AHEAD if months_ahead is None else months_ahead
+    existing = set(list_month_partitions(conn))
+    this_month = add_months(datetime.now(UTC).date(), 0)
+    created: list[str] = []
+    for i in range(ahead + 1):
+        month = add_months(this_month, i)
+        if month in existing:
+            continue
+        try:
+            with conn.begin_nested():
+                conn.execute(text(create_partition_sql(month)))
+        except DBAPIError as e:
+            # Rows for this month already landed in the default partition.
+            log.error("could not create %s: %s", partition_name(month), e)
+            continue
+        created.append(partition_name(month))
+    return created
+
+
+def _archive_path(month: date, base: Path) -> Path:
+    return (
+        base
+        / PARENT_TABLE
+        / f"year={month.year:04d}"
+        / f"month={month.month:02d}"
+        / "decisions.parquet"
+    )
+
+
+def _archive_schema() -> Any:
+    import pyarrow as pa
+
+    return pa.schema(
+        [
+            ("id", pa.string()),
+            ("correlation_id", pa.string()),
+            ("batch_job_id", pa.string()),
+            ("chain_id", pa.string()),
+            ("address", pa.string()),
+            ("risk_score", pa.int32()),
+            ("severity", pa.string()),
+            ("recommended_action", pa.string()),
+            ("model_version", pa.string()),
+            ("ruleset_version", pa.string()),
+            ("risk_reasons", pa.string()),
+            ("evidence", pa.binary()),
+            ("feature_snapshot_id", pa.string()),
+            ("latency_ms", pa.int32()),
+            ("degraded", pa.bool_()),
+            ("client_profile", pa.string()),
+            ("created_at", pa.timestamp("us", tz="UTC")),
+        ],
+    )
+
+
+def _archive_record(row: dict[str, Any]) -> dict[str, Any]:
+    out = dict(row)
+    for key in ("id", "batch_job_id", "feature_snapshot_id"):
+        if out.get(key) is not None:
+            out[key] = str(out[key])
+    reasons = out.get("risk_reasons")
+    if not isinstance(reasons, str):
+        out["risk_reasons"] = json.dumps(reasons or [])
+    if out.get("evidence") is not None:
+        out["evidence"] = bytes(out["evidence"])
+    return out
+
+
+def write_decisions_parquet(batches: Iterable[list[dict[str, Any]]], path: Path) -> int:
+    """Stream row batches into one Parquet file (written to a temp name, then renamed)."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = _archive_schema()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Dot-prefixed and never matched by ``_archived_files``: a crashed export stays invisible.
+    tmp = path.with_name(f".{path.name}.tmp")
+    count = 0
+    with pq.ParquetWriter(tmp, schema, compression="zstd") as writer:
+        for rows in batches:
+            if not rows:
+                continue
+            table = pa.Table.from_pylist([_archive_record(r) for r in rows], schema=schema)
+            writer.write_table(table)
+            count += len(rows)
+    tmp.replace(path)
+    return count
+
+
+def _stream_partition(conn: Connection, name: str) -> Iterator[list[dict[str, Any]]]:
+    cols = ", ".join(ARCHIVE_COLUMNS)
+    result = conn.execute(
+        text(f"SELECT {cols} FROM {name} ORDER BY created_at, id").execution_options(
+            stream_results=True,
+        ),
+    )
+    for part in result.mappings().partitions(_EXPORT_BATCH):
+        yield [dict(r) for r in part]
+
+
+def archive_decision_partitions(
+    conn: Connection,
+    *,
+    hot_months: int | None = None,
+    root: Path | None = None,
+) -> list[str]:
+    """Export months older than the hot window to Parquet, then detach and drop them.
+
+    Each month is exported and verified before its child table is dropped; a crash in between
+    leaves the partition attached and the next run overwrites the file.
+    """
+    if not _is_postgres(conn):
+        return []
+    base = root or settings.RISK_ARCHIVE_DIR
+    if base is None:
+        log.warning("RISK_ARCHIVE_DIR is not set; keeping old decision partitions in Postgres")
+        return []
+    hot = settings.RISK_DECISION_HOT_MONTHS if hot_months is None else hot_months
+    cutoff = add_months(datetime.now(UTC).date(), -hot)
+    archived: list[str] = []
+    for month in list_month_partitions(conn):
+        if month >= cutoff:
+            break
+        name = partition_name(month)
+        expected = conn.execute(text(f"SELECT count(*) FROM {name}")).scalar_one()
+        written = (
+            write_decisions_parquet(_stream_partition(conn, name), _archive_path(month, base))
+            if expected
+            else 0
+        )
+        if written != expected:
+            log.error(
+                "archive of %s wrote %s of %s rows; keeping partition", name, written, expected
+            )
+            continue
+        conn.execute(text(f"ALTER TABLE {PARENT_TABLE} DETACH PARTITION {name}"))
+        conn.execute(text(f"DROP TABLE {name}"))
+        archived.append(name)
+        log.info("archived %s (%s rows)", name, written)
+    return archived
+
+
+def _from_archive(row: dict[str, Any]) -> dict[str, Any]:
+    out = dict(row)
+    for key in ("id", "batch_job_id", "feature_snapshot_id"):
+        if out.get(key) is not None:
+            out[key] = uuid.UUID(out[key])
+    out["risk_reasons"] = json.loads(out.get("risk_reasons") or "[]")
+    raw = out.get("evidence")
+    try:
+        out["evidence"] = decode_vector(raw) if raw is not None else {}
+    except FeatureSchemaError:
+        log.warning("undecodable archived evidence for decision %s", out.get("id"))
+        out["evidence"] = {}
+    return out
+
+
+def _archived_files(base: Path) -> list[str]:
+    """Completed month files only; temp files of an interrupted export never match."""
+    return sorted(str(p) for p in (base / PARENT_TABLE).glob("year=*/month=*/decisions.parquet"))
+
+
+def read_archived_decisions(
+    *,
+    chain_id: str,
+    address: str,
+    decision_id: uuid.UUID | None = None,
+    before: tuple[datetime, uuid.UUID] | None = None,
+    limit: int | None = None,
+    root: Path | None = None,
+) -> list[dict[str, Any]]:
+    """Archived decisions for one wallet, newest first by ``(created_at, id)``.
+
+    ``decision_id`` selects a single decision; ``before`` continues a keyset page after that key.
+    """
+    base = root or settings.RISK_ARCHIVE_DIR
+    files = _archived_files(base) if base is not None else []
+    if not files:
+        return []
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+
+    dataset = ds.dataset(files, format="parquet", schema=_archive_schema())
+    expr = (pc.field("chain_id") == chain_id) & (pc.field("address") == address.lower())
+    if decision_id is not None:
+        expr = expr & (pc.field("id") == str(decision_id))
+    if before is not None:
+        ts, row_id = before
+        ts = ts if ts.tzinfo is not None else ts.replace(tzinfo=UTC)
+        expr = expr & (
+            (pc.field("created_at") < ts)
+            | ((pc.field("created_at") == ts) & (pc.field("id") < str(row_id)))
+        )
+    table = dataset.to_table(filter=expr).sort_by(
+        [("created_at", "descending"), ("id", "descending")],
+    )
+    if limit is not None:
+        table = table.slice(0, limit)
+    return [_from_archive(r) for r in table.to_pylist()]
@@ -0,0 +1,45 @@
+"""Batch job progress counters in Redis, so workers do not rewrite the job row per flush."""
+
+from __future__ import annotations
+
+import redis
+
+from app.core.config import settings
+
+_TTL_SECONDS = 7 * 24 * 3600
+
+
+def _client() -> redis.Redis:
+    return redis.from_url(settings.REDIS_URL)
+
+
+def progress_key(job_id: str) -> str:
+    return f"risk:batch:{job_id}:processed"
+
+
+def add_processed(job_id: str, n: int) -> bool:
+    """Add ``n`` to the job's processed counter; False if Redis is unavailable."""
+    try:
+        r = _client()
+        pipe = r.pipeline()
+        pipe.incrby(progress_key(job_id), n)
+        pipe.expire(progress_key(job_id), _TTL_SECONDS)
+        pipe.execute()
+        return True
+    except redis.RedisError:
+        return False
+
+
+def get_processed(job_id: str) -> int | None:
+    try:
+        raw = _client().get(progress_key(job_id))
+    except redis.RedisError:
+        return None
+    return int(raw) if raw is not None else None
+
+
+def clear_processed(job_id: str) -> None:
+    try:
+        _client().delete(progress_key(job_id))
+    except redis.RedisError:
+        pass
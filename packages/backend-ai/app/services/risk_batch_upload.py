@@ -0,0 +1,152 @@
+"""Disk-backed address lists for very large batch jobs.
+
+An upload is parsed as it streams in: each valid address becomes a 20-byte record appended to
+one of 256 bucket files chosen by its first byte. ``finish`` then deduplicates bucket by bucket
+(a bucket holds ~1/256 of the input, so the in-memory set stays small) and concatenates the
+buckets into ``addresses.bin``, a flat file of fixed-width records. Chunk tasks read their
+``[start, end)`` slice by seeking to ``start * 20``, so neither the API process nor a worker
+ever materialises the whole list. The directory must be shared between API and workers.
+"""
+
+from __future__ import annotations
+
+import re
+import shutil
+from collections.abc import Iterator
+from pathlib import Path
+
+from app.core.config import settings
+
+RECORD_SIZE = 20
+ADDRESSES_FILE = "addresses.bin"
+_BUCKETS = 256
+_FLUSH_BYTES = 4 * 1024 * 1024
+_MAX_LINE = 4096
+_ADDRESS_RE = re.compile(rb"0x[0-9a-f]{40}")
+# Lines spooled per allowed unique address before giving up on an upload; bounds the disk an
+# upload can fill while duplicates are still unknown.
+_MAX_LINES_PER_ADDRESS = 10
+
+
+class UploadError(ValueError):
+    """Upload is malformed or exceeds configured limits."""
+
+
+def upload_dir(job_id: str) -> Path:
+    return settings.RISK_BATCH_UPLOAD_DIR / job_id
+
+
+class AddressSpool:
+    """Incremental newline/CSV parser writing deduplicated 20-byte records under ``directory``.
+
+    The first CSV column of each line is used; lines that are not an address (headers,
+    blanks, typos) are counted in ``rejected``. ``max_addresses`` caps unique addresses, so it
+    is checked in ``finish``; while streaming, only the number of address lines is bounded.
+    """
+
+    def __init__(self, directory: Path, *, max_addresses: int | None = None) -> None:
+        self.directory = directory
+        self.max_addresses = max_addresses or settings.RISK_BATCH_UPLOAD_MAX_ADDRESSES
+        self.accepted = 0
+        self.rejected = 0
+        self._tail = b""
+        self._pending: dict[int, bytearray] = {}
+        self._pending_bytes = 0
+        (directory / "buckets").mkdir(parents=True, exist_ok=True)
+
+    def _bucket_path(self, bucket: int) -> Path:
+        return self.directory / "buckets" / f"{bucket:02x}.bin"
+
+    def _add_line(self, line: bytes) -> None:
+        field = line.split(b",", 1)[0].strip().strip(b"\"'").lower()
+        if not field:
+            return
+        if not _ADDRESS_RE.fullmatch(field):
+            self.rejected += 1
+            return
+        if self.accepted >= self.max_addresses * _MAX_LINES_PER_ADDRESS:
+            raise UploadError(
+                f"At most {self.max_addresses * _MAX_LINES_PER_ADDRESS} address lines per upload",
+            )
+        record = bytes.fromhex(field[2:].decode())
+        self._pending.setdefault(record[0], bytearray()).extend(record)
+        self._pending_bytes += RECORD_SIZE
+        self.accepted += 1
+
+    def _flush_buckets(self) -> None:
+        for bucket, data in self._pending.items():
+            with self._bucket_path(bucket).open("ab") as f:
+                f.write(data)
+        self._pending.clear()
+        self._pending_bytes = 0
+
+    def feed(self, chunk: bytes) -> None:
+        lines = (self._tail + chunk).split(b"\n")
+        self._tail = lines.pop()
+        if len(self._tail) > _MAX_LINE:
+            raise UploadError("Line too long; expected one address per line")
+        for line in lines:
+            self._add_line(line)
+        if self._pending_bytes >= _FLUSH_BYTES:
+            self._flush_buckets()
+
+    def finish(self) -> int:
+        """Deduplicate and write ``addresses.bin``; returns the number of unique addresses."""
+        if self._tail:
+            self._add_line(self._tail)
+            self._tail = b""
+        self._flush_buckets()
+        total = 0
+        with (self.directory / ADDRESSES_FILE).open("wb") as out:
+            for bucket in range(_BUCKETS):
+                path = self._bucket_path(bucket)
+                if not path.exists():
+                    continue
+                raw = path.read_bytes()
+                unique = sorted(
+                    {raw[i : i + RECORD_SIZE] for i in range(0, len(raw), RECORD_SIZE)},
+                )
+                total += len(unique)
+                if total > self.max_addresses:
+                    raise UploadError(f"At most {self.max_addresses} unique addresses per upload")
+                out.write(b"".join(unique))
+                path.unlink()
+        (self.directory / "buckets").rmdir()
+        return total
+
+    @property
+    def path(self) -> Path:
+        return self.directory / ADDRESSES_FILE
+
+    def discard(self) -> None:
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+def spooled_uploads() -> Iterator[tuple[str, float]]:
+    """``(job id, last write time)`` of every upload directory under ``RISK_BATCH_UPLOAD_DIR``."""
+    base = settings.RISK_BATCH_UPLOAD_DIR
+    if not base.is_dir():
+        return
+    for directory in base.iterdir():
+        try:
+            if directory.is_dir():
+                paths = (directory, *directory.rglob("*"))
+                yield directory.name, max(p.stat().st_mtime for p in paths)
+        except FileNotFoundError:
+            continue  # removed while scanning
+
+
+def discard_upload(job_id: str) -> None:
+    shutil.rmtree(upload_dir(job_id), ignore_errors=True)
+
+
+def read_addresses(path: str | Path, start: int, end: int) -> list[str]:
+    """Addresses ``[start, end)`` of an ``addresses.bin`` file as 0x-prefixed lowercase hex."""
+    with Path(path).open("rb") as f:
+        f.seek(start * RECORD_SIZE)
+        raw = f.read((end - start) * RECORD_SIZE)
+    return ["0x" + raw[i : i + RECORD_SIZE].hex() for i in range(0, len(raw), RECORD_SIZE)]
+
+
+def remove_upload(path: str | Path) -> None:
+    shutil.rmtree(Path(path).parent, ignore_errors=True)
@@ -2,31 +2,42 @@
 
 from __future__ import annotations
 
-import json
 from typing import Any
 
 import redis
 
 from app.core.config import settings
+from app.services.risk_feature_schema import FeatureSchemaError, decode_vector, encode_vector
 
 
 def _client() -> redis.Redis:
-    return redis.from_url(settings.REDIS_URL, decode_responses=True)
+    return redis.from_url(settings.REDIS_URL)
 
 
-def feature_cache_key(chain_id: str, address: str, window_end_block: int) -> str:
+def feature_cache_key(
+    chain_id: str,
+    address: str,
+    window_end_block: int,
+    window_start_floor: int | None = None,
+) -> str:
     a = address.strip().lower()
-    return f"risk:feat:{chain_id}:{a}:{window_end_block}"
+    key = f"risk:feat:{chain_id}:{a}:{window_end_block}"
+    return key if window_start_floor is None else f"{key}:from{window_start_floor}"
 
 
-def get_cached_features(chain_id: str, address: str, window_end_block: int) -> dict[str, Any] | None:
+def get_cached_features(
+    chain_id: str,
+    address: str,
+    window_end_block: int,
+    window_start_floor: int | None = None,
+) -> dict[str, Any] | None:
     try:
         r = _client()
-        raw = r.get(feature_cache_key(chain_id, address, window_end_block))
+        raw = r.get(feature_cache_key(chain_id, address, window_end_block, window_start_floor))
         if not raw:
             return None
-        return json.loads(raw)
-    except redis.RedisError:
+        return decode_vector(raw)
+    except (redis.RedisError, FeatureSchemaError):
         return None
 
 
@@ -36,14 +47,18 @@ def set_cached_features(
     window_end_block: int,
     payload: dict[str, Any],
     ttl_seconds: int | None = None,
+    *,
+    window_start_floor: int | None = None,
+    permanent: bool = False,
 ) -> None:
+    """Cache a bundle; ``permanent`` (no TTL) is for closed historical ranges, which never change."""
     ttl = ttl_seconds if ttl_seconds is not None else settings.RISK_FEATURE_CACHE_TTL_SECONDS
+    key = feature_cache_key(chain_id, address, window_end_block, window_start_floor)
     try:
         r = _client()
-        r.setex(
-            feature_cache_key(chain_id, address, window_end_block),
-            ttl,
-            json.dumps(payload),
-        )
+        if permanent:
+            r.set(key, encode_vector("features", payload))
+        else:
+            r.setex(key, ttl, encode_vector("features", payload))
     except redis.RedisError:
         pass
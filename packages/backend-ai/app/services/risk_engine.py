@@ -2,16 +2,21 @@
 
 from __future__ import annotations
 
+import asyncio
+import hashlib
+import json
+import logging
 import time
 import uuid
+from collections.abc import AsyncIterator, Sequence
 from datetime import UTC, datetime
 from typing import Any
 
 import httpx
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.config import settings
-from app.db.models import FeatureSnapshot, RiskCase, RiskDecision
+from app.db.session import AsyncSessionLocal
 from app.services.risk_cache import get_cached_features, set_cached_features
 from app.services.risk_graph_client import (
     GraphClientError,
@@ -20,6 +25,14 @@ from app.services.risk_graph_client import (
     fetch_user_window_features,
     lifetime_row_to_features,
 )
+from app.services.risk_persistence import (
+    PERSIST_FAILURES,
+    PendingScreening,
+    flush_screenings_async,
+    offer_for_reuse,
+    write_behind,
+)
+from app.services.risk_reuse import decision_link_row, get_reusable_decision
 from app.services.risk_scoring import (
     ClientProfile,
     RecommendedAction,
@@ -27,12 +40,47 @@ from app.services.risk_scoring import (
     apply_heuristic_rules,
     score_to_severity,
 )
+from app.services.risk_webhooks import enqueue_deliveries
+
+log = logging.getLogger(__name__)
 
 
 def _blocks_for_hours(hours: int) -> int:
     return int(hours * settings.RISK_BLOCKS_PER_HOUR)
 
 
+def resolve_batch_window(
+    preset: str | None,
+    from_block: int | None,
+    to_block: int | None,
+    head: int,
+) -> tuple[int | None, int | None]:
+    """Pin a batch window to blocks: ``to_block`` defaults to (and is capped at) ``head``.
+
+    A preset only pins the job to the dispatch head; it does not move ``from_block``, because the
+    aggregation windows are fixed at 24h and 7d before ``to_block`` and a floor at or beyond their
+    start changes nothing. ``(None, None)`` means screen at the live head.
+    """
+    if preset is None and from_block is None and to_block is None:
+        return None, None
+    to = head if to_block is None else min(to_block, head)
+    return from_block, to
+
+
+async def fetch_head_block(subgraph_url: str) -> int:
+    timeout = httpx.Timeout(min(settings.SUBGRAPH_TIMEOUT_SECONDS, 15.0))
+    async with httpx.AsyncClient(timeout=timeout) as client:
+        return await fetch_meta_block_number(client, subgraph_url)
+
+
+async def _live_head(subgraph_url: str) -> int:
+    """Current subgraph head, or 0 when the subgraph is unreachable (degraded screen)."""
+    try:
+        return await fetch_head_block(subgraph_url)
+    except (GraphClientError, httpx.HTTPError):
+        return 0
+
+
 def _prefix_window(prefix: str, feat: dict[str, Any]) -> dict[str, str | int | float | list]:
     out: dict[str, str | int | float | list] = {}
     for k, v in feat.items():
@@ -48,16 +96,21 @@ async def compute_feature_bundle(
     address: str,
     *,
     use_cache: bool = True,
+    as_of_block: int | None = None,
+    window_from_block: int | None = None,
+    head: int | None = None,
 ) -> tuple[dict[str, Any], int, bool]:
-    """Return merged features, subgraph head block, degraded flag."""
+    """Return merged features, evaluation block (subgraph head unless ``as_of_block``), degraded.
+
+    With ``as_of_block`` the bundle describes the wallet at that block (clamped to the head):
+    the lifetime row is read with the subgraph ``block`` argument and both windows end there.
+    ``window_from_block`` floors the window starts. Bundles more than ``RISK_FINALITY_BLOCKS``
+    behind the head can no longer change and are cached without expiry. Pass ``head`` when the
+    caller already fetched it.
+    """
     degraded = False
-    timeout = httpx.Timeout(min(settings.SUBGRAPH_TIMEOUT_SECONDS, 15.0))
-    async with httpx.AsyncClient(timeout=timeout) as client:
-        try:
-            head = await fetch_meta_block_number(client, subgraph_url)
-        except (GraphClientError, httpx.HTTPError):
-            head = 0
-            degraded = True
+    if head is None:
+        head = await _live_head(subgraph_url)
 
     if head <= 0:
         degraded = True
@@ -68,28 +121,36 @@ async def compute_feature_bundle(
         }
         return merged, 0, degraded
 
+    end = head if as_of_block is None else max(0, min(as_of_block, head))
+    closed = as_of_block is not None and end <= head - settings.RISK_FINALITY_BLOCKS
+
     if use_cache:
-        cached = get_cached_features(chain_id, address, head)
+        cached = get_cached_features(chain_id, address, end, window_from_block)
         if cached is not None:
-            cached = {**cached, "subgraph_block_head": head}
-            return cached, head, degraded
+            cached = {**cached, "subgraph_block_head": end}
+            return cached, end, degraded
 
-    start_24h = max(0, head - _blocks_for_hours(24))
-    start_7d = max(0, head - _blocks_for_hours(24 * 7))
+    floor = min(window_from_block or 0, end)
+    start_24h = max(floor, end - _blocks_for_hours(24))
+    start_7d = max(floor, end - _blocks_for_hours(24 * 7))
 
     try:
-        lifetime_row = await fetch_user_lifetime_row(subgraph_url, address)
+        lifetime_row = await fetch_user_lifetime_row(
+            subgraph_url,
+            address,
+            block=end if as_of_block is not None else None,
+        )
         f24 = await fetch_user_window_features(
             subgraph_url,
             address,
             start_24h,
-            head,
+            end,
         )
         f7 = await fetch_user_window_features(
             subgraph_url,
             address,
             start_7d,
-            head,
+            end,
         )
     except (GraphClientError, httpx.HTTPError):
         degraded = True
@@ -110,19 +171,44 @@ async def compute_feature_bundle(
         **lf,
         **_prefix_window("window_24h", f24),
         **_prefix_window("window_7d", f7),
-        "subgraph_block_head": head,
+        "subgraph_block_head": end,
         "chain_id": chain_id,
         "address": address.lower(),
     }
 
     if use_cache and not degraded:
-        set_cached_features(chain_id, address, head, merged)
+        set_cached_features(
+            chain_id,
+            address,
+            end,
+            merged,
+            window_start_floor=window_from_block,
+            permanent=closed,
+        )
+
+    return merged, end, degraded
+
+
+# Keys that change on every screen without describing the wallet; excluded from snapshot content.
+_VOLATILE_FEATURE_KEYS = frozenset({"subgraph_block_head"})
+
 
-    return merged, head, degraded
+def snapshot_features(merged_features: dict[str, Any]) -> dict[str, Any]:
+    return {k: v for k, v in merged_features.items() if k not in _VOLATILE_FEATURE_KEYS}
 
 
-def persist_screening(
-    db: Session,
+def feature_content_hash(chain_id: str, address: str, features: dict[str, Any]) -> str:
+    """SHA-256 over canonical JSON of ``(chain_id, address, features)``."""
+    canonical = json.dumps(
+        {"chain_id": chain_id, "address": address.lower(), "features": features},
+        sort_keys=True,
+        separators=(",", ":"),
+        default=str,
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def build_pending_screening(
     *,
     chain_id: str,
     address: str,
@@ -138,71 +224,58 @@ def persist_screening(
     latency_ms: int,
     degraded: bool,
     batch_job_id: uuid.UUID | None = None,
-) -> tuple[uuid.UUID, uuid.UUID]:
-    """Insert feature snapshot + decision. Optionally link case. Returns decision_id, snapshot_id."""
-    w_start = max(
-        0,
-        int(merged_features.get("subgraph_block_head") or 0) - _blocks_for_hours(24),
-    )
-    w_end = int(merged_features.get("subgraph_block_head") or 0)
+    decision_id: uuid.UUID | None = None,
+) -> PendingScreening:
+    """Snapshot + decision rows with pre-generated ids; stamps ``feature_snapshot_id`` in evidence.
 
-    snap = FeatureSnapshot(
-        chain_id=chain_id,
-        address=address.lower(),
-        window_start_block=w_start,
-        window_end_block=w_end,
-        features=merged_features,
-        subgraph_block_head=head if head > 0 else None,
-    )
-    db.add(snap)
-    db.flush()
-
-    evidence["feature_snapshot_id"] = str(snap.id)
-    decision = RiskDecision(
-        correlation_id=correlation_id,
-        batch_job_id=batch_job_id,
-        chain_id=chain_id,
-        address=address.lower(),
-        risk_score=risk_score,
-        severity=severity,
-        recommended_action=action,
-        model_version=settings.RISK_MODEL_VERSION,
-        ruleset_version=settings.RISK_RULESET_VERSION,
-        risk_reasons=risk_reasons,
-        evidence=dict(evidence),
-        feature_snapshot_id=snap.id,
-        latency_ms=latency_ms,
-        degraded=degraded,
-        client_profile=client_profile,
-    )
-    db.add(decision)
-    db.flush()
-
-    if severity in ("MEDIUM", "HIGH", "CRITICAL"):
-        existing = (
-            db.query(RiskCase)
-            .filter(
-                RiskCase.chain_id == chain_id,
-                RiskCase.address == address.lower(),
-                RiskCase.status.in_(("open", "in_review")),
-            )
-            .first()
+    The snapshot id is derived from the bundle's content hash, so re-screens with identical
+    features reference the row written by the first screen. Pass a deterministic
+    ``decision_id`` to make a retried write recognisable (see ``flush_screenings``).
+    """
+    w_start = evidence.get("window_start_block")
+    if w_start is None:
+        w_start = max(
+            0,
+            int(merged_features.get("subgraph_block_head") or 0) - _blocks_for_hours(24),
         )
-        if existing:
-            existing.latest_decision_id = decision.id
-            existing.updated_at = datetime.now(UTC)
-        else:
-            case = RiskCase(
-                chain_id=chain_id,
-                address=address.lower(),
-                status="open",
-                latest_decision_id=decision.id,
-            )
-            db.add(case)
-            db.flush()
+    w_end = int(merged_features.get("subgraph_block_head") or 0)
+    now = datetime.now(UTC)
+    features = snapshot_features(merged_features)
+    content_hash = feature_content_hash(chain_id, address, features)
+    snapshot_id = uuid.UUID(hex=content_hash[:32])
 
-    db.commit()
-    return decision.id, snap.id
+    evidence["feature_snapshot_id"] = str(snapshot_id)
+    snapshot = {
+        "id": snapshot_id,
+        "chain_id": chain_id,
+        "address": address.lower(),
+        "window_start_block": w_start,
+        "window_end_block": w_end,
+        "features": features,
+        "content_hash": content_hash,
+        "subgraph_block_head": head if head > 0 else None,
+        "created_at": now,
+    }
+    decision = {
+        "id": decision_id or uuid.uuid4(),
+        "correlation_id": correlation_id,
+        "batch_job_id": batch_job_id,
+        "chain_id": chain_id,
+        "address": address.lower(),
+        "risk_score": risk_score,
+        "severity": severity,
+        "recommended_action": action,
+        "model_version": settings.RISK_MODEL_VERSION,
+        "ruleset_version": settings.RISK_RULESET_VERSION,
+        "risk_reasons": risk_reasons,
+        "evidence": dict(evidence),
+        "feature_snapshot_id": snapshot_id,
+        "latency_ms": latency_ms,
+        "degraded": degraded,
+        "client_profile": client_profile,
+        "created_at": now,
+    }
+    return PendingScreening(snapshot=snapshot, decision=decision)
 
 
 async def evaluate_risk_for_address(
@@ -213,6 +286,9 @@ async def evaluate_risk_for_address(
     *,
     use_cache: bool = True,
     include_graph_hints: bool = False,
+    as_of_block: int | None = None,
+    window_from_block: int | None = None,
+    head: int | None = None,
 ) -> tuple[
     dict[str, Any],
     int,
@@ -231,13 +307,16 @@ async def evaluate_risk_for_address(
         chain_id,
         address,
         use_cache=use_cache,
+        as_of_block=as_of_block,
+        window_from_block=window_from_block,
+        head=head,
     )
     score, reasons, tx_samples = apply_heuristic_rules(merged, client_profile)
     severity, action = score_to_severity(score)
     elapsed_ms = int((time.perf_counter() - t0) * 1000)
 
     evidence: dict[str, Any] = {
-        "window_start_block": max(0, head - _blocks_for_hours(24)),
+        "window_start_block": max(min(window_from_block or 0, head), head - _blocks_for_hours(24)),
         "window_end_block": head,
         "subgraph_block_head": head,
         "graph_component_id": None,
@@ -252,15 +331,48 @@ async def evaluate_risk_for_address(
     return merged, score, elapsed_ms, severity, action, reasons, evidence, head, degraded
 
 
-async def run_online_screen(
-    db: Session,
+async def screen_address(
     subgraph_url: str,
     chain_id: str,
     address: str,
     client_profile: ClientProfile,
     correlation_id: str | None,
     include_graph_hints: bool,
-) -> dict[str, Any]:
+    *,
+    batch_job_id: uuid.UUID | None = None,
+    decision_id: uuid.UUID | None = None,
+    as_of_block: int | None = None,
+    window_from_block: int | None = None,
+) -> tuple[dict[str, Any], PendingScreening | None]:
+    """Score one wallet; returns the API payload and the rows to persist (none if degraded).
+
+    A decision for the same wallet, profile and ruleset made in the current head bucket is
+    reused (``risk_reuse``): the payload carries that decision's id and ``reused=True`` and
+    only a link row is persisted. ``decision_id`` doubles as the link id for batch retries.
+    """
+    head = await _live_head(subgraph_url)
+    block = head if as_of_block is None else max(0, min(as_of_block, head))
+    if head > 0:
+        stored = get_reusable_decision(chain_id, address, client_profile, block, window_from_block)
+        if stored is not None and (not include_graph_hints or "graph_hints" in stored["evidence"]):
+            link = decision_link_row(
+                stored["decision_id"],
+                chain_id=chain_id,
+                address=address,
+                correlation_id=correlation_id,
+                batch_job_id=batch_job_id,
+                link_id=decision_id,
+            )
+            out = {
+                **stored,
+                "correlation_id": correlation_id or str(link["id"]),
+                "chain_id": chain_id,
+                "address": address.lower(),
+                "degraded": False,
+                "reused": True,
+            }
+            return out, PendingScreening.reused(link)
+
     merged, score, elapsed_ms, severity, action, reasons, evidence, head, degraded = (
         await evaluate_risk_for_address(
             subgraph_url,
@@ -269,14 +381,16 @@ async def run_online_screen(
             client_profile,
             use_cache=True,
             include_graph_hints=include_graph_hints,
+            as_of_block=as_of_block,
+            window_from_block=window_from_block,
+            head=head,
         )
     )
 
-    did: uuid.UUID | None = None
+    item: PendingScreening | None = None
     evidence_out = dict(evidence)
     if head > 0:
-        did, _snap_id = persist_screening(
-            db,
+        item = build_pending_screening(
             chain_id=chain_id,
             address=address,
             client_profile=client_profile,
@@ -290,9 +404,12 @@ async def run_online_screen(
             head=head,
             latency_ms=elapsed_ms,
             degraded=degraded,
+            batch_job_id=batch_job_id,
+            decision_id=decision_id,
         )
+    did = item.decision_id if item else None
     out_corr = correlation_id or (str(did) if did else str(uuid.uuid4()))
-    return {
+    out = {
         "correlation_id": out_corr,
         "decision_id": str(did) if did else None,
         "chain_id": chain_id,
@@ -307,4 +424,125 @@ async def run_online_screen(
         "evidence": evidence_out,
         "latency_ms": elapsed_ms,
         "degraded": degraded,
+        "reused": False,
     }
+    if item is not None and not degraded:
+        # Offered for reuse by whoever commits the rows, never before.
+        item.reuse = {
+            "chain_id": chain_id,
+            "address": address,
+            "client_profile": client_profile,
+            "block": head,
+            "payload": out,
+            "window_start_floor": window_from_block,
+        }
+    return out, item
+
+
+async def _persist_now(items: list[PendingScreening]) -> None:
+    try:
+        async with AsyncSessionLocal() as db:
+            delivery_ids = await flush_screenings_async(db, items)
+            await db.commit()
+    except Exception:  # noqa: BLE001
+        log.exception("stream persist failed (%s screenings)", len(items))
+        PERSIST_FAILURES.labels(path="stream").inc()
+        return
+    offer_for_reuse(items)
+    enqueue_deliveries(delivery_ids)
+
+
+async def run_online_screen(
+    db: AsyncSession,
+    subgraph_url: str,
+    chain_id: str,
+    address: str,
+    client_profile: ClientProfile,
+    correlation_id: str | None,
+    include_graph_hints: bool,
+) -> dict[str, Any]:
+    out, item = await screen_address(
+        subgraph_url,
+        chain_id,
+        address,
+        client_profile,
+        correlation_id,
+        include_graph_hints,
+    )
+    if item is not None:
+        queued = (
+            settings.RISK_WRITE_BEHIND_ENABLED and write_behind.running and write_behind.submit(item)
+        )
+        if not queued:
+            delivery_ids = await flush_screenings_async(db, [item])
+            await db.commit()
+            offer_for_reuse([item])
+            enqueue_deliveries(delivery_ids)
+    return out
+
+
+async def stream_online_screens(
+    subgraph_url: str,
+    chain_id: str,
+    addresses: Sequence[str],
+    client_profile: ClientProfile,
+    correlation_id: str | None,
+    include_graph_hints: bool,
+    *,
+    concurrency: int | None = None,
+) -> AsyncIterator[dict[str, Any]]:
+    """Screen ``addresses`` on a bounded worker pool, yielding each result as it completes.
+
+    Results carry ``index`` (position in ``addresses``) since they arrive out of order; a
+    failed address yields ``{"index", "address", "error"}`` instead of aborting the stream.
+    Closing the iterator early cancels the outstanding screens.
+    """
+    workers = max(1, min(concurrency or settings.RISK_STREAM_CONCURRENCY, len(addresses)))
+    next_index = iter(range(len(addresses)))
+    done: asyncio.Queue[dict[str, Any] | None] = asyncio.Queue()
+    to_persist: list[PendingScreening] = []
+    use_write_behind = settings.RISK_WRITE_BEHIND_ENABLED and write_behind.running
+
+    async def _worker() -> None:
+        try:
+            for i in next_index:
+                address = addresses[i]
+                corr = f"{correlation_id}-{i}" if correlation_id else None
+                try:
+                    out, item = await screen_address(
+                        subgraph_url,
+                        chain_id,
+                        address,
+                        client_profile,
+                        corr,
+                        include_graph_hints,
+                    )
+                except Exception as e:  # noqa: BLE001
+                    log.warning("stream screen failed for %s: %s", address, e)
+                    await done.put({"index": i, "address": address, "error": str(e)})
+                    continue
+                # A full write-behind backlog hands the item back to this stream's own flushes.
+                if item is not None and not (use_write_behind and write_behind.submit(item)):
+                    to_persist.append(item)
+                await done.put({"index": i, **out})
+        finally:
+            await done.put(None)
+
+    tasks = [asyncio.create_task(_worker()) for _ in range(workers)]
+    try:
+        running = len(tasks)
+        while running:
+            row = await done.get()
+            if row is None:
+                running -= 1
+                continue
+            yield row
+            if len(to_persist) >= settings.RISK_PERSIST_FLUSH_MAX_ITEMS:
+                batch, to_persist[:] = list(to_persist), []
+                await _persist_now(batch)
+    finally:
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if to_persist:
+            await _persist_now(to_persist)
@@ -0,0 +1,150 @@
+"""Priority lanes and per-tenant fair-share dispatch for batch screening chunks.
+
+Batch jobs run on one of three lanes (``aml_urgent``, ``aml_tasks``, ``aml_bulk``), each a
+Celery queue that deployments can give dedicated workers. Within a lane, chunks are not
+published all at once: each tenant has a Redis list of pending chunk specs, and at most
+``RISK_FAIR_SHARE_INFLIGHT`` chunks per lane sit in the broker or run at a time. Free slots go to
+tenants round-robin, so a tenant's 5000-address re-screen does not delay another tenant's small
+job. Slots are leases in a sorted set, so a slot held by a lost worker expires after
+``RISK_FAIR_SHARE_LEASE_SECONDS``.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import time
+from typing import Literal
+
+import redis
+
+from app.core.config import settings
+
+log = logging.getLogger(__name__)
+
+Lane = Literal["urgent", "normal", "bulk"]
+
+LANE_QUEUES: dict[str, str] = {
+    "urgent": "aml_urgent",
+    "normal": "aml_tasks",
+    "bulk": "aml_bulk",
+}
+WEBHOOK_QUEUE = "aml_webhooks"
+DEFAULT_TENANT = "default"
+
+# KEYS: ring, members, tenant queue. ARGV: tenant, spec...
+_ENQUEUE = """
+for i = 2, #ARGV do
+  redis.call('RPUSH', KEYS[3], ARGV[i])
+end
+if redis.call('SADD', KEYS[2], ARGV[1]) == 1 then
+  redis.call('LPUSH', KEYS[1], ARGV[1])
+end
+return redis.call('LLEN', KEYS[3])
+"""
+
+# KEYS: ring, members, inflight. ARGV: now, lease, limit, tenant queue prefix.
+_ACQUIRE = """
+redis.call('ZREMRANGEBYSCORE', KEYS[3], '-inf', tonumber(ARGV[1]) - tonumber(ARGV[2]))
+if redis.call('ZCARD', KEYS[3]) >= tonumber(ARGV[3]) then
+  return false
+end
+for _ = 1, redis.call('LLEN', KEYS[1]) do
+  local tenant = redis.call('RPOPLPUSH', KEYS[1], KEYS[1])
+  local spec = redis.call('LPOP', ARGV[4] .. tenant)
+  if spec then
+    redis.call('ZADD', KEYS[3], ARGV[1], spec)
+    return spec
+  end
+  redis.call('LREM', KEYS[1], 0, tenant)
+  redis.call('SREM', KEYS[2], tenant)
+end
+return false
+"""
+
+
+def _client() -> redis.Redis:
+    return redis.from_url(settings.REDIS_URL)
+
+
+def tenant_for_api_key(api_key: str | None) -> str:
+    """Stable, non-reversible tenant id for an API key (``default`` without one)."""
+    if not api_key:
+        return DEFAULT_TENANT
+    return hashlib.sha256(api_key.encode()).hexdigest()[:16]
+
+
+def lane_for_job(total: int, requested: str | None = None) -> Lane:
+    """Explicit priority if given, else by size: small jobs are urgent, large ones bulk."""
+    if requested in LANE_QUEUES:
+        return requested  # type: ignore[return-value]
+    if total <= settings.RISK_LANE_URGENT_MAX_ADDRESSES:
+        return "urgent"
+    if total >= settings.RISK_LANE_BULK_MIN_ADDRESSES:
+        return "bulk"
+    return "normal"
+
+
+def queue_for_lane(lane: str) -> str:
+    return LANE_QUEUES.get(lane, LANE_QUEUES["normal"])
+
+
+def chunk_spec(job_id: str, start: int, end: int) -> str:
+    return f"{job_id}:{start}:{end}"
+
+
+def parse_chunk_spec(spec: str | bytes) -> tuple[str, int, int]:
+    raw = spec.decode() if isinstance(spec, bytes) else spec
+    job_id, start, end = raw.rsplit(":", 2)
+    return job_id, int(start), int(end)
+
+
+def _keys(lane: str) -> tuple[str, str, str, str]:
+    base = f"aml:fair:{lane}"
+    return f"{base}:ring", f"{base}:members", f"{base}:inflight", f"{base}:q:"
+
+
+class FairShareScheduler:
+    """Redis-backed round-robin over tenants, one instance per process."""
+
+    def __init__(self, client: redis.Redis | None = None) -> None:
+        self._redis = client
+
+    @property
+    def redis(self) -> redis.Redis:
+        if self._redis is None:
+            self._redis = _client()
+        return self._redis
+
+    def enqueue(self, lane: str, tenant: str, specs: list[str]) -> int:
+        """Queue chunk specs for ``tenant``; returns the tenant's pending count in the lane."""
+        if not specs:
+            return 0
+        ring, members, _inflight, prefix = _keys(lane)
+        return int(
+            self.redis.eval(_ENQUEUE, 3, ring, members, prefix + tenant, tenant, *specs),
+        )
+
+    def acquire(self, lane: str, *, now: float | None = None) -> str | None:
+        """Take a free slot and the next tenant's next chunk, or ``None`` if full or idle."""
+        ring, members, inflight, prefix = _keys(lane)
+        spec = self.redis.eval(
+            _ACQUIRE,
+            3,
+            ring,
+            members,
+            inflight,
+            time.time() if now is None else now,
+            settings.RISK_FAIR_SHARE_LEASE_SECONDS,
+            settings.RISK_FAIR_SHARE_INFLIGHT,
+            prefix,
+        )
+        if spec is None:
+            return None
+        return spec.decode() if isinstance(spec, bytes) else spec
+
+    def release(self, lane: str, spec: str) -> None:
+        self.redis.zrem(_keys(lane)[2], spec)
+
+
+fair_share = FairShareScheduler()
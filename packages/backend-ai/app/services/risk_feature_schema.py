@@ -0,0 +1,186 @@
+"""Feature schema registry and compact, versioned binary encoding for stored risk vectors.
+
+Each schema assigns every known key a fixed column index. A vector is stored as a msgpack
+array ``[schema_id, version, presence_mask, values, extras]``: ``values`` holds only the
+present columns in index order, ``extras`` carries keys the schema does not know yet, so
+encoding is lossless. Columns are append-only within a version; add keys by registering a
+new version and keep the old ones for decoding.
+"""
+
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass, field
+from typing import Any
+
+import msgpack
+
+
+class FeatureSchemaError(ValueError):
+    """Payload cannot be encoded/decoded with the registered schemas."""
+
+
+_TX_HASH_RE = re.compile(r"0x[0-9a-f]{64}")
+# msgpack ext type for integers outside the 64-bit range (raw wei volume sums).
+_EXT_BIGINT = 1
+
+
+@dataclass(frozen=True)
+class FeatureSchema:
+    schema_id: int
+    name: str
+    version: int
+    columns: tuple[str, ...]
+    tx_hash_lists: frozenset[str] = frozenset()
+    index: dict[str, int] = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        object.__setattr__(self, "index", {c: i for i, c in enumerate(self.columns)})
+
+
+def _window_columns(prefix: str) -> tuple[str, ...]:
+    return tuple(
+        f"{prefix}_{k}"
+        for k in (
+            "tx_count",
+            "volume",
+            "unique_reserves",
+            "unique_counterparty_addresses",
+            "avg_gas_window",
+            "max_ops_same_block",
+            "sample_tx_hashes",
+        )
+    )
+
+
+FEATURES_V1 = FeatureSchema(
+    schema_id=1,
+    name="features",
+    version=1,
+    columns=(
+        "chain_id",
+        "address",
+        "subgraph_block_head",
+        "lifetime_deposit_count",
+        "lifetime_withdraw_count",
+        "lifetime_borrow_count",
+        "lifetime_repay_count",
+        "lifetime_total_deposit_volume_raw",
+        "lifetime_total_withdraw_volume_raw",
+        "lifetime_total_borrow_volume_raw",
+        "lifetime_total_repay_volume_raw",
+        "first_activity_block",
+        "last_activity_block",
+        *_window_columns("window_24h"),
+        *_window_columns("window_7d"),
+    ),
+    tx_hash_lists=frozenset({"window_24h_sample_tx_hashes", "window_7d_sample_tx_hashes"}),
+)
+
+EVIDENCE_V1 = FeatureSchema(
+    schema_id=2,
+    name="evidence",
+    version=1,
+    columns=(
+        "window_start_block",
+        "window_end_block",
+        "subgraph_block_head",
+        "graph_component_id",
+        "supporting_tx_ids",
+        "explain",
+        "graph_hints",
+        "feature_snapshot_id",
+    ),
+    tx_hash_lists=frozenset({"supporting_tx_ids"}),
+)
+
+_REGISTRY: dict[tuple[int, int], FeatureSchema] = {
+    (s.schema_id, s.version): s for s in (FEATURES_V1, EVIDENCE_V1)
+}
+_CURRENT: dict[str, FeatureSchema] = {"features": FEATURES_V1, "evidence": EVIDENCE_V1}
+
+
+def current_schema(name: str) -> FeatureSchema:
+    try:
+        return _CURRENT[name]
+    except KeyError as e:
+        raise FeatureSchemaError(f"Unknown feature schema {name!r}") from e
+
+
+def _pack_hashes(values: Any) -> Any:
+    if not isinstance(values, list):
+        return values
+    return [
+        bytes.fromhex(v[2:]) if isinstance(v, str) and _TX_HASH_RE.fullmatch(v) else v
+        for v in values
+    ]
+
+
+def _unpack_hashes(values: Any) -> Any:
+    if not isinstance(values, list):
+        return values
+    return ["0x" + v.hex() if isinstance(v, bytes) else v for v in values]
+
+
+def _wide_ints(value: Any) -> Any:
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, int) and not (-(2**63) <= value < 2**64):
+        n = (value.bit_length() + 8) // 8
+        return msgpack.ExtType(_EXT_BIGINT, value.to_bytes(n, "big", signed=True))
+    if isinstance(value, list):
+        return [_wide_ints(v) for v in value]
+    if isinstance(value, dict):
+        return {k: _wide_ints(v) for k, v in value.items()}
+    return value
+
+
+def _ext_hook(code: int, data: bytes) -> Any:
+    if code == _EXT_BIGINT:
+        return int.from_bytes(data, "big", signed=True)
+    return msgpack.ExtType(code, data)
+
+
+def encode_vector(name: str, payload: dict[str, Any]) -> bytes:
+    """Pack ``payload`` with the current version of schema ``name``."""
+    schema = current_schema(name)
+    mask = 0
+    values: list[Any] = []
+    extras: dict[str, Any] = {}
+    present = sorted(
+        ((schema.index[k], k) for k in payload if k in schema.index),
+    )
+    for idx, key in present:
+        mask |= 1 << idx
+        v = payload[key]
+        values.append(_pack_hashes(v) if key in schema.tx_hash_lists else v)
+    for key, v in payload.items():
+        if key not in schema.index:
+            extras[key] = v
+    body = [schema.schema_id, schema.version, mask, values, extras or None]
+    return msgpack.packb(_wide_ints(body), use_bin_type=True)
+
+
+def decode_vector(raw: bytes) -> dict[str, Any]:
+    """Inverse of ``encode_vector`` for any registered schema version."""
+    try:
+        schema_id, version, mask, values, extras = msgpack.unpackb(
+            raw,
+            raw=False,
+            strict_map_key=False,
+            ext_hook=_ext_hook,
+        )
+    except (ValueError, TypeError, msgpack.ExtraData, msgpack.FormatError) as e:
+        raise FeatureSchemaError(f"Not a packed feature vector: {e}") from e
+    schema = _REGISTRY.get((schema_id, version))
+    if schema is None:
+        raise FeatureSchemaError(f"Unknown feature schema id={schema_id} v{version}")
+    out: dict[str, Any] = {}
+    it = iter(values)
+    for idx, key in enumerate(schema.columns):
+        if mask >> idx & 1:
+            v = next(it)
+            out[key] = _unpack_hashes(v) if key in schema.tx_hash_lists else v
+    if extras:
+        out.update(extras)
+    return out
@@ -31,6 +31,25 @@ query UserRiskStats($id: ID!) {
 }
 """
 
+# Same entity as of a past block (time-travel query); needs a non-pruned subgraph deployment.
+USER_RISK_STATS_AT_BLOCK_QUERY = """
+query UserRiskStatsAt($id: ID!, $block: Int!) {
+  user(id: $id, block: { number: $block }) {
+    id
+    firstActivityBlock
+    lastActivityBlock
+    depositCount
+    withdrawCount
+    borrowCount
+    repayCount
+    totalDepositVolume
+    totalWithdrawVolume
+    totalBorrowVolume
+    totalRepayVolume
+  }
+}
+"""
+
 _META_BLOCK_QUERY = """
 query MetaBlock {
   _meta {
@@ -163,11 +182,20 @@ async def fetch_meta_block_number(
 async def fetch_user_lifetime_row(
     subgraph_url: str,
     address: str,
+    *,
+    block: int | None = None,
 ) -> UserRiskLifetime | None:
+    """Lifetime ``User`` row at the subgraph head, or as of ``block`` when given."""
     uid = normalize_subgraph_user_id(address)
     timeout = httpx.Timeout(settings.SUBGRAPH_TIMEOUT_SECONDS)
     async with httpx.AsyncClient(timeout=timeout) as client:
-        payload = {"query": USER_RISK_STATS_QUERY, "variables": {"id": uid}}
+        if block is None:
+            payload = {"query": USER_RISK_STATS_QUERY, "variables": {"id": uid}}
+        else:
+            payload = {
+                "query": USER_RISK_STATS_AT_BLOCK_QUERY,
+                "variables": {"id": uid, "block": block},
+            }
         resp = await client.post(subgraph_url, json=payload)
         resp.raise_for_status()
         body = resp.json()
@@ -0,0 +1,92 @@
+"""Keyset pagination over decision history and cases.
+
+Pages are ordered newest first on ``(timestamp, id)``; the cursor is the last row's key,
+opaque to clients (URL-safe base64 JSON). Each page is an index range scan that starts after
+the cursor, so deep pages cost the same as the first one, unlike ``OFFSET``.
+"""
+
+from __future__ import annotations
+
+import base64
+import binascii
+import json
+import uuid
+from datetime import datetime
+from typing import Any
+
+from sqlalchemy import Select, select, tuple_
+
+from app.db.models import RiskCase, RiskDecision
+
+MAX_PAGE_SIZE = 200
+
+
+class InvalidCursor(ValueError):
+    """Cursor string was not produced by ``encode_cursor``."""
+
+
+def encode_cursor(ts: datetime, row_id: uuid.UUID) -> str:
+    raw = json.dumps([ts.isoformat(), str(row_id)], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, uuid.UUID]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        ts, row_id = json.loads(raw)
+        return datetime.fromisoformat(ts), uuid.UUID(row_id)
+    except (binascii.Error, ValueError, TypeError) as e:
+        raise InvalidCursor("Invalid cursor") from e
+
+
+def page_size(limit: int) -> int:
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def decision_history_stmt(
+    chain_id: str,
+    address: str,
+    *,
+    cursor: str | None,
+    limit: int,
+) -> Select[tuple[RiskDecision]]:
+    """One page (plus a look-ahead row) of a wallet's decisions, newest first."""
+    stmt = (
+        select(RiskDecision)
+        .where(RiskDecision.chain_id == chain_id, RiskDecision.address == address)
+        .order_by(RiskDecision.created_at.desc(), RiskDecision.id.desc())
+        .limit(limit + 1)
+    )
+    if cursor:
+        ts, row_id = decode_cursor(cursor)
+        stmt = stmt.where(tuple_(RiskDecision.created_at, RiskDecision.id) < (ts, row_id))
+    return stmt
+
+
+def cases_page_stmt(
+    *,
+    status: str | None,
+    chain_id: str | None,
+    cursor: str | None,
+    limit: int,
+) -> Select[tuple[RiskCase]]:
+    """One page (plus a look-ahead row) of cases by ``updated_at DESC, id DESC``."""
+    stmt = select(RiskCase).order_by(RiskCase.updated_at.desc(), RiskCase.id.desc())
+    if status:
+        stmt = stmt.where(RiskCase.status == status)
+    if chain_id:
+        stmt = stmt.where(RiskCase.chain_id == chain_id)
+    if cursor:
+        ts, row_id = decode_cursor(cursor)
+        stmt = stmt.where(tuple_(RiskCase.updated_at, RiskCase.id) < (ts, row_id))
+    return stmt.limit(limit + 1)
+
+
+def split_page(rows: list[Any], limit: int, key: str) -> tuple[list[Any], str | None]:
+    """Drop the look-ahead row; return the page and the cursor for the next one."""
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    get = last.get if isinstance(last, dict) else lambda k: getattr(last, k)
+    return rows, encode_cursor(get(key), get("id"))
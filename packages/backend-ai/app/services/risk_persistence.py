@@ -0,0 +1,476 @@
+"""Buffered bulk persistence for screening snapshots, decisions, and risk cases.
+
+The API's write-behind queue is bounded (``RISK_WRITE_BEHIND_MAX_PENDING``; a full queue makes
+callers persist inline) and never stalls behind a poison row: a batch that keeps failing for
+reasons other than a lost connection is split in halves down to single rows, and the rows that
+fail on their own go to the Redis dead-letter list ``risk:persist:dead_letter``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import time
+import uuid
+from collections.abc import Callable, Sequence
+from dataclasses import dataclass
+from datetime import UTC, datetime
+from typing import Any
+
+import redis
+from prometheus_client import Counter
+from sqlalchemy import insert, select, tuple_, update
+from sqlalchemy.exc import DBAPIError, InterfaceError, OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.models import FeatureSnapshot, RiskCase, RiskDecision, RiskDecisionLink
+from app.db.session import AsyncSessionLocal
+from app.services.risk_reuse import remember_decision
+from app.services.risk_webhooks import enqueue_deliveries, stage_alerts_for_decisions
+
+log = logging.getLogger(__name__)
+
+_CASE_SEVERITIES = ("MEDIUM", "HIGH", "CRITICAL")
+OPEN_CASE_STATUSES = ("open", "in_review")
+DEAD_LETTER_KEY = "risk:persist:dead_letter"
+
+PERSIST_FAILURES = Counter(
+    "cohortlens_risk_persist_failures_total",
+    "Failed screening persistence attempts",
+    ["path"],
+)
+WRITE_BEHIND_REJECTED = Counter(
+    "cohortlens_risk_write_behind_rejected_total",
+    "Screenings persisted inline because the write-behind backlog was full",
+)
+DEAD_LETTERED = Counter(
+    "cohortlens_risk_dead_lettered_total",
+    "Screenings moved to the dead-letter list instead of the database",
+)
+
+
+@dataclass
+class PendingScreening:
+    """Rows for one screening, with client-side ids so callers never wait on the database.
+
+    A reused screening (``link`` set) only writes its ``risk_decision_links`` row; ``decision``
+    then carries just the id of the existing decision and ``snapshot`` is empty. ``reuse`` holds
+    the ``remember_decision`` arguments; the decision is offered to later screens only once its
+    rows are committed (``offer_for_reuse``).
+    """
+
+    snapshot: dict[str, Any]
+    decision: dict[str, Any]
+    link: dict[str, Any] | None = None
+    reuse: dict[str, Any] | None = None
+
+    @property
+    def decision_id(self) -> uuid.UUID:
+        return self.decision["id"]
+
+    @property
+    def snapshot_id(self) -> uuid.UUID:
+        return self.snapshot["id"]
+
+    @property
+    def opens_case(self) -> bool:
+        return self.link is None and self.decision["severity"] in _CASE_SEVERITIES
+
+    @classmethod
+    def reused(cls, link: dict[str, Any]) -> PendingScreening:
+        return cls(snapshot={}, decision={"id": link["decision_id"]}, link=link)
+
+
+def _open_case_rows(items: Sequence[PendingScreening]) -> list[dict[str, Any]]:
+    """One new-case row per wallet, pointing at that wallet's latest decision in ``items``."""
+    latest: dict[tuple[str, str], dict[str, Any]] = {}
+    for item in items:
+        if item.opens_case:
+            d = item.decision
+            latest[(d["chain_id"], d["address"])] = d
+    now = datetime.now(UTC)
+    return [
+        {
+            "id": uuid.uuid4(),
+            "chain_id": chain_id,
+            "address": address,
+            "status": "open",
+            "latest_decision_id": d["id"],
+            "created_at": now,
+            "updated_at": now,
+        }
+        for (chain_id, address), d in latest.items()
+    ]
+
+
+def _upsert_open_cases_select_then_write(db: Session, rows: list[dict[str, Any]]) -> None:
+    """Fallback for dialects without ``ON CONFLICT``; not race-free."""
+    by_key = {(r["chain_id"], r["address"]): r for r in rows}
+    existing = db.execute(
+        select(RiskCase.id, RiskCase.chain_id, RiskCase.address).where(
+            tuple_(RiskCase.chain_id, RiskCase.address).in_(list(by_key)),
+            RiskCase.status.in_(OPEN_CASE_STATUSES),
+        ),
+    ).all()
+    updates: list[dict[str, Any]] = []
+    for case_id, chain_id, address in existing:
+        r = by_key.pop((chain_id, address), None)
+        if r is not None:
+            updates.append(
+                {
+                    "id": case_id,
+                    "latest_decision_id": r["latest_decision_id"],
+                    "updated_at": r["updated_at"],
+                },
+            )
+    if updates:
+        db.execute(update(RiskCase), updates)
+    if by_key:
+        db.execute(insert(RiskCase), list(by_key.values()))
+
+
+def dialect_insert_for(db: Session) -> Callable[..., Any] | None:
+    """``insert`` construct with ``on_conflict_*`` support for the bound dialect, if any."""
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+        return pg_insert
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+        return sqlite_insert
+    return None
+
+
+def _insert_snapshots(db: Session, items: Sequence[PendingScreening]) -> None:
+    """Content-addressed insert: identical bundles share one row keyed by their hash-derived id."""
+    rows = list({i.snapshot_id: i.snapshot for i in items}.values())
+    dialect_insert = dialect_insert_for(db)
+    if dialect_insert is not None:
+        db.execute(dialect_insert(FeatureSnapshot).on_conflict_do_nothing(), rows)
+        return
+    existing = set(
+        db.scalars(
+            select(FeatureSnapshot.id).where(FeatureSnapshot.id.in_([r["id"] for r in rows])),
+        ),
+    )
+    rows = [r for r in rows if r["id"] not in existing]
+    if rows:
+        db.execute(insert(FeatureSnapshot), rows)
+
+
+def _upsert_open_cases(db: Session, items: Sequence[PendingScreening]) -> None:
+    """``INSERT ... ON CONFLICT DO UPDATE`` against ``uq_risk_cases_open_chain_address``."""
+    rows = _open_case_rows(items)
+    if not rows:
+        return
+    dialect_insert = dialect_insert_for(db)
+    if dialect_insert is None:
+        _upsert_open_cases_select_then_write(db, rows)
+        return
+    stmt = dialect_insert(RiskCase)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[RiskCase.chain_id, RiskCase.address],
+        index_where=RiskCase.status.in_(OPEN_CASE_STATUSES),
+        set_={
+            "latest_decision_id": stmt.excluded.latest_decision_id,
+            "updated_at": stmt.excluded.updated_at,
+        },
+    )
+    db.execute(stmt, rows)
+
+
+def _insert_links(db: Session, rows: list[dict[str, Any]]) -> None:
+    """Link ids are deterministic for batch screens, so a retried write skips known links."""
+    dialect_insert = dialect_insert_for(db)
+    if dialect_insert is not None:
+        db.execute(dialect_insert(RiskDecisionLink).on_conflict_do_nothing(), rows)
+        return
+    existing = set(
+        db.scalars(
+            select(RiskDecisionLink.id).where(RiskDecisionLink.id.in_([r["id"] for r in rows])),
+        ),
+    )
+    rows = [r for r in rows if r["id"] not in existing]
+    if rows:
+        db.execute(insert(RiskDecisionLink), rows)
+
+
+def offer_for_reuse(items: Sequence[PendingScreening]) -> None:
+    """Offer the decisions in ``items`` to later screens; call after the commit that stored them."""
+    for item in items:
+        if item.reuse is not None:
+            remember_decision(**item.reuse)
+
+
+def _drop_dangling_links(db: Session, rows: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    ids = {r["decision_id"] for r in rows}
+    existing = set(db.scalars(select(RiskDecision.id).where(RiskDecision.id.in_(ids))))
+    dangling = [r for r in rows if r["decision_id"] not in existing]
+    if dangling:
+        log.warning("skipping %s links to decisions that are not stored", len(dangling))
+    return [r for r in rows if r["decision_id"] in existing]
+
+
+def _drop_existing_decisions(
+    db: Session,
+    items: Sequence[PendingScreening],
+) -> list[PendingScreening]:
+    ids = [i.decision_id for i in items]
+    existing = set(db.scalars(select(RiskDecision.id).where(RiskDecision.id.in_(ids))))
+    if existing:
+        log.info("skipping %s already persisted decisions", len(existing))
+    return [i for i in items if i.decision_id not in existing]
+
+
+def flush_screenings(
+    db: Session,
+    items: Sequence[PendingScreening],
+    *,
+    skip_existing: bool = False,
+) -> list[str]:
+    """Multi-row insert snapshots + decisions, upsert open cases, stage alert deliveries.
+
+    With ``skip_existing``, decisions whose (deterministic) id is already stored are dropped
+    first, so a retried write neither duplicates the decision nor re-sends its alerts.
+    ``risk_decisions`` is partitioned on ``created_at``, so the id alone cannot carry a unique
+    constraint. Reused screenings only add their link rows: the decision they point at already
+    opened its case and staged its alerts; a link whose decision is not stored is dropped. Does
+    not commit; returns delivery ids to enqueue (and call ``offer_for_reuse``) once the caller
+    has committed.
+    """
+    links = [i.link for i in items if i.link is not None]
+    if links:
+        links = _drop_dangling_links(db, links)
+        if links:
+            _insert_links(db, links)
+        items = [i for i in items if i.link is None]
+    if items and skip_existing:
+        items = _drop_existing_decisions(db, items)
+    if not items:
+        return []
+    _insert_snapshots(db, items)
+    db.execute(insert(RiskDecision), [i.decision for i in items])
+    _upsert_open_cases(db, items)
+    return stage_alerts_for_decisions(db, [i.decision for i in items])
+
+
+async def flush_screenings_async(db: AsyncSession, items: Sequence[PendingScreening]) -> list[str]:
+    """``flush_screenings`` on an ``AsyncSession``: same statements, non-blocking I/O."""
+    return await db.run_sync(flush_screenings, items)
+
+
+class ScreeningWriteBuffer:
+    """Synchronous write-behind buffer for worker loops; flushes on size or age."""
+
+    def __init__(
+        self,
+        db: Session,
+        *,
+        max_items: int | None = None,
+        max_age_seconds: float | None = None,
+        before_commit: Callable[[Session, list[PendingScreening]], None] | None = None,
+        skip_existing: bool = False,
+    ) -> None:
+        self._db = db
+        self._skip_existing = skip_existing
+        self._max_items = max_items or settings.RISK_PERSIST_FLUSH_MAX_ITEMS
+        self._max_age = (
+            max_age_seconds
+            if max_age_seconds is not None
+            else settings.RISK_PERSIST_FLUSH_INTERVAL_MS / 1000
+        )
+        self._before_commit = before_commit
+        self._items: list[PendingScreening] = []
+        self._oldest: float | None = None
+
+    def add(self, item: PendingScreening) -> None:
+        if not self._items:
+            self._oldest = time.monotonic()
+        self._items.append(item)
+        if len(self._items) >= self._max_items or (
+            self._oldest is not None and time.monotonic() - self._oldest >= self._max_age
+        ):
+            self.flush()
+
+    def flush(self) -> None:
+        if not self._items:
+            return
+        items, self._items, self._oldest = self._items, [], None
+        delivery_ids = flush_screenings(self._db, items, skip_existing=self._skip_existing)
+        if self._before_commit is not None:
+            self._before_commit(self._db, items)
+        self._db.commit()
+        offer_for_reuse(items)
+        enqueue_deliveries(delivery_ids)
+
+
+def _client() -> redis.Redis:
+    return redis.from_url(settings.REDIS_URL)
+
+
+def _is_transient(error: BaseException) -> bool:
+    """Lost connections and timeouts: retrying the same rows later can succeed."""
+    if isinstance(error, DBAPIError) and error.connection_invalidated:
+        return True
+    return isinstance(error, OperationalError | InterfaceError | OSError | TimeoutError)
+
+
+def dead_letter(items: Sequence[PendingScreening], error: BaseException | str) -> None:
+    """Park screenings that cannot be written; logged, counted and kept in Redis for replay."""
+    if not items:
+        return
+    DEAD_LETTERED.inc(len(items))
+    log.error(
+        "dead-lettering %s screenings (decisions %s): %s",
+        len(items),
+        [str(i.decision_id) for i in items],
+        error,
+    )
+    entries = [
+        json.dumps(
+            {
+                "error": str(error)[:2000],
+                "snapshot": i.snapshot,
+                "decision": i.decision,
+                "link": i.link,
+            },
+            default=str,
+        )
+        for i in items
+    ]
+    try:
+        pipe = _client().pipeline()
+        pipe.lpush(DEAD_LETTER_KEY, *entries)
+        pipe.ltrim(DEAD_LETTER_KEY, 0, settings.RISK_PERSIST_DEAD_LETTER_MAX - 1)
+        pipe.execute()
+    except redis.RedisError:
+        log.error("dead-letter list unavailable; screenings only in this log: %s", entries)
+
+
+class WriteBehindPersister:
+    """Process-wide write-behind queue for the API, flushed in bulk over the async engine."""
+
+    def __init__(
+        self,
+        *,
+        max_items: int | None = None,
+        interval_seconds: float | None = None,
+        max_pending: int | None = None,
+    ) -> None:
+        self._max_items = max_items or settings.RISK_PERSIST_FLUSH_MAX_ITEMS
+        self._interval = (
+            interval_seconds
+            if interval_seconds is not None
+            else settings.RISK_PERSIST_FLUSH_INTERVAL_MS / 1000
+        )
+        self._max_pending = max_pending or settings.RISK_WRITE_BEHIND_MAX_PENDING
+        self._pending: list[PendingScreening] = []
+        self._failures = 0
+        self._wake = asyncio.Event()
+        self._task: asyncio.Task[None] | None = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def submit(self, item: PendingScreening) -> bool:
+        """Queue ``item``; ``False`` when the backlog is full and the caller must persist it."""
+        if len(self._pending) >= self._max_pending:
+            WRITE_BEHIND_REJECTED.inc()
+            return False
+        self._pending.append(item)
+        if len(self._pending) >= self._max_items:
+            self._wake.set()
+        return True
+
+    async def start(self) -> None:
+        if not self.running:
+            self._wake = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self._interval)
+            except TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+
+    async def _write(self, items: list[PendingScreening]) -> Exception | None:
+        try:
+            async with AsyncSessionLocal() as db:
+                delivery_ids = await flush_screenings_async(db, items)
+                await db.commit()
+        except Exception as e:  # noqa: BLE001
+            log.exception("write-behind flush failed (%s screenings)", len(items))
+            PERSIST_FAILURES.labels(path="write_behind").inc()
+            return e
+        offer_for_reuse(items)
+        enqueue_deliveries(delivery_ids)
+        return None
+
+    async def _isolate(self, items: list[PendingScreening]) -> list[PendingScreening]:
+        """Write ``items`` in halves down to single rows; dead-letter rows that fail alone.
+
+        Returns the rows still unwritten when a transient error cut the search short.
+        """
+        parts = [items]
+        while parts:
+            part = parts.pop()
+            error = await self._write(part)
+            if error is None:
+                continue
+            if _is_transient(error):
+                return [i for p in [part, *parts] for i in p]
+            if len(part) == 1:
+                dead_letter(part, error)
+                continue
+            mid = len(part) // 2
+            parts += [part[mid:], part[:mid]]
+        return []
+
+    async def flush(self) -> None:
+        while self._pending:
+            items = self._pending[: self._max_items]
+            del self._pending[: len(items)]
+            error = await self._write(items)
+            if error is None:
+                self._failures = 0
+                continue
+            if not _is_transient(error):
+                self._failures += 1
+            if self._failures < settings.RISK_WRITE_BEHIND_MAX_ATTEMPTS:
+                self._requeue(items)
+                return
+            # The same kind of failure keeps coming back: find the rows that cause it.
+            self._failures = 0
+            left = await self._isolate(items)
+            if left:
+                self._requeue(left)
+                return
+
+    def _requeue(self, items: list[PendingScreening]) -> None:
+        room = max(self._max_pending - len(self._pending), 0)
+        if room < len(items):
+            dead_letter(items[room:], "write-behind backlog full")
+            items = items[:room]
+        self._pending[:0] = items
+
+
+write_behind = WriteBehindPersister()
@@ -0,0 +1,123 @@
+"""Reuse of fresh screening decisions across batch jobs and online requests.
+
+A decision depends on the wallet, the client profile, the ruleset and the features at the
+evaluation block. A wallet screened again with the same profile and ruleset while the head is
+still in the same ``RISK_DECISION_REUSE_BLOCKS``-wide bucket gets the stored decision back:
+no feature queries, no new snapshot or decision rows, only a ``risk_decision_links`` row that
+ties the new correlation / batch id to the existing decision. Decisions are offered only after
+their rows commit (``risk_persistence.offer_for_reuse``), so a link never outlives a rollback.
+"""
+
+from __future__ import annotations
+
+import json
+import uuid
+from datetime import UTC, datetime
+from typing import Any
+
+import redis
+
+from app.core.config import settings
+
+# Payload fields stored per decision; correlation ids belong to each caller.
+_STORED = (
+    "decision_id",
+    "risk_score",
+    "severity",
+    "recommended_action",
+    "model_version",
+    "ruleset_version",
+    "computed_at",
+    "risk_reasons",
+    "evidence",
+    "latency_ms",
+)
+
+
+def _client() -> redis.Redis:
+    return redis.from_url(settings.REDIS_URL)
+
+
+def head_bucket(block: int) -> int:
+    return block // settings.RISK_DECISION_REUSE_BLOCKS
+
+
+def reuse_key(
+    chain_id: str,
+    address: str,
+    client_profile: str,
+    block: int,
+    window_start_floor: int | None = None,
+) -> str:
+    a = address.strip().lower()
+    key = (
+        f"risk:reuse:{chain_id}:{a}:{client_profile}:"
+        f"{settings.RISK_RULESET_VERSION}:{head_bucket(block)}"
+    )
+    return key if window_start_floor is None else f"{key}:from{window_start_floor}"
+
+
+def get_reusable_decision(
+    chain_id: str,
+    address: str,
+    client_profile: str,
+    block: int,
+    window_start_floor: int | None = None,
+) -> dict[str, Any] | None:
+    """Stored payload of a decision made in ``block``'s bucket, or ``None``."""
+    if not settings.RISK_DECISION_REUSE_ENABLED:
+        return None
+    try:
+        raw = _client().get(reuse_key(chain_id, address, client_profile, block, window_start_floor))
+    except redis.RedisError:
+        return None
+    if not raw:
+        return None
+    try:
+        return json.loads(raw)
+    except ValueError:
+        return None
+
+
+def remember_decision(
+    chain_id: str,
+    address: str,
+    client_profile: str,
+    block: int,
+    payload: dict[str, Any],
+    window_start_floor: int | None = None,
+) -> None:
+    """Offer a non-degraded decision to later screens; only once its rows are committed."""
+    if not settings.RISK_DECISION_REUSE_ENABLED or not payload.get("decision_id"):
+        return
+    stored = {k: payload.get(k) for k in _STORED}
+    try:
+        _client().set(
+            reuse_key(chain_id, address, client_profile, block, window_start_floor),
+            json.dumps(stored, separators=(",", ":"), default=str),
+            ex=settings.RISK_DECISION_REUSE_TTL_SECONDS,
+            # First writer wins, so concurrent screens converge on one decision.
+            nx=True,
+        )
+    except redis.RedisError:
+        pass
+
+
+def decision_link_row(
+    decision_id: str | uuid.UUID,
+    *,
+    chain_id: str,
+    address: str,
+    correlation_id: str | None,
+    batch_job_id: uuid.UUID | None = None,
+    link_id: uuid.UUID | None = None,
+) -> dict[str, Any]:
+    return {
+        "id": link_id or uuid.uuid4(),
+        "decision_id": uuid.UUID(str(decision_id)),
+        "correlation_id": correlation_id,
+        "batch_job_id": batch_job_id,
+        "chain_id": chain_id,
+        "address": address.lower(),
+        "created_at": datetime.now(UTC),
+    }
@@ -1,107 +1,268 @@
-"""Queue outbound AML alert webhooks after high-signal decisions."""
+"""Queue outbound AML alert webhooks after high-signal decisions, and batch job callbacks.
+
+Workers send through one ``WebhookDispatcher`` per process, driven on a process-wide event loop,
+so per-host keep-alive pools survive from one delivery task to the next instead of being rebuilt
+by every ``asyncio.run``.
+"""
 
 from __future__ import annotations
 
-import hashlib
-import hmac
-import json
+import asyncio
 import logging
+import os
+import uuid
+from collections.abc import Iterable, Sequence
+from datetime import UTC, datetime
+from typing import Any
 from uuid import UUID
 
-import httpx
+from sqlalchemy import insert, select
 from sqlalchemy.orm import Session
 
-from app.db.models import AmlAlertDelivery, AmlWebhookEndpoint, RiskDecision
+from app.core.config import settings
+from app.db.models import AmlAlertDelivery, AmlWebhookEndpoint, RiskBatchJob, RiskDecision
+from app.services.webhook_dispatcher import (
+    Envelope,
+    WebhookDispatcher,
+    build_envelopes,
+    canonical_json,
+)
+from app.services.webhook_index import subscriptions
+from app.services.webhook_retry import backoff_seconds, schedule_retries
 
 log = logging.getLogger(__name__)
 
-_SEVERITY_RANK = {"LOW": 0, "MEDIUM": 1, "HIGH": 2, "CRITICAL": 3}
+_MAX_ATTEMPTS = 3
+BATCH_CALLBACK_TYPE = "risk_batch_completed"
 
 
-def sign_payload(body_json: str, secret: str) -> str:
-    return hmac.new(
-        secret.encode("utf-8"),
-        body_json.encode("utf-8"),
-        hashlib.sha256,
-    ).hexdigest()
+def decision_alert_row(decision: RiskDecision) -> dict[str, Any]:
+    """Column values of a persisted decision, in the shape staged by bulk persistence."""
+    return {
+        "id": decision.id,
+        "chain_id": decision.chain_id,
+        "address": decision.address,
+        "risk_score": decision.risk_score,
+        "severity": decision.severity,
+        "recommended_action": decision.recommended_action,
+        "ruleset_version": decision.ruleset_version,
+        "model_version": decision.model_version,
+        "correlation_id": decision.correlation_id,
+    }
 
 
-def queue_alerts_for_decision(db: Session, decision_id: UUID) -> None:
-    decision = db.get(RiskDecision, decision_id)
-    if decision is None:
-        return
-    rank = _SEVERITY_RANK.get(decision.severity, 0)
-    endpoints = db.query(AmlWebhookEndpoint).filter(AmlWebhookEndpoint.active.is_(True)).all()
-    to_enqueue: list[str] = []
-    for wh in endpoints:
-        events = wh.events or []
-        want = False
-        if "severity_ge_medium" in events and rank >= _SEVERITY_RANK["MEDIUM"]:
-            want = True
-        if "case_opened" in events and rank >= _SEVERITY_RANK["MEDIUM"]:
-            want = True
-        if not want:
+def stage_alerts_for_decisions(db: Session, decisions: Sequence[dict[str, Any]]) -> list[str]:
+    """Insert pending deliveries for every matching endpoint; caller commits, then enqueues ids.
+
+    The severity floor is each endpoint's subscription: the index only returns endpoints whose
+    events reach the decision's severity.
+    """
+    rows: list[dict[str, Any]] = []
+    for decision in decisions:
+        endpoint_ids = subscriptions.endpoints_for(db, decision["severity"])
+        if not endpoint_ids:
             continue
         payload = {
             "type": "risk_decision",
-            "decision_id": str(decision.id),
-            "chain_id": decision.chain_id,
-            "address": decision.address,
-            "risk_score": decision.risk_score,
-            "severity": decision.severity,
-            "recommended_action": decision.recommended_action,
-            "ruleset_version": decision.ruleset_version,
-            "model_version": decision.model_version,
-            "correlation_id": decision.correlation_id,
+            "decision_id": str(decision["id"]),
+            "chain_id": decision["chain_id"],
+            "address": decision["address"],
+            "risk_score": decision["risk_score"],
+            "severity": decision["severity"],
+            "recommended_action": decision["recommended_action"],
+            "ruleset_version": decision["ruleset_version"],
+            "model_version": decision["model_version"],
+            "correlation_id": decision["correlation_id"],
         }
-        delivery = AmlAlertDelivery(
-            webhook_endpoint_id=wh.id,
-            payload=payload,
-            status="pending",
-            attempts=0,
+        for endpoint_id in endpoint_ids:
+            rows.append(
+                {
+                    "id": uuid.uuid4(),
+                    "webhook_endpoint_id": endpoint_id,
+                    "payload": payload,
+                    "status": "pending",
+                    "attempts": 0,
+                },
+            )
+    if rows:
+        db.execute(insert(AmlAlertDelivery), rows)
+    return [str(r["id"]) for r in rows]
+
+
+def stage_batch_callbacks(
+    db: Session,
+    job_id: UUID,
+    total: int,
+    pages: Iterable[list[dict[str, Any]]],
+) -> list[str]:
+    """Insert one pending callback delivery per page of results, committing each one.
+
+    ``pages`` yields ``RISK_BATCH_CALLBACK_CHUNK_SIZE`` results at a time, so neither the results
+    nor the staged payloads of a large job are held in memory or in one transaction. Delivery ids
+    are derived from the job and chunk number: after an interrupted run, chunks already staged are
+    skipped. A job with no results still gets one (empty) chunk so the receiver learns it
+    completed. Returns every chunk's id; enqueue them once the job is marked completed.
+    """
+    chunks = max(1, -(-total // settings.RISK_BATCH_CALLBACK_CHUNK_SIZE))
+    ids = [uuid.uuid5(job_id, f"callback-{i}") for i in range(chunks)]
+    staged = set(db.scalars(select(AmlAlertDelivery.id).where(AmlAlertDelivery.id.in_(ids))))
+    for i, part in zip(range(chunks), pages, strict=False):
+        if ids[i] in staged:
+            continue
+        db.execute(
+            insert(AmlAlertDelivery),
+            [
+                {
+                    "id": ids[i],
+                    "webhook_endpoint_id": None,
+                    "batch_job_id": job_id,
+                    "payload": {
+                        "type": BATCH_CALLBACK_TYPE,
+                        "job_id": str(job_id),
+                        "status": "completed",
+                        "total": total,
+                        "chunk": i,
+                        "chunks": chunks,
+                        "results": part,
+                    },
+                    "status": "pending",
+                    "attempts": 0,
+                },
+            ],
         )
-        db.add(delivery)
-        db.flush()
-        to_enqueue.append(str(delivery.id))
-    db.commit()
+        db.commit()
+    return [str(i) for i in ids]
+
+
+def enqueue_deliveries(delivery_ids: Sequence[str]) -> None:
+    """One dispatcher task per ``RISK_WEBHOOK_TASK_MAX_DELIVERIES`` ids, not one per delivery."""
+    if not delivery_ids:
+        return
+    step = settings.RISK_WEBHOOK_TASK_MAX_DELIVERIES
     try:
-        from app.tasks.aml_tasks import deliver_webhook_task
+        from app.tasks.aml_tasks import deliver_webhooks_task
 
-        for did in to_enqueue:
-            deliver_webhook_task.delay(did)
+        for i in range(0, len(delivery_ids), step):
+            deliver_webhooks_task.delay(list(delivery_ids[i : i + step]))
     except Exception as e:  # noqa: BLE001
         log.warning("Could not alert tasks: %s", e)
 
 
-def attempt_deliver_webhook(db: Session, delivery_id: UUID) -> None:
-    delivery = db.get(AmlAlertDelivery, delivery_id)
-    if delivery is None:
+# (pid, loop, dispatcher); a forked pool child builds its own on first use.
+_process: tuple[int, asyncio.AbstractEventLoop, WebhookDispatcher] | None = None
+
+
+def _process_loop() -> tuple[asyncio.AbstractEventLoop, WebhookDispatcher]:
+    global _process
+    if _process is None or _process[0] != os.getpid():
+        _process = (os.getpid(), asyncio.new_event_loop(), WebhookDispatcher())
+    return _process[1], _process[2]
+
+
+def close_process_dispatcher() -> None:
+    """Close this process's pooled connections and loop (worker shutdown)."""
+    global _process
+    current, _process = _process, None
+    if current is None or current[0] != os.getpid():
         return
-    wh = db.get(AmlWebhookEndpoint, delivery.webhook_endpoint_id)
-    if wh is None or not wh.active:
-        delivery.status = "failed"
-        delivery.last_error = "webhook inactive or missing"
-        db.commit()
+    _, loop, dispatcher = current
+    loop.run_until_complete(dispatcher.aclose())
+    loop.close()
+
+
+def deliver_webhooks(
+    db: Session,
+    delivery_ids: Sequence[UUID],
+    *,
+    dispatcher: WebhookDispatcher | None = None,
+) -> None:
+    """Send pending deliveries through the async dispatcher and record each outcome.
+
+    Failures with attempts left stay ``pending`` and go on the retry delay queue.
+    """
+    deliveries = db.scalars(
+        select(AmlAlertDelivery).where(
+            AmlAlertDelivery.id.in_(list(delivery_ids)),
+            AmlAlertDelivery.status == "pending",
+        ),
+    ).all()
+    if not deliveries:
         return
+    endpoint_ids = {d.webhook_endpoint_id for d in deliveries if d.webhook_endpoint_id}
+    endpoints = {
+        wh.id: (wh.target_url, wh.signing_secret, wh.batch_max_alerts)
+        for wh in db.scalars(
+            select(AmlWebhookEndpoint).where(
+                AmlWebhookEndpoint.id.in_(endpoint_ids),
+                AmlWebhookEndpoint.active.is_(True),
+            ),
+        )
+    }
+    envelopes = build_envelopes(
+        [(d.id, d.webhook_endpoint_id, d.payload) for d in deliveries if d.webhook_endpoint_id],
+        endpoints,
+    )
+    envelopes += _callback_envelopes(db, [d for d in deliveries if d.batch_job_id])
+    loop, pooled = _process_loop()
+    sent = loop.run_until_complete((dispatcher or pooled).send_all(envelopes))
 
-    body_obj = delivery.payload
-    body_json = json.dumps(body_obj, sort_keys=True, separators=(",", ":"))
-    sig = sign_payload(body_json, wh.signing_secret)
-    delivery.attempts = (delivery.attempts or 0) + 1
-    try:
-        resp = httpx.post(
-            wh.target_url,
-            content=body_json,
-            headers={
-                "Content-Type": "application/json",
-                "X-CohortLens-Signature": f"sha256={sig}",
-            },
-            timeout=10.0,
+    now = datetime.now(UTC)
+    outcome = {did: env.error for env in sent for did in env.delivery_ids}
+    retries: list[tuple[UUID, int]] = []
+    for d in deliveries:
+        d.updated_at = now
+        if d.id not in outcome:
+            d.status = "failed"
+            d.last_error = "webhook inactive or missing"
+            continue
+        d.attempts = (d.attempts or 0) + 1
+        error = outcome[d.id]
+        if error is None:
+            d.status = "sent"
+            d.last_error = None
+        else:
+            limit = settings.RISK_BATCH_CALLBACK_MAX_ATTEMPTS if d.batch_job_id else _MAX_ATTEMPTS
+            d.status = "failed" if d.attempts >= limit else "pending"
+            d.last_error = error
+            if d.status == "pending":
+                retries.append((d.id, d.attempts))
+    db.commit()
+    if retries and not schedule_retries(retries):
+        _retry_without_redis(retries)
+
+
+def _callback_envelopes(db: Session, deliveries: list[AmlAlertDelivery]) -> list[Envelope]:
+    """Batch callback chunks go to their job's URL, gzip-encoded, one request per chunk."""
+    if not deliveries:
+        return []
+    targets = {
+        job_id: (url, secret)
+        for job_id, url, secret in db.execute(
+            select(RiskBatchJob.id, RiskBatchJob.webhook_url, RiskBatchJob.callback_secret).where(
+                RiskBatchJob.id.in_({d.batch_job_id for d in deliveries}),
+            ),
         )
-        resp.raise_for_status()
-        delivery.status = "sent"
-        delivery.last_error = None
+        if url and secret
+    }
+    return [
+        Envelope(
+            d.batch_job_id,
+            *targets[d.batch_job_id],
+            [d.id],
+            canonical_json(d.payload),
+            compress=True,
+        )
+        for d in deliveries
+        if d.batch_job_id in targets
+    ]
+
+
+def _retry_without_redis(retries: list[tuple[UUID, int]]) -> None:
+    """Fallback when the delay queue is down: one delayed dispatcher task for the lot."""
+    try:
+        from app.tasks.aml_tasks import deliver_webhooks_task
+
+        delay = min(backoff_seconds(attempts) for _, attempts in retries)
+        deliver_webhooks_task.apply_async(([str(d) for d, _ in retries],), countdown=delay)
     except Exception as e:  # noqa: BLE001
-        delivery.status = "failed" if delivery.attempts >= 3 else "pending"
-        delivery.last_error = str(e)[:4000]
-    db.commit()
+        log.warning("Could not schedule %s webhook retries: %s", len(retries), e)
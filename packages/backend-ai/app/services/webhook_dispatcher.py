@@ -0,0 +1,171 @@
+"""Async outbound webhook dispatcher with pooled connections and per-endpoint limits.
+
+Deliveries are grouped by endpoint. An endpoint registered with ``batch_max_alerts > 1``
+receives its alerts in signed envelopes of up to that many alerts
+(``{"type": "risk_decision_batch", "alerts": [...]}``); others get one request per alert.
+Envelopes marked ``compress`` (batch completion callbacks) are sent gzip-encoded; the signature
+always covers the uncompressed JSON body.
+Requests to the same host share one keep-alive ``httpx.AsyncClient`` pool, and each endpoint
+has at most ``RISK_WEBHOOK_ENDPOINT_CONCURRENCY`` requests in flight, so a burst of CRITICAL
+decisions becomes a few pooled requests instead of one task and one TCP connection per alert.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import gzip
+import hashlib
+import hmac
+import json
+import uuid
+from collections.abc import Sequence
+from dataclasses import dataclass, field
+from typing import Any
+from urllib.parse import urlsplit
+
+import httpx
+
+from app.core.config import settings
+
+BATCH_PAYLOAD_TYPE = "risk_decision_batch"
+
+
+def sign_payload(body_json: str, secret: str) -> str:
+    return hmac.new(
+        secret.encode("utf-8"),
+        body_json.encode("utf-8"),
+        hashlib.sha256,
+    ).hexdigest()
+
+
+def canonical_json(obj: Any) -> str:
+    return json.dumps(obj, sort_keys=True, separators=(",", ":"))
+
+
+@dataclass
+class Envelope:
+    """One signed request to an endpoint, carrying one or more deliveries."""
+
+    endpoint_id: uuid.UUID
+    url: str
+    secret: str
+    delivery_ids: list[uuid.UUID]
+    body: str
+    compress: bool = False
+    error: str | None = field(default=None, compare=False)
+
+
+def build_envelopes(
+    deliveries: Sequence[tuple[uuid.UUID, uuid.UUID, dict[str, Any]]],
+    endpoints: dict[uuid.UUID, tuple[str, str, int]],
+) -> list[Envelope]:
+    """Group ``(delivery_id, endpoint_id, payload)`` by endpoint into request bodies.
+
+    ``endpoints`` maps id to ``(target_url, signing_secret, batch_max_alerts)``; deliveries
+    whose endpoint is missing are skipped. Order within an endpoint is preserved.
+    """
+    by_endpoint: dict[uuid.UUID, list[tuple[uuid.UUID, dict[str, Any]]]] = {}
+    for delivery_id, endpoint_id, payload in deliveries:
+        if endpoint_id in endpoints:
+            by_endpoint.setdefault(endpoint_id, []).append((delivery_id, payload))
+
+    envelopes: list[Envelope] = []
+    for endpoint_id, items in by_endpoint.items():
+        url, secret, batch_max = endpoints[endpoint_id]
+        if batch_max <= 1:
+            envelopes += [
+                Envelope(endpoint_id, url, secret, [did], canonical_json(payload))
+                for did, payload in items
+            ]
+            continue
+        for i in range(0, len(items), batch_max):
+            part = items[i : i + batch_max]
+            body = {"type": BATCH_PAYLOAD_TYPE, "alerts": [p for _, p in part]}
+            envelopes.append(
+                Envelope(endpoint_id, url, secret, [did for did, _ in part], canonical_json(body)),
+            )
+    return envelopes
+
+
+class WebhookDispatcher:
+    """Send envelopes concurrently; use as ``async with`` so pooled clients are closed."""
+
+    def __init__(
+        self,
+        *,
+        endpoint_concurrency: int | None = None,
+        host_connections: int | None = None,
+        timeout_seconds: float | None = None,
+        transport: httpx.AsyncBaseTransport | None = None,
+    ) -> None:
+        self._endpoint_concurrency = (
+            endpoint_concurrency or settings.RISK_WEBHOOK_ENDPOINT_CONCURRENCY
+        )
+        self._limits = httpx.Limits(
+            max_connections=host_connections or settings.RISK_WEBHOOK_HOST_MAX_CONNECTIONS,
+            max_keepalive_connections=host_connections
+            or settings.RISK_WEBHOOK_HOST_MAX_CONNECTIONS,
+        )
+        self._timeout = httpx.Timeout(timeout_seconds or settings.RISK_WEBHOOK_TIMEOUT_SECONDS)
+        self._transport = transport
+        self._clients: dict[str, httpx.AsyncClient] = {}
+        self._slots: dict[uuid.UUID, asyncio.Semaphore] = {}
+
+    async def __aenter__(self) -> WebhookDispatcher:
+        return self
+
+    async def __aexit__(self, *exc: object) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        clients, self._clients = list(self._clients.values()), {}
+        await asyncio.gather(*(c.aclose() for c in clients), return_exceptions=True)
+
+    def _client_for(self, url: str) -> httpx.AsyncClient:
+        parts = urlsplit(url)
+        host = f"{parts.scheme}://{parts.netloc}"
+        client = self._clients.get(host)
+        if client is None:
+            client = httpx.AsyncClient(
+                limits=self._limits,
+                timeout=self._timeout,
+                transport=self._transport,
+            )
+            self._clients[host] = client
+        return client
+
+    async def send(self, envelope: Envelope) -> Envelope:
+        """POST one envelope; sets ``envelope.error`` on failure instead of raising.
+
+        Any failure counts, not only transport errors: a malformed endpoint URL must not abort
+        the ``gather`` of co-batched deliveries for other endpoints.
+        """
+        slot = self._slots.setdefault(
+            envelope.endpoint_id,
+            asyncio.Semaphore(self._endpoint_concurrency),
+        )
+        async with slot:
+            try:
+                headers = {
+                    "Content-Type": "application/json",
+                    "X-CohortLens-Signature": (
+                        f"sha256={sign_payload(envelope.body, envelope.secret)}"
+                    ),
+                }
+                content = envelope.body.encode("utf-8")
+                if envelope.compress:
+                    content = gzip.compress(content, compresslevel=6)
+                    headers["Content-Encoding"] = "gzip"
+                resp = await self._client_for(envelope.url).post(
+                    envelope.url,
+                    content=content,
+                    headers=headers,
+                )
+                resp.raise_for_status()
+                envelope.error = None
+            except Exception as e:  # noqa: BLE001
+                envelope.error = str(e)[:4000] or type(e).__name__
+        return envelope
+
+    async def send_all(self, envelopes: Sequence[Envelope]) -> list[Envelope]:
+        return list(await asyncio.gather(*(self.send(e) for e in envelopes)))
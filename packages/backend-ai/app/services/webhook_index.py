@@ -0,0 +1,116 @@
+"""In-process index of active webhook subscriptions, invalidated through a Redis version counter.
+
+Alert fan-out used to load and filter every active endpoint per decision. The index maps each
+severity to the endpoints that want it, so fan-out is a dict lookup. Endpoint writes bump
+``aml:webhook:endpoints:version``; every process compares its loaded version with Redis at most
+once per ``RISK_WEBHOOK_INDEX_CHECK_SECONDS`` and reloads when it moved. Without Redis the
+index is reloaded after ``RISK_WEBHOOK_INDEX_MAX_AGE_SECONDS``.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+import uuid
+from collections.abc import Iterable
+from typing import Any
+
+import redis
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.models import AmlWebhookEndpoint
+
+VERSION_KEY = "aml:webhook:endpoints:version"
+SEVERITIES = ("LOW", "MEDIUM", "HIGH", "CRITICAL")
+# Cases open from MEDIUM, so ``case_opened`` subscribers get MEDIUM and above.
+_EVENT_THRESHOLDS = {
+    "case_opened": "MEDIUM",
+    **{f"severity_ge_{s.lower()}": s for s in SEVERITIES},
+}
+
+
+def _client() -> redis.Redis:
+    return redis.from_url(settings.REDIS_URL)
+
+
+def severity_threshold(events: Iterable[Any] | None) -> str | None:
+    """Lowest severity any of ``events`` subscribes to, or ``None`` for no alert events."""
+    levels = [
+        SEVERITIES.index(_EVENT_THRESHOLDS[e]) for e in events or () if e in _EVENT_THRESHOLDS
+    ]
+    return SEVERITIES[min(levels)] if levels else None
+
+
+def build_index(
+    endpoints: Iterable[tuple[uuid.UUID, Iterable[Any] | None]],
+) -> dict[str, tuple[uuid.UUID, ...]]:
+    """Severity -> ids of endpoints whose threshold is at or below it."""
+    by_severity: dict[str, list[uuid.UUID]] = {s: [] for s in SEVERITIES}
+    for endpoint_id, events in endpoints:
+        threshold = severity_threshold(events)
+        if threshold is None:
+            continue
+        for s in SEVERITIES[SEVERITIES.index(threshold) :]:
+            by_severity[s].append(endpoint_id)
+    return {s: tuple(ids) for s, ids in by_severity.items()}
+
+
+def bump_version() -> None:
+    """Tell every process to reload; call after endpoint rows change (and commit)."""
+    subscriptions.invalidate()
+    try:
+        _client().incr(VERSION_KEY)
+    except redis.RedisError:
+        pass
+
+
+class SubscriptionIndex:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._by_severity: dict[str, tuple[uuid.UUID, ...]] | None = None
+        self._version: int | None = None
+        self._loaded_at = 0.0
+        self._checked_at = 0.0
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._by_severity = None
+
+    def _remote_version(self) -> int | None:
+        try:
+            raw = _client().get(VERSION_KEY)
+        except redis.RedisError:
+            return None
+        return int(raw) if raw is not None else 0
+
+    def _is_fresh(self, now: float) -> bool:
+        if self._by_severity is None:
+            return False
+        if now - self._checked_at < settings.RISK_WEBHOOK_INDEX_CHECK_SECONDS:
+            return True
+        remote = self._remote_version()
+        self._checked_at = now
+        if remote is None:
+            return now - self._loaded_at < settings.RISK_WEBHOOK_INDEX_MAX_AGE_SECONDS
+        return remote == self._version
+
+    def endpoints_for(self, db: Session, severity: str) -> tuple[uuid.UUID, ...]:
+        """Active endpoints subscribed to a decision of ``severity``."""
+        now = time.monotonic()
+        with self._lock:
+            if not self._is_fresh(now):
+                # Read the version first: a bump racing with the load triggers another reload.
+                self._version = self._remote_version()
+                rows = db.execute(
+                    select(AmlWebhookEndpoint.id, AmlWebhookEndpoint.events).where(
+                        AmlWebhookEndpoint.active.is_(True),
+                    ),
+                ).all()
+                self._by_severity = build_index(rows)
+                self._loaded_at = self._checked_at = now
+            return self._by_severity.get(severity, ())
+
+
+subscriptions = SubscriptionIndex()
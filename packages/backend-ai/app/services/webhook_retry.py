@@ -0,0 +1,85 @@
+"""Delay queue for failed webhook deliveries: a Redis sorted set scored by next-attempt time.
+
+A delivery that fails but has attempts left is added with score ``now + backoff``. The backoff
+doubles per attempt up to ``RISK_WEBHOOK_RETRY_MAX_SECONDS``, with "equal jitter" (half fixed,
+half random) so endpoints that failed together do not retry together. A periodic drain pops every
+due id in one script call and hands them to the batched dispatcher, so retries cost neither a
+Celery task per row nor a scan of ``aml_alert_deliveries``.
+"""
+
+from __future__ import annotations
+
+import random
+import time
+import uuid
+from collections.abc import Callable, Sequence
+
+import redis
+
+from app.core.config import settings
+
+RETRY_KEY = "aml:webhook:retry"
+
+# KEYS: zset. ARGV: now, limit. Pops due members atomically, so concurrent drains never
+# hand out the same delivery twice.
+_POP_DUE = """
+local ids = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+for _, id in ipairs(ids) do
+  redis.call('ZREM', KEYS[1], id)
+end
+return ids
+"""
+
+
+def _client() -> redis.Redis:
+    return redis.from_url(settings.REDIS_URL)
+
+
+def backoff_seconds(attempts: int, *, rng: Callable[[], float] = random.random) -> float:
+    """Delay before retry number ``attempts`` (1-based): exponential, capped, equal jitter."""
+    ceiling = min(
+        settings.RISK_WEBHOOK_RETRY_MAX_SECONDS,
+        settings.RISK_WEBHOOK_RETRY_BASE_SECONDS * 2 ** max(attempts - 1, 0),
+    )
+    return ceiling / 2 + rng() * ceiling / 2
+
+
+def schedule_retries(
+    items: Sequence[tuple[uuid.UUID, int]],
+    *,
+    now: float | None = None,
+    client: redis.Redis | None = None,
+) -> bool:
+    """Schedule ``(delivery_id, attempts_so_far)`` pairs; False if Redis is unavailable."""
+    if not items:
+        return True
+    t = time.time() if now is None else now
+    mapping = {str(did): t + backoff_seconds(attempts) for did, attempts in items}
+    try:
+        (client or _client()).zadd(RETRY_KEY, mapping)
+    except redis.RedisError:
+        return False
+    return True
+
+
+def pop_due(
+    limit: int,
+    *,
+    now: float | None = None,
+    client: redis.Redis | None = None,
+) -> list[uuid.UUID]:
+    """Remove and return up to ``limit`` deliveries whose retry time has passed."""
+    t = time.time() if now is None else now
+    ids = (client or _client()).eval(_POP_DUE, 1, RETRY_KEY, t, limit)
+    return [uuid.UUID(i.decode() if isinstance(i, bytes) else i) for i in ids]
+
+
+def backlog(*, now: float | None = None, client: redis.Redis | None = None) -> tuple[int, int]:
+    """``(scheduled, due)``: retries waiting in total, and those already past their time."""
+    r = client or _client()
+    t = time.time() if now is None else now
+    pipe = r.pipeline()
+    pipe.zcard(RETRY_KEY)
+    pipe.zcount(RETRY_KEY, "-inf", t)
+    scheduled, due = pipe.execute()
+    return int(scheduled), int(due)
@@ -1,152 +1,509 @@
-"""Celery tasks: AML batch screening and webhook delivery."""
+"""Celery tasks: AML batch screening, webhook delivery, and decision partition maintenance.
+
+Batch jobs run on a priority lane (``risk_fair_share``); their chunks are handed to the broker
+a few at a time, round-robin across tenants, and the chunk that writes a job's last result
+row schedules the finalizer.
+"""
 
 from __future__ import annotations
 
 import asyncio
-import json
 import logging
-from datetime import UTC, datetime
-from uuid import UUID
+from collections.abc import Iterator
+from datetime import UTC, datetime, timedelta
+from uuid import NAMESPACE_URL, UUID, uuid5
 
-import httpx
+import redis
+from celery.signals import worker_process_shutdown, worker_shutdown
+from sqlalchemy import and_, func, insert, or_, select, update
+from sqlalchemy.orm import Session
 
 from app.core.config import settings
-from app.db.models import RiskBatchJob
-from app.db.session import SessionLocal
-from app.services.risk_engine import evaluate_risk_for_address, persist_screening
+from app.db.models import RiskBatchJob, RiskBatchResult
+from app.db.session import SessionLocal, engine
+from app.services.risk_archive import archive_decision_partitions, ensure_decision_partitions
+from app.services.risk_batch_progress import add_processed, clear_processed
+from app.services.risk_batch_upload import (
+    discard_upload,
+    read_addresses,
+    remove_upload,
+    spooled_uploads,
+)
+from app.services.risk_engine import fetch_head_block, resolve_batch_window, screen_address
+from app.services.risk_fair_share import (
+    chunk_spec,
+    fair_share,
+    parse_chunk_spec,
+    queue_for_lane,
+)
+from app.services.risk_persistence import (
+    PendingScreening,
+    ScreeningWriteBuffer,
+    dialect_insert_for,
+)
 from app.services.risk_scoring import ClientProfile
-from app.services.risk_webhooks import queue_alerts_for_decision, sign_payload
+from app.services.risk_webhooks import (
+    close_process_dispatcher,
+    enqueue_deliveries,
+    stage_batch_callbacks,
+)
+from app.services.webhook_retry import pop_due, schedule_retries
+from app.tasks.base import CheckpointedTask
 from app.tasks.celery_app import celery_app
 
 log = logging.getLogger(__name__)
 
 
-@celery_app.task(name="app.tasks.aml_tasks.deliver_webhook_task")
-def deliver_webhook_task(delivery_id: str) -> None:
+@worker_process_shutdown.connect
+@worker_shutdown.connect
+def _close_webhook_pools(**_kwargs: object) -> None:
+    close_process_dispatcher()
+
+
+@celery_app.task(name="app.tasks.aml_tasks.deliver_webhooks_task")
+def deliver_webhooks_task(delivery_ids: list[str]) -> None:
     db = SessionLocal()
     try:
-        from app.services.risk_webhooks import attempt_deliver_webhook
+        from app.services.risk_webhooks import deliver_webhooks
 
-        attempt_deliver_webhook(db, UUID(delivery_id))
+        deliver_webhooks(db, [UUID(d) for d in delivery_ids])
     finally:
         db.close()
 
 
+@celery_app.task(name="app.tasks.aml_tasks.drain_webhook_retries")
+def drain_webhook_retries() -> int:
+    """Beat task: move every due retry from the delay queue onto dispatcher tasks."""
+    try:
+        due = pop_due(settings.RISK_WEBHOOK_RETRY_DRAIN_MAX)
+    except redis.RedisError:
+        log.warning("webhook retry queue unavailable")
+        return 0
+    step = settings.RISK_WEBHOOK_TASK_MAX_DELIVERIES
+    for i in range(0, len(due), step):
+        try:
+            deliver_webhooks_task.delay([str(d) for d in due[i : i + step]])
+        except Exception:  # noqa: BLE001
+            log.exception("could not enqueue webhook retries; putting %s back", len(due) - i)
+            schedule_retries([(d, 0) for d in due[i:]])
+            break
+    return len(due)
+
+
+def _mark_job_failed(db: Session, job_id: str, message: str) -> None:
+    job = db.get(RiskBatchJob, UUID(job_id))
+    if job:
+        job.status = "failed"
+        job.error_message = message[:4000]
+        job.completed_at = datetime.now(UTC)
+        db.commit()
+
+
+def batch_decision_id(job_id: str, index: int) -> UUID:
+    """Deterministic decision id for address ``index`` of a job (``correlation_id`` based)."""
+    return uuid5(NAMESPACE_URL, f"cohortlens:risk-batch:{job_id}-{index}")
+
+
+def _chunk_bounds(total: int, size: int) -> list[tuple[int, int]]:
+    """Half-open ``[start, end)`` index ranges covering ``total`` addresses."""
+    return [(start, min(start + size, total)) for start in range(0, total, size)]
+
+
+def _job_addresses(job: RiskBatchJob, start: int, end: int) -> list[str]:
+    if job.addresses_path:
+        return read_addresses(job.addresses_path, start, end)
+    return [str(a).lower() for a in (job.addresses or [])[start:end]]
+
+
+async def _screen_address(
+    buffer: ScreeningWriteBuffer,
+    *,
+    subgraph_url: str,
+    chain_id: str,
+    profile: ClientProfile,
+    index: int,
+    address: str,
+    batch_job_id: UUID,
+    as_of_block: int | None = None,
+    window_from_block: int | None = None,
+) -> dict:
+    out, item = await screen_address(
+        subgraph_url,
+        chain_id,
+        address,
+        profile,
+        f"{batch_job_id}-{index}",
+        include_graph_hints=False,
+        batch_job_id=batch_job_id,
+        decision_id=batch_decision_id(str(batch_job_id), index),
+        as_of_block=as_of_block,
+        window_from_block=window_from_block,
+    )
+    if item is not None:
+        buffer.add(item)
+    return {
+        "job_id": batch_job_id,
+        "idx": index,
+        "address": address,
+        "risk_score": out["risk_score"],
+        "severity": out["severity"],
+        "decision_id": item.decision_id if item is not None else None,
+        "degraded": out["degraded"],
+    }
+
+
+def _publish_chunks(lane: str) -> None:
+    """Send chunks to the lane's queue while it has free fair-share slots."""
+    try:
+        while (spec := fair_share.acquire(lane)) is not None:
+            job_id, start, end = parse_chunk_spec(spec)
+            run_risk_batch_chunk.apply_async(
+                (job_id, start, end),
+                {"lane": lane},
+                queue=queue_for_lane(lane),
+            )
+    except redis.RedisError:
+        log.warning("fair-share queue unavailable; lane %s not pumped", lane)
+
+
+def _release_chunk(lane: str, job_id: str, start: int, end: int) -> None:
+    try:
+        fair_share.release(lane, chunk_spec(job_id, start, end))
+    except redis.RedisError:
+        pass  # the lease expires on its own
+    _publish_chunks(lane)
+
+
+def _complete_if_done(db: Session, job_id: str) -> None:
+    """Schedule the finalizer once every address has a result row (exactly once per job)."""
+    job = db.get(RiskBatchJob, UUID(job_id))
+    if job is None or job.status != "running":
+        return
+    done = db.scalar(
+        select(func.count()).select_from(RiskBatchResult).where(RiskBatchResult.job_id == job.id),
+    )
+    if (done or 0) < job.total:
+        return
+    claimed = db.execute(
+        update(RiskBatchJob)
+        .where(RiskBatchJob.id == job.id, RiskBatchJob.status == "running")
+        .values(status="finalizing", heartbeat_at=datetime.now(UTC)),
+    ).rowcount
+    db.commit()
+    if claimed:
+        finalize_risk_batch_job.apply_async((job_id,), queue=queue_for_lane(job.lane))
+
+
 @celery_app.task(name="app.tasks.aml_tasks.run_risk_batch_job")
 def run_risk_batch_job(job_id: str) -> None:
+    """Split a batch job into address chunks and queue them on its lane for fair-share dispatch.
+
+    Safe to run again for a failed or stalled job: chunks skip checkpointed addresses.
+    A job with a window is pinned to concrete blocks on first dispatch (``to_block`` defaults
+    to the current head) so every chunk, and every retry, screens the same historical range.
+    """
     db = SessionLocal()
-    job: RiskBatchJob | None = None
     try:
         job = db.get(RiskBatchJob, UUID(job_id))
-        if job is None:
+        if job is None or job.status in ("finalizing", "completed"):
             return
+        chain_cfg = settings.get_chains().get(job.chain_id.lower())
+        if chain_cfg is None:
+            _mark_job_failed(db, job_id, f"unknown chain_id {job.chain_id}")
+            return
+        unpinned = job.window_to_block is None and job.window_from_block is not None
+        if unpinned or (job.window_preset and job.window_to_block is None):
+            head = asyncio.run(fetch_head_block(chain_cfg.subgraph_url))
+            job.window_from_block, job.window_to_block = resolve_batch_window(
+                job.window_preset,
+                job.window_from_block,
+                job.window_to_block,
+                head,
+            )
+
+        bounds = _chunk_bounds(job.total, settings.RISK_BATCH_CHUNK_SIZE)
         job.status = "running"
+        job.heartbeat_at = datetime.now(UTC)
+        lane, tenant = job.lane, job.tenant
         db.commit()
 
-        chains = settings.get_chains()
-        chain_cfg = chains.get(job.chain_id.lower())
-        if chain_cfg is None:
-            job.status = "failed"
-            job.error_message = f"unknown chain_id {job.chain_id}"
-            job.completed_at = datetime.now(UTC)
-            db.commit()
+        if not bounds:
+            _complete_if_done(db, job_id)
+            return
+        try:
+            fair_share.enqueue(lane, tenant, [chunk_spec(job_id, *b) for b in bounds])
+        except redis.RedisError:
+            log.warning("fair-share queue unavailable; publishing job %s directly", job_id)
+            for start, end in bounds:
+                run_risk_batch_chunk.apply_async((job_id, start, end), queue=queue_for_lane(lane))
             return
+        _publish_chunks(lane)
+    except Exception as e:  # noqa: BLE001
+        log.exception("batch job dispatch failed")
+        db.rollback()
+        _mark_job_failed(db, job_id, str(e))
+    finally:
+        db.close()
+
+
+@celery_app.task(
+    bind=True,
+    base=CheckpointedTask,
+    name="app.tasks.aml_tasks.run_risk_batch_chunk",
+)
+def run_risk_batch_chunk(
+    self: CheckpointedTask,
+    job_id: str,
+    start: int,
+    end: int,
+    lane: str | None = None,
+) -> int:
+    """Screen addresses ``[start, end)`` of a job; decisions and result rows are written as
+    the buffer flushes, progress is counted in Redis. Returns the number of addresses screened.
+
+    Result rows double as checkpoints: they commit with their decisions, so a redelivered or
+    retried chunk skips indices that already have one and only screens the remainder. ``lane``
+    is set for chunks dispatched through the fair-share queue; their slot is handed back once
+    the chunk is settled (done, or failed for good).
+    """
+    db = SessionLocal()
+    settled = True
+    try:
+        job = db.get(RiskBatchJob, UUID(job_id))
+        if job is None or job.status == "failed":
+            return 0
+        chain_cfg = settings.get_chains().get(job.chain_id.lower())
+        if chain_cfg is None:
+            _mark_job_failed(db, job_id, f"unknown chain_id {job.chain_id}")
+            return 0
 
         subgraph_url = chain_cfg.subgraph_url
-        addresses = [str(a).lower() for a in (job.addresses or [])]
-        profile: ClientProfile = job.client_profile  # type: ignore[assignment]
-        results: list[dict] = []
+        chain_id = job.chain_id
         job_uuid = job.id
+        profile: ClientProfile = job.client_profile  # type: ignore[assignment]
+        as_of_block = job.window_to_block
+        window_from_block = job.window_from_block
+        done = set(
+            db.scalars(
+                select(RiskBatchResult.idx).where(
+                    RiskBatchResult.job_id == job_uuid,
+                    RiskBatchResult.idx >= start,
+                    RiskBatchResult.idx < end,
+                ),
+            ),
+        )
+        todo = [
+            (start + offset, a)
+            for offset, a in enumerate(_job_addresses(job, start, end))
+            if start + offset not in done
+        ]
+        if done:
+            log.info("job %s chunk [%s, %s): resuming, %s already done", job_id, start, end, len(done))
 
-        async def _run_one(addr: str, index: int) -> dict:
-            merged, score, elapsed_ms, severity, action, reasons, evidence, head, degraded = (
-                await evaluate_risk_for_address(
-                    subgraph_url,
-                    job.chain_id,  # type: ignore[union-attr]
-                    addr,
-                    profile,
-                    use_cache=True,
-                    include_graph_hints=False,
-                )
+        pending_results: list[dict] = []
+
+        def _write_results(session: Session, _items: list[PendingScreening] | None = None) -> None:
+            if not pending_results:
+                return
+            dialect_insert = dialect_insert_for(session)
+            stmt = (
+                dialect_insert(RiskBatchResult).on_conflict_do_nothing()
+                if dialect_insert is not None
+                else insert(RiskBatchResult)
+            )
+            session.execute(stmt, pending_results)
+            n = len(pending_results)
+            pending_results.clear()
+            progress: dict = {"heartbeat_at": datetime.now(UTC)}
+            if not add_processed(job_id, n):
+                # Redis unavailable: fall back to counting on the job row.
+                progress["processed"] = RiskBatchJob.processed + n
+            session.execute(
+                update(RiskBatchJob).where(RiskBatchJob.id == job_uuid).values(**progress),
             )
-            did: UUID | None = None
-            if head > 0:
-                evidence_out = dict(evidence)
-                did, _ = persist_screening(
-                    db,
-                    chain_id=job.chain_id,  # type: ignore[union-attr]
-                    address=addr,
-                    client_profile=profile,
-                    correlation_id=f"{job_id}-{index}",
-                    risk_score=score,
-                    severity=severity,
-                    action=action,
-                    risk_reasons=reasons,
-                    evidence=evidence_out,
-                    merged_features=merged,
-                    head=head,
-                    latency_ms=elapsed_ms,
-                    degraded=degraded,
-                    batch_job_id=job_uuid,
-                )
-                queue_alerts_for_decision(db, did)
-            return {
-                "address": addr,
-                "risk_score": score,
-                "severity": severity,
-                "decision_id": str(did) if did else None,
-                "degraded": degraded,
-            }
+
+        buffer = ScreeningWriteBuffer(db, before_commit=_write_results, skip_existing=True)
 
         async def _run_all() -> None:
-            nonlocal results
-            for idx, addr in enumerate(addresses):
-                row = await _run_one(addr, idx)
-                results.append(row)
-                bj = db.get(RiskBatchJob, job_uuid)
-                if bj:
-                    bj.processed = idx + 1
+            for index, addr in todo:
+                pending_results.append(
+                    await _screen_address(
+                        buffer,
+                        subgraph_url=subgraph_url,
+                        chain_id=chain_id,
+                        profile=profile,
+                        index=index,
+                        address=addr,
+                        batch_job_id=job_uuid,
+                        as_of_block=as_of_block,
+                        window_from_block=window_from_block,
+                    ),
+                )
+                if len(pending_results) >= settings.RISK_PERSIST_FLUSH_MAX_ITEMS:
+                    # Screens at head 0 (subgraph unreachable) store no decision and never enter
+                    # the buffer, whose flush writes result rows only when it holds screenings;
+                    # write whatever result rows are still pending here.
+                    buffer.flush()
+                    _write_results(db)
                     db.commit()
+            buffer.flush()
+            _write_results(db)
+            db.commit()
 
         asyncio.run(_run_all())
+        _complete_if_done(db, job_id)
+        return len(todo)
+    except Exception as e:
+        log.exception("batch chunk failed job=%s range=[%s, %s)", job_id, start, end)
+        db.rollback()
+        # Completed addresses are checkpointed; retries pick up after them. Only the last
+        # attempt fails the job.
+        if self.request.retries >= self.max_retries:
+            _mark_job_failed(db, job_id, str(e))
+        else:
+            settled = False
+        raise
+    finally:
+        db.close()
+        if lane and settled:
+            _release_chunk(lane, job_id, start, end)
 
-        bj = db.get(RiskBatchJob, job_uuid)
-        if bj:
-            bj.status = "completed"
-            bj.results = results
-            bj.processed = len(addresses)
-            bj.completed_at = datetime.now(UTC)
-            db.commit()
 
-        job_row = db.get(RiskBatchJob, job_uuid)
-        if (
-            job_row
-            and job_row.webhook_url
-            and job_row.callback_secret
-        ):
-            try:
-                body = {"job_id": job_id, "status": "completed", "results": results}
-                raw = json.dumps(body, sort_keys=True)
-                sig = sign_payload(raw, job_row.callback_secret)
-                httpx.post(
-                    job_row.webhook_url,
-                    content=raw,
-                    headers={
-                        "Content-Type": "application/json",
-                        "X-CohortLens-Signature": f"sha256={sig}",
-                    },
-                    timeout=15.0,
-                )
-            except Exception as e:  # noqa: BLE001
-                log.warning("batch callback failed: %s", e)
+def _result_payload(row: RiskBatchResult) -> dict:
+    return {
+        "index": row.idx,
+        "address": row.address,
+        "risk_score": row.risk_score,
+        "severity": row.severity,
+        "decision_id": str(row.decision_id) if row.decision_id else None,
+        "degraded": row.degraded,
+    }
+
+
+def _result_pages(db: Session, job_id: UUID, size: int) -> Iterator[list[dict]]:
+    """Callback payloads of a job's results, ``size`` at a time, by keyset on ``idx``."""
+    last = -1
+    while True:
+        rows = db.scalars(
+            select(RiskBatchResult)
+            .where(RiskBatchResult.job_id == job_id, RiskBatchResult.idx > last)
+            .order_by(RiskBatchResult.idx)
+            .limit(size),
+        ).all()
+        if not rows:
+            return
+        last = rows[-1].idx
+        yield [_result_payload(r) for r in rows]
+
+
+@celery_app.task(name="app.tasks.aml_tasks.finalize_risk_batch_job")
+def finalize_risk_batch_job(job_id: str) -> None:
+    """Settle the processed count, stage the chunked callback, mark the job completed."""
+    db = SessionLocal()
+    try:
+        job = db.get(RiskBatchJob, UUID(job_id))
+        if job is None or job.status == "failed":
+            return
+        processed = (
+            db.scalar(
+                select(func.count())
+                .select_from(RiskBatchResult)
+                .where(RiskBatchResult.job_id == job.id),
+            )
+            or 0
+        )
+        callbacks: list[str] = []
+        if job.webhook_url and job.callback_secret:
+            # Staged (and committed chunk by chunk) before the job completes, so a completed job
+            # always has its callback; a rerun after a crash skips the chunks already staged.
+            callbacks = stage_batch_callbacks(
+                db,
+                job.id,
+                processed,
+                _result_pages(db, job.id, settings.RISK_BATCH_CALLBACK_CHUNK_SIZE),
+            )
+        job.status = "completed"
+        job.processed = processed
+        job.completed_at = datetime.now(UTC)
+        addresses_path = job.addresses_path
+        db.commit()
+        clear_processed(job_id)
+        if addresses_path:
+            remove_upload(addresses_path)
+        enqueue_deliveries(callbacks)
     except Exception as e:  # noqa: BLE001
-        log.exception("batch job failed")
+        log.exception("batch finalize failed")
         db.rollback()
-        job = db.get(RiskBatchJob, UUID(job_id))
-        if job:
-            job.status = "failed"
-            job.error_message = str(e)[:4000]
-            job.completed_at = datetime.now(UTC)
+        _mark_job_failed(db, job_id, str(e))
+    finally:
+        db.close()
+
+
+@celery_app.task(name="app.tasks.aml_tasks.prune_batch_uploads")
+def prune_batch_uploads() -> list[str]:
+    """Beat task: delete upload spools that no chunk will read again; returns their job ids.
+
+    That is the spool of a completed job whose finalizer did not get to it, of a job failed or
+    without progress for ``RISK_BATCH_UPLOAD_RETENTION_SECONDS`` (until then it can be resumed;
+    a stalled one is marked failed), and a directory without a job row left untouched for
+    ``RISK_BATCH_STALE_SECONDS`` (upload aborted before the job was created).
+    """
+    now = datetime.now(UTC)
+    spools = dict(spooled_uploads())
+    job_ids = {}
+    for name in spools:
+        try:
+            job_ids[UUID(name)] = name
+        except ValueError:
+            continue
+    cutoff = now - timedelta(seconds=settings.RISK_BATCH_UPLOAD_RETENTION_SECONDS)
+    stalled = and_(
+        RiskBatchJob.status.in_(("queued", "running", "finalizing")),
+        func.coalesce(RiskBatchJob.heartbeat_at, RiskBatchJob.created_at) < cutoff,
+    )
+    db = SessionLocal()
+    try:
+        known = set(db.scalars(select(RiskBatchJob.id).where(RiskBatchJob.id.in_(job_ids))))
+        expired = set(
+            db.scalars(
+                select(RiskBatchJob.id).where(
+                    RiskBatchJob.id.in_(known),
+                    or_(
+                        RiskBatchJob.status == "completed",
+                        and_(
+                            RiskBatchJob.status == "failed",
+                            func.coalesce(RiskBatchJob.completed_at, RiskBatchJob.created_at)
+                            < cutoff,
+                        ),
+                        stalled,
+                    ),
+                ),
+            ),
+        )
+        if expired:
+            db.execute(
+                update(RiskBatchJob)
+                .where(RiskBatchJob.id.in_(expired), stalled)
+                .values(status="failed", error_message="upload spool expired", completed_at=now),
+            )
             db.commit()
     finally:
         db.close()
+
+    # Only job-id directories are ever removed, whatever else shares the spool directory.
+    idle_since = now.timestamp() - settings.RISK_BATCH_STALE_SECONDS
+    removed = [job_ids[j] for j in expired]
+    removed += [name for j, name in job_ids.items() if j not in known and spools[name] < idle_since]
+    for name in removed:
+        discard_upload(name)
+    return removed
+
+
+@celery_app.task(name="app.tasks.aml_tasks.maintain_risk_decision_partitions")
+def maintain_risk_decision_partitions() -> dict[str, list[str]]:
+    """Create upcoming monthly partitions, then archive months past the hot window to Parquet."""
+    with engine.begin() as conn:
+        created = ensure_decision_partitions(conn)
+    with engine.begin() as conn:
+        archived = archive_decision_partitions(conn)
+    return {"created": created, "archived": archived}
@@ -43,3 +43,16 @@ class OracleScanTask(BaseRetryTask):
     retry_kwargs = {"max_retries": 3}
     retry_backoff = True
     retry_backoff_max = 120
+
+
+class CheckpointedTask(BaseRetryTask):
+    """Work that checkpoints as it goes: ack after completion so a lost worker's message is
+    redelivered, and retry any failure since the rerun only redoes unfinished items."""
+
+    acks_late = True
+    reject_on_worker_lost = True
+    autoretry_for = (Exception,)
+    max_retries = 3
+    retry_kwargs = {"max_retries": 3}
+    retry_backoff = 5
+    retry_backoff_max = 300
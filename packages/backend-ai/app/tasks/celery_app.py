@@ -1,4 +1,8 @@
-"""Celery application: queues ml_tasks, prediction_tasks, zk_tasks."""
+"""Celery application: queues ml_tasks, prediction_tasks, zk_tasks, and the AML lanes.
+
+AML batch work is split by priority into aml_urgent / aml_tasks (normal) / aml_bulk; webhook
+deliveries have their own aml_webhooks queue so alerts never wait behind screening.
+"""
 
 from __future__ import annotations
 
@@ -44,16 +48,34 @@ celery_app.conf.update(
             exchange=default_exchange,
             routing_key="zk_tasks",
         ),
+        Queue(
+            "aml_urgent",
+            exchange=default_exchange,
+            routing_key="aml_urgent",
+        ),
         Queue(
             "aml_tasks",
             exchange=default_exchange,
             routing_key="aml_tasks",
         ),
+        Queue(
+            "aml_bulk",
+            exchange=default_exchange,
+            routing_key="aml_bulk",
+        ),
+        Queue(
+            "aml_webhooks",
+            exchange=default_exchange,
+            routing_key="aml_webhooks",
+        ),
     ),
     task_routes={
         "app.tasks.oracle_tasks.*": {"queue": "ml_tasks"},
         "app.tasks.model_tasks.*": {"queue": "prediction_tasks"},
         "app.tasks.zk_tasks.*": {"queue": "zk_tasks"},
+        # Batch tasks pass their lane's queue explicitly; this is the default.
+        "app.tasks.aml_tasks.deliver_webhook*": {"queue": "aml_webhooks"},
+        "app.tasks.aml_tasks.drain_webhook_retries": {"queue": "aml_webhooks"},
         "app.tasks.aml_tasks.*": {"queue": "aml_tasks"},
     },
 )
@@ -63,4 +85,16 @@ celery_app.conf.beat_schedule = {
         "task": "app.tasks.oracle_tasks.scan_and_fulfill_oracle",
         "schedule": 30.0,
     },
+    "webhook-retries": {
+        "task": "app.tasks.aml_tasks.drain_webhook_retries",
+        "schedule": settings.RISK_WEBHOOK_RETRY_POLL_SECONDS,
+    },
+    "risk-batch-upload-cleanup": {
+        "task": "app.tasks.aml_tasks.prune_batch_uploads",
+        "schedule": 3600.0,
+    },
+    "risk-decision-partitions": {
+        "task": "app.tasks.aml_tasks.maintain_risk_decision_partitions",
+        "schedule": 6 * 3600.0,
+    },
 }
@@ -0,0 +1,115 @@
+"""Clustering engines and robust scaling on synthetic populations."""
+
+from __future__ import annotations
+
+import numpy as np
+import pytest
+from app.core.config import settings
+from app.models.clustering import fit_clusters, perform_clustering, resolve_engine
+from app.schemas.cohort import CohortRequest
+from sklearn.cluster import KMeans
+
+
+def _blobs(n_per: int) -> np.ndarray:
+    rng = np.random.default_rng(3)
+    # Two groups that differ in tx_count/avg_gas only; volume is huge, noisy and uninformative.
+    groups = [
+        np.column_stack(
+            [
+                rng.normal(tx, 2, n_per),
+                rng.lognormal(12, 1.5, n_per),
+                rng.normal(gas, 1, n_per),
+            ],
+        )
+        for tx, gas in ((10, 20), (200, 80))
+    ]
+    return np.vstack(groups)
+
+
+def test_auto_engine_switches_on_population(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, "COHORT_MINIBATCH_MIN_USERS", 1_000)
+    assert resolve_engine("auto", 999) == "kmeans"
+    assert resolve_engine("auto", 1_000) == "minibatch"
+    assert resolve_engine("kmeans", 10**6) == "kmeans"
+
+
+@pytest.mark.parametrize("engine", ["kmeans", "minibatch"])
+def test_robust_scaling_recovers_groups_hidden_by_volume(engine: str) -> None:
+    X = _blobs(2_000)
+    truth = np.repeat([0, 1], 2_000)
+
+    labels, centers, _ = fit_clusters(X, 2, engine=engine, scaling="robust")
+    agreement = max((labels == truth).mean(), (labels != truth).mean())
+    assert agreement > 0.99
+    # Centers come back in original units, not in the scaled space.
+    assert np.allclose(sorted(centers[:, 0]), [10.0, 200.0], rtol=0.01)
+
+    raw_labels, _, _ = fit_clusters(X, 2, engine=engine, scaling="none")
+    assert max((raw_labels == truth).mean(), (raw_labels != truth).mean()) < 0.9
+
+
+def test_default_request_keeps_raw_kmeans_results(monkeypatch: pytest.MonkeyPatch) -> None:
+    # Large enough that engine="auto" would switch; the default must not.
+    monkeypatch.setattr(settings, "COHORT_MINIBATCH_MIN_USERS", 100)
+    X = _blobs(300)
+    users = [
+        {"address": f"0x{i:040x}", "tx_count": row[0], "volume": row[1], "avg_gas": row[2]}
+        for i, row in enumerate(X.tolist())
+    ]
+    response = perform_clustering(
+        CohortRequest(protocol="p", start_block=1, end_block=2, num_clusters=3), users
+    )
+    legacy = KMeans(n_clusters=3, random_state=42, n_init=10).fit(X)
+
+    assert response.engine == "kmeans"
+    for i, cohort in enumerate(response.cohorts):
+        assert np.allclose(list(cohort.center.values()), legacy.cluster_centers_[i])
+        members = {int(u.address, 16) for u in cohort.users}
+        assert members == set(np.flatnonzero(legacy.labels_ == i).tolist())
+
+
+def test_minibatch_response_reports_engine(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, "COHORT_MINIBATCH_BATCH_SIZE", 256)
+    users = [
+        {"address": f"0x{i:040x}", "tx_count": row[0], "volume": row[1], "avg_gas": row[2]}
+        for i, row in enumerate(_blobs(500).tolist())
+    ]
+    request = CohortRequest(
+        protocol="p",
+        start_block=1,
+        end_block=2,
+        num_clusters=2,
+        engine="minibatch",
+        scaling="robust",
+    )
+    response = perform_clustering(request, users)
+    assert response.engine == "minibatch"
+    assert sorted(c.size for c in response.cohorts) == [500, 500]
+
+
+def test_auto_k_finds_planted_groups(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, "COHORT_AUTO_K_SAMPLE_SIZE", 600)
+    rng = np.random.default_rng(5)
+    centers = [(5, 1e3, 10), (80, 1e5, 40), (900, 1e7, 90)]
+    users = [
+        {
+            "address": f"0x{len(centers) * i + g:040x}",
+            "tx_count": rng.normal(tx, tx * 0.05),
+            "volume": rng.normal(vol, vol * 0.05),
+            "avg_gas": rng.normal(gas, 1),
+        }
+        for i in range(400)
+        for g, (tx, vol, gas) in enumerate(centers)
+    ]
+    request = CohortRequest(
+        protocol="p", start_block=1, end_block=2, auto_k=True, k_max=6, scaling="robust"
+    )
+
+    response = perform_clustering(request, users)
+    assert response.selected_k == len(response.cohorts) == 3
+    assert [d.k for d in response.k_diagnostics] == [2, 3, 4, 5, 6]
+    best = max(response.k_diagnostics, key=lambda d: d.silhouette)
+    assert best.k == 3
+    # Inertia only falls as k grows; the silhouette is what picks the knee.
+    inertias = [d.inertia for d in response.k_diagnostics]
+    assert inertias == sorted(inertias, reverse=True)
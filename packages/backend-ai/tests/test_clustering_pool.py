@@ -0,0 +1,49 @@
+"""Cohort clustering in the shared-memory process pool matches in-thread clustering."""
+
+from __future__ import annotations
+
+import asyncio
+import random
+
+from app.models.clustering import perform_clustering
+from app.schemas.cohort import CohortRequest
+from app.services.clustering_pool import ClusteringPool
+
+
+def _users(n: int) -> list[dict]:
+    rng = random.Random(7)
+    return [
+        {
+            "address": f"0x{i:040x}",
+            "tx_count": rng.randint(1, 500),
+            "volume": str(rng.random() * 1e6),  # subgraph decimals arrive as strings
+            "avg_gas": rng.random() * 100,
+        }
+        for i in range(n)
+    ]
+
+
+def test_pool_matches_in_thread_clustering() -> None:
+    request = CohortRequest(protocol="p", start_block=1, end_block=2, num_clusters=4)
+    auto = request.model_copy(update={"auto_k": True, "k_max": 5})
+    users = _users(300)
+
+    async def run() -> list:
+        pool = ClusteringPool(workers=2, worker_threads=1)
+        await pool.start()
+        try:
+            return [
+                (await pool.perform(request, users))[0],
+                (await pool.perform(auto, users))[0],
+                (await pool.perform(request, []))[0],
+            ]
+        finally:
+            await pool.stop()
+
+    pooled, pooled_auto, empty = asyncio.run(run())
+    assert pooled == perform_clustering(request, users)
+    # Candidates scored in parallel workers pick the same k with the same diagnostics.
+    assert pooled_auto == perform_clustering(auto, users)
+    assert [d.k for d in pooled_auto.k_diagnostics] == [2, 3, 4, 5]
+    assert sum(c.size for c in pooled.cohorts) == 300
+    assert (empty.total_users, empty.cohorts) == (0, [])
@@ -0,0 +1,85 @@
+"""Lean and columnar discovery responses, and members paged from Redis (fakeredis)."""
+
+from __future__ import annotations
+
+import fakeredis
+import numpy as np
+import pyarrow as pa
+import pytest
+from app.core.config import settings
+from app.main import app
+from app.models.clustering import perform_clustering
+from app.schemas.cohort import CohortRequest
+from app.services import cohort_members
+from fastapi.testclient import TestClient
+
+
+def _users(n: int) -> list[dict]:
+    rng = np.random.default_rng(5)
+    return [
+        {
+            "address": f"0x{i:040x}",
+            "tx_count": float(rng.integers(1, 500)),
+            "volume": float(rng.lognormal(10, 2)),
+            "avg_gas": float(rng.normal(60, 10)),
+        }
+        for i in range(n)
+    ]
+
+
+def _request(**kw) -> CohortRequest:
+    # Robust scaling keeps the cohorts balanced, so each page holds enough rows to compress.
+    fields = {"protocol": "aave-v3", "start_block": 1, "end_block": 2, "num_clusters": 3}
+    return CohortRequest(**fields, scaling="robust", **kw)
+
+
+def test_member_formats_carry_the_same_membership() -> None:
+    users = _users(400)
+    profiles = perform_clustering(_request(), users)
+    columnar = perform_clustering(_request(members_format="columnar"), users)
+    lean = perform_clustering(_request(include_members=False), users)
+
+    for p, c, s in zip(profiles.cohorts, columnar.cohorts, lean.cohorts, strict=True):
+        assert c.users is None and s.users is None and s.members is None
+        assert p.size == c.size == s.size
+        assert c.members.addresses == [u.address for u in p.users]
+        assert c.members.features["volume"] == [u.features["volume"] for u in p.users]
+        assert p.center == s.center
+    assert len(lean.model_dump_json()) < len(columnar.model_dump_json()) / 10
+
+
+def test_members_are_paged_from_redis(monkeypatch: pytest.MonkeyPatch) -> None:
+    fake = fakeredis.FakeRedis()
+    monkeypatch.setattr(cohort_members, "_client", lambda: fake)
+    response = perform_clustering(_request(members_format="columnar"), _users(400))
+    cohort_members.store_membership("m1", response._membership)
+    assert 0 < fake.ttl("cohort:members:m1") <= settings.COHORT_MEMBERS_TTL_SECONDS
+
+    cohort = response.cohorts[1]
+    total, table = cohort_members.read_page("m1", 1, 5, 10)
+    page = cohort_members.page_members(table)
+    assert total == cohort.size
+    assert page.addresses == cohort.members.addresses[5:15]
+    assert page.features == {f: v[5:15] for f, v in cohort.members.features.items()}
+    assert cohort_members.read_page("m1", 7, 0, 10) is None
+    assert cohort_members.read_page("other", 1, 0, 10) is None
+
+    with TestClient(app) as client:
+        arrow = client.get(
+            "/api/v1/cohorts/00000000-0000-0000-0000-000000000001/members/1?format=arrow",
+        )
+        assert arrow.status_code == 404
+        cohort_members.store_membership(
+            "00000000-0000-0000-0000-000000000001",
+            response._membership,
+        )
+        arrow = client.get(
+            "/api/v1/cohorts/00000000-0000-0000-0000-000000000001/members/1",
+            params={"format": "arrow", "offset": 0, "limit": 10_000},
+            headers={"Accept-Encoding": "gzip"},
+        )
+    assert arrow.headers["content-type"] == cohort_members.ARROW_STREAM_MEDIA_TYPE
+    assert arrow.headers["content-encoding"] == "gzip"
+    assert arrow.headers["x-total-count"] == str(cohort.size)
+    table = pa.ipc.open_stream(arrow.content).read_all()
+    assert table.column("address").to_pylist() == cohort.members.addresses
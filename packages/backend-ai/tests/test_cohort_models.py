@@ -0,0 +1,156 @@
+"""Warm-started discovery, persisted cohort models and assignment to their centroids."""
+
+from __future__ import annotations
+
+import asyncio
+import uuid
+
+import numpy as np
+import pytest
+from app.db.base import Base
+from app.models.clustering import assign_to_centers, cluster_users, feature_matrix
+from app.schemas.cohort import CohortRequest
+from app.services.cohort_models import (
+    CohortModelMismatch,
+    find_warm_start,
+    load_model,
+    save_model,
+    state_from_model,
+)
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+
+def _window(seed: int, shift: float) -> list[dict]:
+    rng = np.random.default_rng(seed)
+    groups = [(5, 1e3, 10), (80, 1e5, 40), (900, 1e7, 90)]
+    return [
+        {
+            "address": f"0x{3 * i + g:040x}",
+            "tx_count": rng.normal(tx * shift, tx * 0.1),
+            "volume": rng.normal(vol * shift, vol * 0.1),
+            "avg_gas": rng.normal(gas, 2),
+        }
+        for i in range(300)
+        for g, (tx, vol, gas) in enumerate(groups)
+    ]
+
+
+def _request(**kw) -> CohortRequest:
+    fields = {
+        "protocol": "aave-v3",
+        "start_block": 100,
+        "end_block": 200,
+        "num_clusters": 3,
+        "scaling": "robust",
+    }
+    return CohortRequest(**{**fields, **kw})
+
+
+def test_warm_start_keeps_cohort_ids_across_windows() -> None:
+    first, state = cluster_users(_request(), _window(1, 1.0))
+    ids = {u.address: c.id for c in first.cohorts for u in c.users}
+
+    # Next window: activity drifted, and the caller now asks for another k; the model's k wins.
+    second, _ = cluster_users(_request(num_clusters=5), _window(2, 1.1), warm=state)
+    assert second.warm_started
+    assert len(second.cohorts) == 3
+    moved = [u.address for c in second.cohorts for u in c.users if ids[u.address] != c.id]
+    assert len(moved) / second.total_users < 0.02
+
+
+def test_models_form_versioned_lineages() -> None:
+    async def run() -> None:
+        engine = create_async_engine("sqlite+aiosqlite://")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        factory = async_sessionmaker(engine, expire_on_commit=False)
+        first_req = _request()
+        response, state = cluster_users(first_req, _window(1, 1.0))
+        async with factory() as db:
+            assert await find_warm_start(db, first_req) is None
+            first = await save_model(db, first_req, response, state)
+            await db.commit()
+
+            later = _request(warm_start=True, start_block=150, end_block=250)
+            parent = await find_warm_start(db, later)
+            assert parent.id == first.id
+            warm = state_from_model(parent)
+            assert np.allclose(warm.centers, state.centers)
+            assert all(np.allclose(a, b) for a, b in zip(warm.scaler, state.scaler, strict=True))
+
+            response, state = cluster_users(later, _window(2, 1.1), warm=warm)
+            second = await save_model(db, later, response, state, parent=parent)
+            await db.commit()
+            assert (second.version, second.parent_id) == (2, first.id)
+
+            # Another feature list is another lineage; an earlier window sees only older models.
+            other = _request(warm_start=True, features=["tx_count", "volume"])
+            assert await find_warm_start(db, other) is None
+            assert (await find_warm_start(db, _request(warm_start=True))).id == first.id
+            with pytest.raises(CohortModelMismatch):
+                await find_warm_start(db, other.model_copy(update={"model_id": first.id}))
+            with pytest.raises(CohortModelMismatch):
+                await find_warm_start(db, later.model_copy(update={"model_id": uuid.uuid4()}))
+        await engine.dispose()
+
+    asyncio.run(run())
+
+
+def test_concurrent_save_takes_the_next_version() -> None:
+    async def run() -> None:
+        engine = create_async_engine("sqlite+aiosqlite://")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        factory = async_sessionmaker(engine, expire_on_commit=False)
+        request = _request()
+        response, state = cluster_users(request, _window(1, 1.0))
+        async with factory() as db:
+            first = await save_model(db, request, response, state)
+            await db.commit()
+
+            # A save that read the latest version before ``first`` committed.
+            scalar, reads = db.scalar, []
+
+            async def stale_first_read(stmt):
+                reads.append(stmt)
+                return None if len(reads) == 1 else await scalar(stmt)
+
+            db.scalar = stale_first_read
+            second = await save_model(db, request, response, state)
+            await db.commit()
+        assert (first.version, second.version) == (1, 2)
+        await engine.dispose()
+
+    asyncio.run(run())
+
+
+def test_assignment_matches_discovery_and_is_served_from_cache() -> None:
+    async def run() -> None:
+        engine = create_async_engine("sqlite+aiosqlite://")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        factory = async_sessionmaker(engine, expire_on_commit=False)
+        request = _request()
+        users = _window(1, 1.0)
+        response, state = cluster_users(request, users)
+        async with factory() as db:
+            saved = await save_model(db, request, response, state)
+            await db.commit()
+            model = await load_model(db, saved.id)
+            assert await load_model(db, uuid.uuid4()) is None
+
+        # Cached: no session needed the second time.
+        assert await load_model(None, saved.id) is model
+        await engine.dispose()
+
+        X = feature_matrix(users, model.features)
+        labels, distances = assign_to_centers(X, model.state)
+        cohort_of = {u.address: c.id for c in response.cohorts for u in c.users}
+        assert [cohort_of[u["address"]] for u in users] == labels.tolist()
+        # One row at a time gives the same answer as the batch.
+        single = [assign_to_centers(X[i : i + 1], model.state) for i in (0, 1, 2)]
+        assert [int(lab[0]) for lab, _ in single] == labels[:3].tolist()
+        assert np.allclose([d[0] for _, d in single], distances[:3])
+        assert (distances >= 0).all()
+
+    asyncio.run(run())
@@ -0,0 +1,83 @@
+"""Decision archive: month helpers and Parquet round-trip (no database)."""
+
+from __future__ import annotations
+
+import uuid
+from datetime import UTC, date, datetime
+
+from app.core.config import settings
+from app.services.risk_archive import (
+    add_months,
+    parse_partition_name,
+    partition_name,
+    read_archived_decisions,
+    write_decisions_parquet,
+)
+from app.services.risk_feature_schema import encode_vector
+
+
+def test_month_partition_names() -> None:
+    assert add_months(date(2026, 11, 17), 2) == date(2027, 1, 1)
+    assert add_months(date(2026, 1, 31), -1) == date(2025, 12, 1)
+    name = partition_name(date(2026, 3, 1))
+    assert name == "risk_decisions_y2026m03"
+    assert parse_partition_name(name) == date(2026, 3, 1)
+    assert parse_partition_name("risk_decisions_default") is None
+
+
+def _row(address: str, score: int, created_at: datetime) -> dict:
+    return {
+        "id": uuid.uuid4(),
+        "correlation_id": None,
+        "batch_job_id": None,
+        "chain_id": "polygon",
+        "address": address,
+        "risk_score": score,
+        "severity": "HIGH",
+        "recommended_action": "review",
+        "model_version": "m",
+        "ruleset_version": "r",
+        "risk_reasons": [{"code": "VELOCITY"}],
+        "evidence": encode_vector("evidence", {"supporting_tx_ids": ["0x" + "ab" * 32]}),
+        "feature_snapshot_id": None,
+        "latency_ms": 12,
+        "degraded": False,
+        "client_profile": "exchange",
+        "created_at": created_at,
+    }
+
+
+def test_archived_decisions_are_queryable(tmp_path) -> None:
+    wallet = "0x" + "11" * 20
+    rows = [
+        _row(wallet, 40, datetime(2025, 1, 3, tzinfo=UTC)),
+        _row(wallet, 70, datetime(2025, 1, 20, tzinfo=UTC)),
+        _row("0x" + "22" * 20, 10, datetime(2025, 1, 9, tzinfo=UTC)),
+    ]
+    path = tmp_path / "risk_decisions" / "year=2025" / "month=01" / "decisions.parquet"
+    assert write_decisions_parquet([rows[:2], rows[2:]], path) == 3
+
+    found = read_archived_decisions(chain_id="polygon", address=wallet.upper(), root=tmp_path)
+    assert [r["risk_score"] for r in found] == [70, 40]
+    assert found[0]["evidence"] == {"supporting_tx_ids": ["0x" + "ab" * 32]}
+    assert found[0]["risk_reasons"] == [{"code": "VELOCITY"}]
+
+    one = read_archived_decisions(
+        chain_id="polygon",
+        address=wallet,
+        decision_id=rows[0]["id"],
+        root=tmp_path,
+    )
+    assert [r["id"] for r in one] == [rows[0]["id"]]
+
+
+def test_unfinished_exports_are_not_read(tmp_path, monkeypatch) -> None:
+    wallet = "0x" + "33" * 20
+    month = tmp_path / "risk_decisions" / "year=2025" / "month=02"
+    write_decisions_parquet([[_row(wallet, 50, datetime(2025, 2, 1, tzinfo=UTC))]], month / "x")
+    # A complete temp file left behind by an export that crashed before its rename.
+    (month / "x").rename(month / "decisions.parquet.tmp")
+    assert read_archived_decisions(chain_id="polygon", address=wallet, root=tmp_path) == []
+
+    monkeypatch.setattr(settings, "RISK_ARCHIVE_DIR", None)
+    assert read_archived_decisions(chain_id="polygon", address=wallet) == []
@@ -0,0 +1,464 @@
+"""Batch job fan-out helpers and chunk persistence (no broker; in-memory SQLite)."""
+
+from __future__ import annotations
+
+import asyncio
+import gzip
+import json
+import os
+import uuid
+from collections.abc import Generator
+from datetime import UTC, datetime, timedelta
+from uuid import UUID
+
+import fakeredis
+import httpx
+import pytest
+from app.core.config import settings
+from app.db.base import Base
+from app.db.models import (
+    AmlAlertDelivery,
+    RiskBatchJob,
+    RiskBatchResult,
+    RiskDecision,
+    RiskDecisionLink,
+)
+from app.db.session import get_async_db
+from app.main import app
+from app.routers import risk as risk_router
+from app.services import risk_engine, risk_persistence, risk_reuse
+from app.services.risk_fair_share import FairShareScheduler
+from app.services.risk_webhooks import deliver_webhooks
+from app.services.webhook_dispatcher import WebhookDispatcher, sign_payload
+from app.tasks import aml_tasks
+from app.tasks.aml_tasks import (
+    _chunk_bounds,
+    batch_decision_id,
+    finalize_risk_batch_job,
+    prune_batch_uploads,
+    run_risk_batch_chunk,
+    run_risk_batch_job,
+)
+from app.tasks.celery_app import celery_app
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, delete, func, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import StaticPool
+
+
+def test_chunk_bounds_cover_all_addresses() -> None:
+    assert _chunk_bounds(7, 3) == [(0, 3), (3, 6), (6, 7)]
+
+
+def test_chunk_bounds_empty_job() -> None:
+    assert _chunk_bounds(0, 250) == []
+
+
+@pytest.fixture
+def session_factory(monkeypatch) -> Generator[sessionmaker[Session], None, None]:
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    factory = sessionmaker(bind=engine)
+    monkeypatch.setattr(aml_tasks, "SessionLocal", factory)
+    yield factory
+    engine.dispose()
+
+
+def _job(session_factory: sessionmaker[Session], n: int) -> str:
+    with session_factory() as db:
+        job = RiskBatchJob(
+            chain_id="polygon",
+            client_profile="dapp",
+            addresses=[f"0x{i:040x}" for i in range(n)],
+            status="running",
+            total=n,
+        )
+        db.add(job)
+        db.commit()
+        return str(job.id)
+
+
+def _fake_screens(monkeypatch) -> list[int]:
+    screened: list[int] = []
+
+    async def fake_evaluate(subgraph_url, chain_id, address, profile, **kwargs):
+        i = int(address, 16)
+        screened.append(i)
+        head = 0 if i == 2 else 1000  # index 2 is degraded: no decision, still a result row
+        features = {"subgraph_block_head": head, "window_24h_tx_count": i}
+        return features, i, 1, "LOW", "allow", [], {}, head, head == 0
+
+    async def fake_head(subgraph_url):
+        return 1000
+
+    monkeypatch.setattr(risk_engine, "_live_head", fake_head)
+    monkeypatch.setattr(risk_engine, "evaluate_risk_for_address", fake_evaluate)
+    monkeypatch.setattr(settings, "RISK_DECISION_REUSE_ENABLED", False)
+    monkeypatch.setattr(aml_tasks, "add_processed", lambda job_id, n: False)
+    return screened
+
+
+def test_chunk_writes_result_rows_and_counts_progress(session_factory, monkeypatch) -> None:
+    job_id = _job(session_factory, 5)
+    _fake_screens(monkeypatch)
+
+    assert run_risk_batch_chunk(job_id, 0, 3) == 3
+    assert run_risk_batch_chunk(job_id, 3, 5) == 2
+
+    with session_factory() as db:
+        rows = db.scalars(select(RiskBatchResult).order_by(RiskBatchResult.idx)).all()
+        assert [(r.idx, r.risk_score, r.decision_id is None) for r in rows] == [
+            (0, 0, False),
+            (1, 1, False),
+            (2, 2, True),
+            (3, 3, False),
+            (4, 4, False),
+        ]
+        assert db.scalar(select(func.count()).select_from(RiskDecision)) == 4
+        # Redis unavailable: progress fell back to the job row.
+        assert db.scalar(select(RiskBatchJob.processed)) == 5
+
+    # The chunk that wrote the last result row claimed the job for finalization.
+    with session_factory() as db:
+        assert db.scalar(select(RiskBatchJob.status)) == "finalizing"
+    finalize_risk_batch_job(job_id)
+    with session_factory() as db:
+        job = db.scalars(select(RiskBatchJob)).one()
+        assert (job.status, job.processed, job.results) == ("completed", 5, None)
+
+
+def test_job_runs_end_to_end_with_eager_tasks(session_factory, monkeypatch) -> None:
+    job_id = _job(session_factory, 5)
+    with session_factory() as db:
+        db.get(RiskBatchJob, UUID(job_id)).status = "queued"
+        db.commit()
+    screened = _fake_screens(monkeypatch)
+    monkeypatch.setattr(settings, "RISK_BATCH_CHUNK_SIZE", 2)
+    monkeypatch.setattr(settings, "RISK_PERSIST_FLUSH_MAX_ITEMS", 1)
+    scheduler = FairShareScheduler(fakeredis.FakeRedis())
+    monkeypatch.setattr(aml_tasks, "fair_share", scheduler)
+    settled: list[str] = []
+    release = scheduler.release
+
+    def record_release(lane: str, spec: str) -> None:
+        settled.append(spec)
+        release(lane, spec)
+
+    monkeypatch.setattr(scheduler, "release", record_release)
+    monkeypatch.setattr(celery_app.conf, "task_always_eager", True)
+    monkeypatch.setattr(celery_app.conf, "task_eager_propagates", True)
+
+    # Dispatch fans out through the fair-share lane; each chunk runs, persists and releases its
+    # slot, and the chunk writing the last row claims the job and runs the finalizer.
+    run_risk_batch_job(job_id)
+
+    assert sorted(screened) == [0, 1, 2, 3, 4]
+    assert sorted(settled) == sorted(f"{job_id}:{a}:{b}" for a, b in [(0, 2), (2, 4), (4, 5)])
+    with session_factory() as db:
+        rows = db.scalars(select(RiskBatchResult).order_by(RiskBatchResult.idx)).all()
+        assert [(r.idx, r.risk_score, r.decision_id) for r in rows] == [
+            (i, i, None if i == 2 else batch_decision_id(job_id, i)) for i in range(5)
+        ]
+        assert db.scalar(select(func.count()).select_from(RiskDecision)) == 4
+        job = db.get(RiskBatchJob, UUID(job_id))
+        assert (job.status, job.processed) == ("completed", 5)
+        assert job.completed_at is not None and job.heartbeat_at is not None
+
+
+def test_rerun_chunk_resumes_from_checkpoint_without_duplicates(
+    session_factory, monkeypatch
+) -> None:
+    job_id = _job(session_factory, 5)
+    screened = _fake_screens(monkeypatch)
+
+    run_risk_batch_chunk(job_id, 0, 3)
+    # Redelivered/retried as the whole range: only the unfinished addresses are screened.
+    assert run_risk_batch_chunk(job_id, 0, 5) == 2
+    assert screened == [0, 1, 2, 3, 4]
+
+    # A checkpoint lost in a race: the address is screened again, its decision is not duplicated.
+    with session_factory() as db:
+        db.execute(delete(RiskBatchResult).where(RiskBatchResult.idx == 1))
+        db.commit()
+    run_risk_batch_chunk(job_id, 0, 5)
+    assert screened[-1] == 1
+
+    with session_factory() as db:
+        ids = db.scalars(select(RiskDecision.id)).all()
+        assert len(ids) == 4
+        assert batch_decision_id(job_id, 1) in ids
+        assert db.scalar(select(func.count()).select_from(RiskBatchResult)) == 5
+
+
+class _FakeRedis:
+    def __init__(self) -> None:
+        self.data: dict[str, bytes] = {}
+
+    def get(self, key: str) -> bytes | None:
+        return self.data.get(key)
+
+    def set(self, key: str, value: str, ex: int | None = None, nx: bool = False) -> bool:
+        if nx and key in self.data:
+            return False
+        self.data[key] = value.encode()
+        return True
+
+
+def test_second_job_reuses_fresh_decisions(session_factory, monkeypatch) -> None:
+    screened = _fake_screens(monkeypatch)
+    store = _FakeRedis()
+    monkeypatch.setattr(settings, "RISK_DECISION_REUSE_ENABLED", True)
+    monkeypatch.setattr(risk_reuse, "_client", lambda: store)
+
+    first, second = _job(session_factory, 3), _job(session_factory, 3)
+    run_risk_batch_chunk(first, 0, 3)
+    run_risk_batch_chunk(second, 0, 3)
+    # Degraded screens are never offered for reuse.
+    assert screened == [0, 1, 2, 2]
+
+    with session_factory() as db:
+        assert db.scalar(select(func.count()).select_from(RiskDecision)) == 2
+        links = db.scalars(select(RiskDecisionLink).order_by(RiskDecisionLink.correlation_id)).all()
+        assert [lk.correlation_id for lk in links] == [f"{second}-0", f"{second}-1"]
+        by_job = {
+            (str(r.job_id), r.idx): r.decision_id for r in db.scalars(select(RiskBatchResult))
+        }
+        assert by_job[(second, 0)] == by_job[(first, 0)] == links[0].decision_id
+
+        db.execute(delete(RiskBatchResult).where(RiskBatchResult.job_id == links[0].batch_job_id))
+        db.commit()
+    # A retried chunk writes the same (deterministic) link ids, not new links.
+    run_risk_batch_chunk(second, 0, 3)
+    with session_factory() as db:
+        assert db.scalar(select(func.count()).select_from(RiskDecisionLink)) == 2
+
+
+def test_failed_flush_offers_nothing_for_reuse(session_factory, monkeypatch) -> None:
+    _fake_screens(monkeypatch)
+    store = _FakeRedis()
+    monkeypatch.setattr(settings, "RISK_DECISION_REUSE_ENABLED", True)
+    monkeypatch.setattr(risk_reuse, "_client", lambda: store)
+    stage = risk_persistence.stage_alerts_for_decisions
+
+    def failing_stage(db, decisions):
+        raise RuntimeError("database went away")
+
+    job_id = _job(session_factory, 2)
+    monkeypatch.setattr(risk_persistence, "stage_alerts_for_decisions", failing_stage)
+    with pytest.raises(RuntimeError):
+        run_risk_batch_chunk(job_id, 0, 2)
+    assert store.data == {}
+
+    # The retry screens afresh and persists real decisions instead of links to missing ones.
+    monkeypatch.setattr(risk_persistence, "stage_alerts_for_decisions", stage)
+    run_risk_batch_chunk(job_id, 0, 2)
+    assert len(store.data) == 2
+    with session_factory() as db:
+        assert db.scalar(select(func.count()).select_from(RiskDecision)) == 2
+        assert db.scalar(select(func.count()).select_from(RiskDecisionLink)) == 0
+
+
+def test_completion_callback_is_chunked_signed_and_compressed(session_factory, monkeypatch) -> None:
+    job_id = _job(session_factory, 5)
+    with session_factory() as db:
+        job = db.get(RiskBatchJob, UUID(job_id))
+        job.webhook_url, job.callback_secret = "http://client.example/done", "cb-secret"
+        db.commit()
+    _fake_screens(monkeypatch)
+    monkeypatch.setattr(settings, "RISK_BATCH_CALLBACK_CHUNK_SIZE", 2)
+    queued: list[str] = []
+    monkeypatch.setattr(aml_tasks, "enqueue_deliveries", queued.extend)
+
+    run_risk_batch_chunk(job_id, 0, 5)
+    finalize_risk_batch_job(job_id)
+    assert len(queued) == 3
+
+    requests: list[httpx.Request] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(204)
+
+    with session_factory() as db:
+        deliver_webhooks(
+            db,
+            [UUID(d) for d in queued],
+            dispatcher=WebhookDispatcher(transport=httpx.MockTransport(handler)),
+        )
+        assert set(db.scalars(select(AmlAlertDelivery.status))) == {"sent"}
+
+    bodies = []
+    for request in requests:
+        assert request.headers["Content-Encoding"] == "gzip"
+        raw = gzip.decompress(request.content).decode()
+        # The signature covers the uncompressed JSON of its own chunk.
+        assert (
+            request.headers["X-CohortLens-Signature"] == f"sha256={sign_payload(raw, 'cb-secret')}"
+        )
+        bodies.append(json.loads(raw))
+    bodies.sort(key=lambda b: b["chunk"])
+    assert [(b["chunk"], b["chunks"], b["total"]) for b in bodies] == [
+        (0, 3, 5),
+        (1, 3, 5),
+        (2, 3, 5),
+    ]
+    assert [r["index"] for b in bodies for r in b["results"]] == [0, 1, 2, 3, 4]
+
+
+def test_resume_only_failed_or_stalled_jobs(monkeypatch) -> None:
+    engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+    factory = async_sessionmaker(engine, expire_on_commit=False)
+
+    async def setup() -> dict[str, str]:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        old = datetime.now(UTC) - timedelta(seconds=settings.RISK_BATCH_STALE_SECONDS + 60)
+        jobs = {
+            "running": ("running", datetime.now(UTC)),
+            "finalizing": ("finalizing", datetime.now(UTC)),
+            "stalled": ("running", old),
+            "failed": ("failed", datetime.now(UTC)),
+            "completed": ("completed", old),
+        }
+        async with factory() as db:
+            rows = {
+                name: RiskBatchJob(
+                    chain_id="polygon",
+                    client_profile="dapp",
+                    addresses=[],
+                    status=status,
+                    total=0,
+                    heartbeat_at=beat,
+                )
+                for name, (status, beat) in jobs.items()
+            }
+            db.add_all(rows.values())
+            await db.commit()
+            return {name: str(job.id) for name, job in rows.items()}
+
+    async def override():
+        async with factory() as db:
+            yield db
+
+    ids = asyncio.run(setup())
+    dispatched: list[str] = []
+    monkeypatch.setattr(
+        risk_router.run_risk_batch_job,
+        "apply_async",
+        lambda args, queue=None: dispatched.append(args[0]),
+    )
+    app.dependency_overrides[get_async_db] = override
+    try:
+        client = TestClient(app)
+        codes = {
+            name: client.post(f"/api/v1/risk/batch/{jid}/resume").status_code
+            for name, jid in ids.items()
+        }
+    finally:
+        app.dependency_overrides.pop(get_async_db)
+        asyncio.run(engine.dispose())
+
+    assert codes == {
+        "running": 409,
+        "finalizing": 409,
+        "stalled": 200,
+        "failed": 200,
+        "completed": 409,
+    }
+    assert dispatched == [ids["stalled"], ids["failed"]]
+
+
+def test_interrupted_callback_staging_resumes_and_retries_longer(
+    session_factory,
+    monkeypatch,
+) -> None:
+    job_id = _job(session_factory, 5)
+    with session_factory() as db:
+        job = db.get(RiskBatchJob, UUID(job_id))
+        job.webhook_url, job.callback_secret = "http://client.example/done", "cb-secret"
+        db.commit()
+    _fake_screens(monkeypatch)
+    monkeypatch.setattr(settings, "RISK_BATCH_CALLBACK_CHUNK_SIZE", 2)
+    queued: list[str] = []
+    monkeypatch.setattr(aml_tasks, "enqueue_deliveries", queued.extend)
+    run_risk_batch_chunk(job_id, 0, 5)
+
+    pages = aml_tasks._result_pages
+
+    def one_page_then_crash(db, job_uuid, size):
+        yield next(pages(db, job_uuid, size))
+        raise RuntimeError("worker lost")
+
+    monkeypatch.setattr(aml_tasks, "_result_pages", one_page_then_crash)
+    finalize_risk_batch_job(job_id)
+    with session_factory() as db:
+        assert db.get(RiskBatchJob, UUID(job_id)).status == "failed"
+        assert db.scalar(select(func.count()).select_from(AmlAlertDelivery)) == 1
+        db.get(RiskBatchJob, UUID(job_id)).status = "finalizing"
+        db.commit()
+
+    monkeypatch.setattr(aml_tasks, "_result_pages", pages)
+    finalize_risk_batch_job(job_id)
+    assert queued and len(set(queued)) == 3
+    with session_factory() as db:
+        assert db.get(RiskBatchJob, UUID(job_id)).status == "completed"
+        payloads = db.scalars(select(AmlAlertDelivery.payload)).all()
+        assert sorted(r["index"] for p in payloads for r in p["results"]) == [0, 1, 2, 3, 4]
+
+        # Callbacks outlive the alert retry budget.
+        monkeypatch.setattr(settings, "RISK_BATCH_CALLBACK_MAX_ATTEMPTS", 5)
+        monkeypatch.setattr("app.services.risk_webhooks.schedule_retries", lambda r: True)
+        down = WebhookDispatcher(transport=httpx.MockTransport(lambda r: httpx.Response(503)))
+        for _ in range(4):
+            deliver_webhooks(db, [UUID(d) for d in queued], dispatcher=down)
+        assert set(db.scalars(select(AmlAlertDelivery.status))) == {"pending"}
+        deliver_webhooks(db, [UUID(d) for d in queued], dispatcher=down)
+        assert set(db.scalars(select(AmlAlertDelivery.status))) == {"failed"}
+
+
+def test_prune_removes_spools_no_job_will_read(session_factory, monkeypatch, tmp_path) -> None:
+    monkeypatch.setattr(settings, "RISK_BATCH_UPLOAD_DIR", tmp_path)
+    now = datetime.now(UTC)
+    old = now - timedelta(seconds=settings.RISK_BATCH_UPLOAD_RETENTION_SECONDS + 60)
+    jobs = {
+        "completed": ("completed", now, None),
+        "failed_recently": ("failed", now, None),
+        "failed_long_ago": ("failed", old, None),
+        "running": ("running", old, now),
+        "stalled": ("running", old, old),
+    }
+    names = {}
+    with session_factory() as db:
+        for key, (status, created, heartbeat) in jobs.items():
+            job = RiskBatchJob(
+                chain_id="polygon",
+                client_profile="dapp",
+                addresses=[],
+                status=status,
+                total=1,
+                created_at=created,
+                heartbeat_at=heartbeat,
+                completed_at=created if status != "running" else None,
+            )
+            db.add(job)
+            db.flush()
+            names[key] = str(job.id)
+        db.commit()
+    names["orphan_idle"], names["orphan_uploading"] = str(uuid.uuid4()), str(uuid.uuid4())
+    names["not_a_job"] = "keep-me"
+    for name in names.values():
+        (tmp_path / name / "buckets").mkdir(parents=True)
+    idle = (now - timedelta(seconds=settings.RISK_BATCH_STALE_SECONDS + 60)).timestamp()
+    for path in (tmp_path / names["orphan_idle"], tmp_path / names["orphan_idle"] / "buckets"):
+        os.utime(path, (idle, idle))
+
+    removed = prune_batch_uploads()
+
+    gone = {"completed", "failed_long_ago", "stalled", "orphan_idle"}
+    assert sorted(removed) == sorted(names[k] for k in gone)
+    assert {p.name for p in tmp_path.iterdir()} == {names[k] for k in names.keys() - gone}
+    with session_factory() as db:
+        stalled = db.get(RiskBatchJob, UUID(names["stalled"]))
+        assert (stalled.status, stalled.error_message) == ("failed", "upload spool expired")
+        assert db.get(RiskBatchJob, UUID(names["running"])).status == "running"
@@ -0,0 +1,39 @@
+"""Streamed address uploads: parsing, on-disk dedup, and offset reads (no database)."""
+
+from __future__ import annotations
+
+import pytest
+from app.services.risk_batch_upload import AddressSpool, UploadError, read_addresses
+
+
+def test_spool_dedups_across_chunk_boundaries(tmp_path) -> None:
+    a, b, c = "0x" + "ab" * 20, "0x" + "01" * 20, "0x" + "ff" * 20
+    body = f'address,label\r\n{a},x\r\n"{b.upper()}"\nnot-an-address\n{a}\n{c}'
+    spool = AddressSpool(tmp_path / "job")
+    # Split mid-address to exercise the carried-over tail.
+    raw = body.encode()
+    for i in range(0, len(raw), 7):
+        spool.feed(raw[i : i + 7])
+    assert spool.finish() == 3
+    assert spool.rejected == 2  # header + garbage line
+
+    assert sorted(read_addresses(spool.path, 0, 3)) == sorted([a, b, c])
+    assert read_addresses(spool.path, 1, 3) == read_addresses(spool.path, 0, 3)[1:]
+    assert spool.path.stat().st_size == 3 * 20
+
+
+def test_spool_caps_unique_addresses(tmp_path) -> None:
+    # Duplicates do not count against the cap.
+    spool = AddressSpool(tmp_path / "dups", max_addresses=2)
+    spool.feed(b"".join(f"0x{i % 2:040x}\n".encode() for i in range(15)))
+    assert spool.finish() == 2
+
+    spool = AddressSpool(tmp_path / "job", max_addresses=2)
+    spool.feed(b"".join(f"0x{i:040x}\n".encode() for i in range(3)))
+    with pytest.raises(UploadError):
+        spool.finish()
+
+    # A flood of lines is cut off while streaming, duplicates or not.
+    spool = AddressSpool(tmp_path / "flood", max_addresses=1)
+    with pytest.raises(UploadError):
+        spool.feed(b"".join(f"0x{0:040x}\n".encode() for _ in range(11)))
@@ -0,0 +1,30 @@
+"""Packed feature vector encoding round-trips (no database)."""
+
+from __future__ import annotations
+
+import json
+
+import pytest
+from app.services.risk_feature_schema import FeatureSchemaError, decode_vector, encode_vector
+
+
+def test_features_round_trip_is_lossless_and_compact() -> None:
+    features = {
+        "chain_id": "polygon",
+        "address": "0x" + "ab" * 20,
+        "subgraph_block_head": 51_000_000,
+        "lifetime_total_deposit_volume_raw": 10**30,
+        "first_activity_block": None,
+        "window_24h_tx_count": 12,
+        "window_24h_volume": 1234.5,
+        "window_24h_sample_tx_hashes": ["0x" + "cd" * 32, "not-a-hash"],
+        "unregistered_feature": {"nested": [1, 2]},
+    }
+    packed = encode_vector("features", features)
+    assert decode_vector(packed) == features
+    assert len(packed) < len(json.dumps(features))
+
+
+def test_decode_rejects_foreign_bytes() -> None:
+    with pytest.raises(FeatureSchemaError):
+        decode_vector(b'{"json": true}')
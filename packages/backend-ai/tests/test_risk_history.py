@@ -0,0 +1,105 @@
+"""Keyset pagination of decision history and cases against an in-memory SQLite database."""
+
+from __future__ import annotations
+
+import uuid
+from collections.abc import Generator
+from datetime import UTC, datetime, timedelta
+
+import pytest
+from app.db.base import Base
+from app.db.models import RiskCase, RiskDecision
+from app.services.risk_history import (
+    InvalidCursor,
+    cases_page_stmt,
+    decision_history_stmt,
+    decode_cursor,
+    split_page,
+)
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session, sessionmaker
+
+ADDR = "0x" + "cd" * 20
+
+
+@pytest.fixture
+def db() -> Generator[Session, None, None]:
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    try:
+        yield session
+    finally:
+        session.close()
+        engine.dispose()
+
+
+def _decision(created_at: datetime, address: str = ADDR) -> RiskDecision:
+    return RiskDecision(
+        chain_id="polygon",
+        address=address,
+        risk_score=10,
+        severity="LOW",
+        recommended_action="allow",
+        model_version="m",
+        ruleset_version="r",
+        risk_reasons=[],
+        evidence={},
+        latency_ms=1,
+        client_profile="dapp",
+        created_at=created_at,
+    )
+
+
+def test_decision_history_pages_cover_every_row_once(db: Session) -> None:
+    t0 = datetime(2026, 10, 1, tzinfo=UTC)
+    # Duplicate timestamps exercise the id tie-breaker.
+    rows = [_decision(t0 + timedelta(minutes=i // 2)) for i in range(7)]
+    db.add_all([*rows, _decision(t0, address="0x" + "ef" * 20)])
+    db.commit()
+
+    seen: list[uuid.UUID] = []
+    cursor = None
+    while True:
+        stmt = decision_history_stmt("polygon", ADDR, cursor=cursor, limit=3)
+        page, cursor = split_page(list(db.scalars(stmt)), 3, "created_at")
+        seen += [d.id for d in page]
+        if cursor is None:
+            break
+    assert len(seen) == len(set(seen)) == 7
+    by_id = {d.id: d for d in rows}
+    keys = [(by_id[i].created_at, i) for i in seen]
+    assert keys == sorted(keys, reverse=True)
+
+
+def test_cases_page_filters_and_continues(db: Session) -> None:
+    t0 = datetime(2026, 10, 1, tzinfo=UTC)
+    for i in range(5):
+        db.add(
+            RiskCase(
+                chain_id="polygon",
+                address="0x" + f"{i:02x}" * 20,
+                status="open" if i % 2 == 0 else "resolved",
+                updated_at=t0 + timedelta(hours=i),
+            ),
+        )
+    db.commit()
+
+    first, cursor = split_page(
+        list(db.scalars(cases_page_stmt(status="open", chain_id=None, cursor=None, limit=2))),
+        2,
+        "updated_at",
+    )
+    assert cursor is not None
+    rest, end = split_page(
+        list(db.scalars(cases_page_stmt(status="open", chain_id=None, cursor=cursor, limit=2))),
+        2,
+        "updated_at",
+    )
+    assert end is None
+    assert [c.address[2:4] for c in first + rest] == ["04", "02", "00"]
+
+
+def test_garbage_cursor_is_rejected() -> None:
+    with pytest.raises(InvalidCursor):
+        decode_cursor("not-a-cursor")
@@ -0,0 +1,146 @@
+"""Bulk screening persistence against an in-memory SQLite database."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+from collections.abc import Generator
+
+import fakeredis
+import pytest
+from app.core.config import settings
+from app.db.base import Base
+from app.db.models import FeatureSnapshot, RiskCase, RiskDecision, RiskDecisionLink
+from app.services import risk_persistence, risk_reuse
+from app.services.risk_engine import build_pending_screening
+from app.services.risk_persistence import (
+    DEAD_LETTER_KEY,
+    PendingScreening,
+    WriteBehindPersister,
+    flush_screenings,
+)
+from app.services.risk_reuse import decision_link_row
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import StaticPool
+
+ADDR = "0x" + "ab" * 20
+
+
+@pytest.fixture
+def db() -> Generator[Session, None, None]:
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    try:
+        yield session
+    finally:
+        session.close()
+        engine.dispose()
+
+
+def _pending(score: int, severity: str, head: int = 1000) -> PendingScreening:
+    return build_pending_screening(
+        chain_id="polygon",
+        address=ADDR,
+        client_profile="dapp",
+        correlation_id=None,
+        risk_score=score,
+        severity=severity,  # type: ignore[arg-type]
+        action="monitor",
+        risk_reasons=[],
+        evidence={},
+        merged_features={"subgraph_block_head": head, "window_24h_tx_count": score},
+        head=head,
+        latency_ms=1,
+        degraded=False,
+    )
+
+
+def test_flush_writes_decisions_and_single_open_case(db: Session) -> None:
+    first, second, low = _pending(60, "HIGH"), _pending(80, "CRITICAL"), _pending(5, "LOW")
+    flush_screenings(db, [first, low])
+    db.commit()
+    flush_screenings(db, [second])
+    db.commit()
+
+    assert db.scalar(select(func.count()).select_from(RiskDecision)) == 3
+    cases = db.scalars(select(RiskCase)).all()
+    assert len(cases) == 1
+    assert cases[0].latest_decision_id == second.decision_id
+    assert first.decision["evidence"]["feature_snapshot_id"] == str(first.snapshot_id)
+
+
+def test_identical_features_share_one_snapshot(db: Session) -> None:
+    first, rescreen = _pending(5, "LOW", head=1000), _pending(5, "LOW", head=1010)
+    flush_screenings(db, [first])
+    db.commit()
+    flush_screenings(db, [rescreen])
+    db.commit()
+
+    assert first.snapshot_id == rescreen.snapshot_id
+    assert db.scalar(select(func.count()).select_from(FeatureSnapshot)) == 1
+    decisions = db.scalars(select(RiskDecision)).all()
+    assert {d.feature_snapshot_id for d in decisions} == {first.snapshot_id}
+
+
+def test_links_to_unstored_decisions_are_dropped(db: Session) -> None:
+    stored = _pending(5, "LOW")
+    flush_screenings(db, [stored])
+    db.commit()
+    links = [
+        PendingScreening.reused(
+            decision_link_row(d, chain_id="polygon", address=ADDR, correlation_id=c),
+        )
+        for d, c in ((stored.decision_id, "kept"), (_pending(6, "LOW").decision_id, "lost"))
+    ]
+    flush_screenings(db, links)
+    db.commit()
+
+    assert db.scalars(select(RiskDecisionLink.correlation_id)).all() == ["kept"]
+
+
+def test_poison_screening_is_dead_lettered_without_blocking_the_queue(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    fake = fakeredis.FakeRedis()
+    monkeypatch.setattr(risk_persistence, "_client", lambda: fake)
+    monkeypatch.setattr(risk_reuse, "_client", lambda: fake)
+    monkeypatch.setattr(settings, "RISK_WRITE_BEHIND_MAX_ATTEMPTS", 2)
+    good = [_pending(5, "LOW", head=1000 + i) for i in range(5)]
+    poison = _pending(6, "LOW", head=2000)
+    poison.decision["risk_score"] = None  # NOT NULL: fails on every attempt
+
+    async def scenario() -> int:
+        engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        monkeypatch.setattr(
+            risk_persistence,
+            "AsyncSessionLocal",
+            async_sessionmaker(engine, expire_on_commit=False),
+        )
+        persister = WriteBehindPersister()
+        for item in [*good[:2], poison, *good[2:]]:
+            assert persister.submit(item)
+        await persister.flush()
+        assert len(persister._pending) == 6  # first failure: whole batch kept for a retry
+        await persister.flush()
+        assert len(persister._pending) == 0
+        async with engine.connect() as conn:
+            stored = await conn.scalar(select(func.count()).select_from(RiskDecision))
+        await engine.dispose()
+        return stored
+
+    assert asyncio.run(scenario()) == len(good)
+    parked = [json.loads(raw) for raw in fake.lrange(DEAD_LETTER_KEY, 0, -1)]
+    assert [p["decision"]["id"] for p in parked] == [str(poison.decision_id)]
+
+
+def test_full_write_behind_backlog_rejects_submissions(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, "RISK_WRITE_BEHIND_MAX_PENDING", 2)
+    persister = WriteBehindPersister()
+    assert persister.submit(_pending(5, "LOW")) and persister.submit(_pending(6, "LOW"))
+    assert not persister.submit(_pending(7, "LOW"))
+    assert len(persister._pending) == 2
@@ -0,0 +1,48 @@
+"""Streaming bulk screen: concurrency, per-address errors, and persistence hand-off."""
+
+from __future__ import annotations
+
+import asyncio
+
+from app.services import risk_engine
+from app.services.risk_persistence import PendingScreening
+
+
+def test_stream_yields_in_completion_order_and_persists(monkeypatch) -> None:
+    addresses = [f"0x{i:040x}" for i in range(6)]
+    persisted: list[PendingScreening] = []
+
+    async def fake_screen(subgraph_url, chain_id, address, profile, corr, hints):
+        i = int(address, 16)
+        if i == 3:
+            raise RuntimeError("subgraph timeout")
+        await asyncio.sleep(0.01 * (6 - i))
+        item = PendingScreening(snapshot={}, decision={"id": i, "severity": "LOW"})
+        return {"address": address, "correlation_id": corr}, item
+
+    async def fake_persist(items):
+        persisted.extend(items)
+
+    monkeypatch.setattr(risk_engine, "screen_address", fake_screen)
+    monkeypatch.setattr(risk_engine, "_persist_now", fake_persist)
+
+    async def collect() -> list[dict]:
+        return [
+            row
+            async for row in risk_engine.stream_online_screens(
+                "http://subgraph",
+                "polygon",
+                addresses,
+                "dapp",
+                "req",
+                False,
+                concurrency=6,
+            )
+        ]
+
+    rows = asyncio.run(collect())
+    # The failing address returns first, then the rest as their (staggered) screens finish.
+    assert [r["index"] for r in rows] == [3, 5, 4, 2, 1, 0]
+    assert rows[0] == {"index": 3, "address": addresses[3], "error": "subgraph timeout"}
+    assert [r["correlation_id"] for r in rows[1:]] == [f"req-{i}" for i in (5, 4, 2, 1, 0)]
+    assert sorted(p.decision["id"] for p in persisted) == [0, 1, 2, 4, 5]
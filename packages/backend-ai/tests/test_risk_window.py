@@ -0,0 +1,88 @@
+"""Point-in-time screening: window pinning and as-of-block feature bundles (no network)."""
+
+from __future__ import annotations
+
+import asyncio
+from typing import Any
+
+import pytest
+from app.core.config import settings
+from app.schemas.risk_api import BatchWindow
+from app.services import risk_engine
+from app.services.risk_cache import feature_cache_key
+from app.services.risk_engine import compute_feature_bundle, resolve_batch_window
+from pydantic import ValidationError
+
+HEAD = 1_000_000
+
+
+def test_resolve_batch_window_pins_to_head() -> None:
+    assert resolve_batch_window(None, None, None, HEAD) == (None, None)
+    assert resolve_batch_window("last_7d", None, None, HEAD) == (None, HEAD)
+    assert resolve_batch_window("last_7d", None, 900_000, HEAD) == (None, 900_000)
+    assert resolve_batch_window(None, 10, HEAD + 50, HEAD) == (10, HEAD)
+
+
+def test_window_rejects_presets_longer_than_the_aggregates() -> None:
+    assert BatchWindow(preset="last_7d").preset == "last_7d"
+    with pytest.raises(ValidationError):
+        BatchWindow(preset="last_30d")
+
+
+def test_cache_key_includes_window_floor() -> None:
+    assert feature_cache_key("polygon", "0xAB", 5) == "risk:feat:polygon:0xab:5"
+    assert feature_cache_key("polygon", "0xAB", 5, 2) == "risk:feat:polygon:0xab:5:from2"
+
+
+@pytest.fixture
+def fake_subgraph(monkeypatch: pytest.MonkeyPatch) -> dict[str, Any]:
+    calls: dict[str, Any] = {"windows": [], "cached": []}
+
+    async def _head(_client: Any, _url: str) -> int:
+        return HEAD
+
+    async def _lifetime(_url: str, _address: str, *, block: int | None = None) -> None:
+        calls["lifetime_block"] = block
+
+    async def _window(_url: str, _address: str, start: int, end: int) -> dict:
+        calls["windows"].append((start, end))
+        return {}
+
+    monkeypatch.setattr(risk_engine, "fetch_meta_block_number", _head)
+    monkeypatch.setattr(risk_engine, "fetch_user_lifetime_row", _lifetime)
+    monkeypatch.setattr(risk_engine, "fetch_user_window_features", _window)
+    monkeypatch.setattr(risk_engine, "get_cached_features", lambda *a: None)
+    monkeypatch.setattr(
+        risk_engine,
+        "set_cached_features",
+        lambda *a, **kw: calls["cached"].append((a[2], kw)),
+    )
+    return calls
+
+
+def test_historical_bundle_reads_as_of_block(fake_subgraph: dict[str, Any]) -> None:
+    as_of = HEAD - settings.RISK_FINALITY_BLOCKS - 1
+    floor = as_of - 10
+    merged, end, degraded = asyncio.run(
+        compute_feature_bundle(
+            "http://subgraph",
+            "polygon",
+            "0x" + "ab" * 20,
+            as_of_block=as_of,
+            window_from_block=floor,
+        ),
+    )
+    assert (end, degraded, merged["subgraph_block_head"]) == (as_of, False, as_of)
+    assert fake_subgraph["lifetime_block"] == as_of
+    assert fake_subgraph["windows"] == [(floor, as_of), (floor, as_of)]
+    assert fake_subgraph["cached"] == [(as_of, {"window_start_floor": floor, "permanent": True})]
+
+
+def test_recent_bundle_is_cached_with_ttl(fake_subgraph: dict[str, Any]) -> None:
+    _, end, _ = asyncio.run(
+        compute_feature_bundle(
+            "http://subgraph", "polygon", "0x" + "ab" * 20, as_of_block=HEAD + 5
+        ),
+    )
+    assert end == HEAD
+    assert fake_subgraph["cached"][0][1]["permanent"] is False
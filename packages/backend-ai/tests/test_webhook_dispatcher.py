@@ -0,0 +1,182 @@
+"""Batched, pooled webhook delivery against an in-process mock transport."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import uuid
+
+import httpx
+from app.db.base import Base
+from app.db.models import AmlAlertDelivery, AmlWebhookEndpoint
+from app.services import risk_webhooks
+from app.services.risk_webhooks import deliver_webhooks
+from app.services.webhook_dispatcher import (
+    BATCH_PAYLOAD_TYPE,
+    WebhookDispatcher,
+    build_envelopes,
+    sign_payload,
+)
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+
+
+def test_envelopes_batch_only_opted_in_endpoints() -> None:
+    single, batched = uuid.uuid4(), uuid.uuid4()
+    deliveries = [(uuid.uuid4(), ep, {"n": i}) for i in range(5) for ep in (single, batched)]
+    envelopes = build_envelopes(
+        deliveries,
+        {single: ("http://a/hook", "s" * 8, 1), batched: ("http://b/hook", "s" * 8, 2)},
+    )
+    assert [len(e.delivery_ids) for e in envelopes if e.endpoint_id == single] == [1] * 5
+    bodies = [json.loads(e.body) for e in envelopes if e.endpoint_id == batched]
+    assert [b["type"] for b in bodies] == [BATCH_PAYLOAD_TYPE] * 3
+    assert [[a["n"] for a in b["alerts"]] for b in bodies] == [[0, 1], [2, 3], [4]]
+
+
+def test_dispatcher_caps_concurrency_per_endpoint() -> None:
+    in_flight = peak = 0
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return httpx.Response(200)
+
+    endpoint = uuid.uuid4()
+    envelopes = build_envelopes(
+        [(uuid.uuid4(), endpoint, {"n": i}) for i in range(12)],
+        {endpoint: ("http://hooks.example/x", "secret-12", 1)},
+    )
+
+    async def run() -> list:
+        async with WebhookDispatcher(
+            endpoint_concurrency=3,
+            transport=httpx.MockTransport(handler),
+        ) as dispatcher:
+            return await dispatcher.send_all(envelopes)
+
+    sent = asyncio.run(run())
+    assert peak == 3
+    assert all(e.error is None for e in sent)
+
+
+def test_malformed_url_fails_only_its_own_envelope() -> None:
+    good, bad = uuid.uuid4(), uuid.uuid4()
+    envelopes = build_envelopes(
+        [(uuid.uuid4(), good, {"n": 0}), (uuid.uuid4(), bad, {"n": 1})],
+        {good: ("http://hooks.example/x", "secret-12", 1), bad: ("http://[::1/x", "secret-12", 1)},
+    )
+
+    async def run() -> list:
+        transport = httpx.MockTransport(lambda request: httpx.Response(200))
+        async with WebhookDispatcher(transport=transport) as dispatcher:
+            return await dispatcher.send_all(envelopes)
+
+    sent = {e.endpoint_id: e.error for e in asyncio.run(run())}
+    assert sent[good] is None
+    assert sent[bad]
+
+
+def test_deliver_webhooks_records_outcomes(monkeypatch) -> None:
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    ok = AmlWebhookEndpoint(
+        tenant_id="t",
+        target_url="http://ok.example/hook",
+        events=["severity_ge_medium"],
+        signing_secret="secret-ok",
+        batch_max_alerts=10,
+    )
+    down = AmlWebhookEndpoint(
+        tenant_id="t",
+        target_url="http://down.example/hook",
+        events=["severity_ge_medium"],
+        signing_secret="secret-down",
+    )
+    db.add_all([ok, down])
+    db.flush()
+    rows = [
+        AmlAlertDelivery(webhook_endpoint_id=wh.id, payload={"n": i}, status="pending", attempts=0)
+        for wh in (ok, down)
+        for i in range(3)
+    ]
+    db.add_all(rows)
+    db.commit()
+
+    requests: list[httpx.Request] = []
+    scheduled: list[tuple[uuid.UUID, int]] = []
+    monkeypatch.setattr(
+        risk_webhooks, "schedule_retries", lambda items: scheduled.extend(items) or True
+    )
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(200 if request.url.host == "ok.example" else 503)
+
+    deliver_webhooks(
+        db,
+        [r.id for r in rows],
+        dispatcher=WebhookDispatcher(transport=httpx.MockTransport(handler)),
+    )
+
+    # One envelope for the batching endpoint, one request per alert for the other.
+    to_ok = [r for r in requests if r.url.host == "ok.example"]
+    assert (len(to_ok), len(requests)) == (1, 4)
+    body = to_ok[0].content.decode()
+    assert to_ok[0].headers["X-CohortLens-Signature"] == f"sha256={sign_payload(body, 'secret-ok')}"
+
+    status = {
+        (wh, s)
+        for wh, s in db.execute(
+            select(AmlAlertDelivery.webhook_endpoint_id, AmlAlertDelivery.status),
+        )
+    }
+    assert status == {(ok.id, "sent"), (down.id, "pending")}
+    # Failed deliveries with attempts left go on the retry delay queue.
+    assert sorted(scheduled) == sorted((r.id, 1) for r in rows if r.webhook_endpoint_id == down.id)
+    db.close()
+    engine.dispose()
+
+
+def test_delivery_tasks_share_the_process_pool(monkeypatch) -> None:
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    wh = AmlWebhookEndpoint(
+        tenant_id="t",
+        target_url="http://ok.example/hook",
+        events=["severity_ge_medium"],
+        signing_secret="s",
+    )
+    db.add(wh)
+    db.flush()
+    rows = [
+        AmlAlertDelivery(webhook_endpoint_id=wh.id, payload={"n": i}, status="pending", attempts=0)
+        for i in range(2)
+    ]
+    db.add_all(rows)
+    db.commit()
+
+    built: list[WebhookDispatcher] = []
+
+    def dispatcher() -> WebhookDispatcher:
+        built.append(
+            WebhookDispatcher(transport=httpx.MockTransport(lambda r: httpx.Response(200)))
+        )
+        return built[-1]
+
+    monkeypatch.setattr(risk_webhooks, "WebhookDispatcher", dispatcher)
+    monkeypatch.setattr(risk_webhooks, "_process", None)
+    clients = []
+    for row in rows:  # two delivery tasks in one worker process
+        deliver_webhooks(db, [row.id])
+        clients.append(built[0]._clients["http://ok.example"])
+
+    assert len(built) == 1 and clients[0] is clients[1] and not clients[0].is_closed
+    assert set(db.scalars(select(AmlAlertDelivery.status))) == {"sent"}
+    risk_webhooks.close_process_dispatcher()
+    assert clients[0].is_closed
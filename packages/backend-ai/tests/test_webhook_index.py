@@ -0,0 +1,124 @@
+"""Severity-indexed webhook subscriptions and version-based invalidation (fakeredis)."""
+
+from __future__ import annotations
+
+import uuid
+
+import fakeredis
+import pytest
+from app.core.config import settings
+from app.db.base import Base
+from app.db.models import AmlAlertDelivery, AmlWebhookEndpoint
+from app.services import risk_webhooks, webhook_index
+from app.services.webhook_index import SubscriptionIndex, build_index, bump_version
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+
+def test_build_index_expands_thresholds() -> None:
+    index = build_index(
+        [
+            ("case", ["case_opened"]),
+            ("high", ["severity_ge_high", "unknown"]),
+            ("low", ["severity_ge_critical", "severity_ge_low"]),
+            ("none", ["something_else"]),
+            ("null", None),
+        ],
+    )
+    assert index == {
+        "LOW": ("low",),
+        "MEDIUM": ("case", "low"),
+        "HIGH": ("case", "high", "low"),
+        "CRITICAL": ("case", "high", "low"),
+    }
+
+
+def test_index_reloads_only_after_version_bump(monkeypatch: pytest.MonkeyPatch) -> None:
+    fake = fakeredis.FakeRedis()
+    monkeypatch.setattr(webhook_index, "_client", lambda: fake)
+    monkeypatch.setattr(settings, "RISK_WEBHOOK_INDEX_CHECK_SECONDS", 0.0)
+    index = SubscriptionIndex()
+    monkeypatch.setattr(webhook_index, "subscriptions", index)
+
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    first = AmlWebhookEndpoint(
+        tenant_id="t",
+        target_url="http://a.example/hook",
+        events=["severity_ge_high"],
+        signing_secret="secret-a",
+    )
+    db.add(first)
+    db.commit()
+    assert index.endpoints_for(db, "CRITICAL") == (first.id,)
+
+    # A row written without a bump is not visible yet: the version did not move.
+    second = AmlWebhookEndpoint(
+        tenant_id="t",
+        target_url="http://b.example/hook",
+        events=["case_opened"],
+        signing_secret="secret-b",
+    )
+    db.add(second)
+    db.commit()
+    assert index.endpoints_for(db, "MEDIUM") == ()
+
+    bump_version()
+    assert set(index.endpoints_for(db, "CRITICAL")) == {first.id, second.id}
+    assert index.endpoints_for(db, "MEDIUM") == (second.id,)
+
+    # Another process bumping the shared counter also triggers a reload here.
+    first.active = False
+    db.commit()
+    fake.incr(webhook_index.VERSION_KEY)
+    assert index.endpoints_for(db, "CRITICAL") == (second.id,)
+    db.close()
+    engine.dispose()
+
+
+def test_low_decisions_reach_only_low_subscribers(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(webhook_index, "_client", lambda: fakeredis.FakeRedis())
+    monkeypatch.setattr(risk_webhooks, "subscriptions", SubscriptionIndex())
+
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    low = AmlWebhookEndpoint(
+        tenant_id="t",
+        target_url="http://low.example/hook",
+        events=["severity_ge_low"],
+        signing_secret="secret-low",
+    )
+    medium = AmlWebhookEndpoint(
+        tenant_id="t",
+        target_url="http://medium.example/hook",
+        events=["severity_ge_medium"],
+        signing_secret="secret-medium",
+    )
+    db.add_all([low, medium])
+    db.commit()
+
+    def decision(severity: str) -> dict[str, object]:
+        return {
+            "id": uuid.uuid4(),
+            "chain_id": 1,
+            "address": "0xabc",
+            "risk_score": 10,
+            "severity": severity,
+            "recommended_action": "ALLOW",
+            "ruleset_version": "r1",
+            "model_version": "m1",
+            "correlation_id": "c1",
+        }
+
+    ids = risk_webhooks.stage_alerts_for_decisions(db, [decision("LOW"), decision("MEDIUM")])
+    db.commit()
+    rows = db.query(AmlAlertDelivery).all()
+    assert len(ids) == len(rows) == 3
+    by_severity: dict[str, set[uuid.UUID]] = {}
+    for row in rows:
+        by_severity.setdefault(row.payload["severity"], set()).add(row.webhook_endpoint_id)
+    assert by_severity == {"LOW": {low.id}, "MEDIUM": {low.id, medium.id}}
+    db.close()
+    engine.dispose()
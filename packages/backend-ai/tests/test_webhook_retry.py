@@ -0,0 +1,30 @@
+"""Webhook retry delay queue: backoff schedule and bulk drain (fakeredis with Lua)."""
+
+from __future__ import annotations
+
+import uuid
+
+import fakeredis
+import pytest
+from app.core.config import settings
+from app.services.webhook_retry import backlog, backoff_seconds, pop_due, schedule_retries
+
+
+def test_backoff_doubles_with_jitter_and_cap(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, "RISK_WEBHOOK_RETRY_BASE_SECONDS", 10.0)
+    monkeypatch.setattr(settings, "RISK_WEBHOOK_RETRY_MAX_SECONDS", 60.0)
+    assert [backoff_seconds(n, rng=lambda: 1.0) for n in (1, 2, 3, 4, 9)] == [10, 20, 40, 60, 60]
+    assert backoff_seconds(3, rng=lambda: 0.0) == 20
+
+
+def test_due_retries_drain_in_bulk_once() -> None:
+    r = fakeredis.FakeRedis()
+    first, second, later = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+    assert schedule_retries([(first, 1), (second, 1)], now=0.0, client=r)
+    assert schedule_retries([(later, 8)], now=0.0, client=r)
+
+    soon = settings.RISK_WEBHOOK_RETRY_BASE_SECONDS
+    assert backlog(now=soon, client=r) == (3, 2)
+    assert set(pop_due(100, now=soon, client=r)) == {first, second}
+    assert pop_due(100, now=soon, client=r) == []
+    assert backlog(now=soon, client=r) == (1, 0)